@@ -10,6 +10,7 @@
 import os.path
 
 from helper_functions import *
+from coverage_histogram import calculate_coverage as calculate_coverage_histogram
 
 # This script takes two fastq files (i.e. pairs) per sample(s) as input and aligns
 #  input reads against indexed reference genome. It then calculates, parses and plots
@@ -34,15 +35,18 @@ from helper_functions import *
 #    If they differ, an error is raised.
 # rule sort_sam_to_bam:
 #    - For each sample, aligned SAM file is converted to BAM file and sorted.
+# rule align_and_sort:
+#   - Used instead of align_to_genome and sort_sam_to_bam when FUSED_ALIGN_SORT is True.
+#    For each sample, bowtie2 output is streamed directly into a multi-threaded samtools sort,
+#    so no intermediate SAM file is written. Both modes tag reads with the sample name as read
+#    group ID and sample (SM) and produce the same sorted alignments; this can be confirmed
+#    with compare_sorted_bams.sh.
 # rule calculate_coverage:
-#    - For each sample, calculates read depth per base for each genomic scaffold using an input file
+#    - For each sample, calculates a read depth histogram for each genomic scaffold in a single
+#      pass over the sorted BAM file (see coverage_histogram.py), using an input file
 #      containing genomic co-ordinates for each genomic scaffold.
-#    - In addition, summarises percentage of read depth across entire genome.
-# rule parse_low_coverage_regions:
-#    - For each input file, parses rows where the second column contains a value less than 5.
-#    - Subsequently, parses rows containing 'genome' (which is summary information) and outputs.
-# rule reformat_plot_data:
-#    - Using a custom R script, reformat the parsed data into a format that can be plotted.
+#    - Outputs the genome-wide summary rows with a read depth less than 5 and the percentage
+#      of the genome at each of these depths in a format that can be plotted.
 # rule combine_plot_input:
 #    - Combine reformatted data for each sample.
 # rule plot_stack_charts:
@@ -67,11 +71,11 @@ from helper_functions import *
 #  1. Download and install the following software:
 #   bowtie2
 #   samtools
-#   bedtools2
+#   python modules: numpy, pysam
 #
-#  2. Ensure helper_functions.py is within the same directory of the Snakefile.
-# For this particular snakefile, ensure the location of the bash script(genomecov_output_parser.sh)
-#  and Rscripts (reformat_for_plot_test.R and plot_stacks.R) are defined.
+#  2. Ensure helper_functions.py and coverage_histogram.py are within the same directory of the
+#  Snakefile. For this particular snakefile, ensure the location of the Rscript (plot_stacks.R)
+#  is defined.
 #
 #  3. Assign global variables for use within specific rules
 #     Please see section below for further information on variable to be assigned
@@ -104,8 +108,16 @@ INDEX         = "Bter_genome"
 # Specify the number of threads
 MAX_THREADS   = 10
 
+# Stream alignments straight into samtools sort without writing an intermediate SAM file
+# (rule align_and_sort). Set to False to run align_to_genome and sort_sam_to_bam separately.
+FUSED_ALIGN_SORT   = True
+
+# Specify the number of sorting threads and the memory samtools sort may use per thread
+SORT_THREADS       = 4
+SORT_MEMORY        = "2G"
+
 # Specify coverage file for read depth counts
-# genomeCoverageBed requires a genome coverage file which is a tab-delimited file
+# rule calculate_coverage requires a genome coverage file which is a tab-delimited file
 # with two columns: column one: chromosome name; column two: chromosome length
 # The file can be generated by running 'samtools faidx <genome.fasta>', which will
 # generate an indexed fasta file with the first column containing the chromosome
@@ -153,9 +165,6 @@ SORTED_DATA       = "filtered_temp/02_sorted/{samples}.bam"
 # Output BAM file annotated with read group information here
 RG_ANNOTATED_DATA = "filtered_temp/02_sorted/{samples}_RGadded.bam"
 
-# Output text file containing read depth information here
-COVERAGE_DATA     = "filtered_temp/03_count/{samples}.read_depth.txt"
-
 # Output text file containing read depth information here
 PARSEDPLOT_DATA   = "filtered_temp/03_count/{samples}.read_depth.filtered.txt"
 
@@ -183,7 +192,6 @@ tools = {}
 tools['build']       = os.path.join(dirs['src'], 'bowtie2-2.2.5/bowtie2-build')
 tools['bowtie2']     = os.path.join(dirs['src'], 'bowtie2-2.2.5/bowtie2')
 tools['samtools']    = os.path.join(dirs['src'], 'samtools-1.2/samtools')
-tools['coverage']    = os.path.join(dirs['src'], 'bedtools2/bin/genomeCoverageBed')
 tools['picard']      = os.path.join(dirs['src'], 'picard-tools-1.141/picard.jar')
 
 ##############################################################################
@@ -204,58 +212,72 @@ rule index_genome:
         check_files_arent_empty(input)
         shell("{tools[build]} {input} {INDEX}")
 
-# Align cleaned sequences against indexed genome
-rule align_to_genome:
-    input:  expand(INDEXED_DATA, index=INDEX), CLEANED_DATA,
-    output: ALIGNED_DATA, UNMAPPED_DATA
-    threads: MAX_THREADS
-    run:
-        align_list=re.split('/|.R', (''.join(output[0])))[2]
-        check_files_arent_empty(input)
-        shell("{tools[bowtie2]} --rg-id {align_list} \
-                                --rg SM:{align_list} \
-                                --rg LB:library1 \
-                                --rg PL:ILLUMINA \
-                                --rg DS:HiSeq2500 \
-                                --local -p {threads} \
-                                -X 1000 -x {INDEX} \
-                                -1 {input[6]} \
-                                -2 {input[7]} \
-                                -U {input[8]} \
-                                -S {output[0]} && [[ -s {output[0]} ]]")
-
-# Convert SAM file to BAM format and sort
-rule sort_sam_to_bam:
-    input:  ALIGNED_DATA
-    output: SORTED_DATA
-    run:
-        check_files_arent_empty(input)
-        shell("{tools[samtools]} view -bS {input} \
-             | {tools[samtools]} sort - -f {output} && [[ -s {output} ]]")
-
-# Calculate read depth per genomic scaffold base and coverage percentage across individual genomic
-# scaffolds
+if FUSED_ALIGN_SORT:
+    # Align cleaned sequences against indexed genome and sort alignments as they are produced
+    rule align_and_sort:
+        input:  expand(INDEXED_DATA, index=INDEX), CLEANED_DATA,
+        output: SORTED_DATA
+        # bowtie2 and samtools sort run at the same time: reserve threads for both, and give
+        # bowtie2 what is left after the sorting threads if Snakemake reserves fewer (--cores)
+        threads: MAX_THREADS + SORT_THREADS
+        run:
+            check_files_arent_empty(input)
+            align_threads = max(1, threads - SORT_THREADS)
+            shell("{tools[bowtie2]} --rg-id {wildcards.samples} \
+                                    --rg SM:{wildcards.samples} \
+                                    --rg LB:library1 \
+                                    --rg PL:ILLUMINA \
+                                    --rg DS:HiSeq2500 \
+                                    --local -p {align_threads} --reorder \
+                                    -X 1000 -x {INDEX} \
+                                    -1 {input[6]} \
+                                    -2 {input[7]} \
+                                    -U {input[8]} \
+                 | {tools[samtools]} sort -@ {SORT_THREADS} -m {SORT_MEMORY} \
+                                          -T {output}.tmp -O bam -o {output} - \
+                 && [[ -s {output} ]]")
+
+else:
+    # Align cleaned sequences against indexed genome
+    rule align_to_genome:
+        input:  expand(INDEXED_DATA, index=INDEX), CLEANED_DATA,
+        output: ALIGNED_DATA, UNMAPPED_DATA
+        threads: MAX_THREADS
+        run:
+            check_files_arent_empty(input)
+            shell("{tools[bowtie2]} --rg-id {wildcards.samples} \
+                                    --rg SM:{wildcards.samples} \
+                                    --rg LB:library1 \
+                                    --rg PL:ILLUMINA \
+                                    --rg DS:HiSeq2500 \
+                                    --local -p {threads} --reorder \
+                                    -X 1000 -x {INDEX} \
+                                    -1 {input[6]} \
+                                    -2 {input[7]} \
+                                    -U {input[8]} \
+                                    -S {output[0]} && [[ -s {output[0]} ]]")
+
+    # Convert SAM file to BAM format and sort
+    rule sort_sam_to_bam:
+        input:  ALIGNED_DATA
+        output: SORTED_DATA
+        threads: SORT_THREADS
+        run:
+            check_files_arent_empty(input)
+            shell("{tools[samtools]} sort -@ {threads} -m {SORT_MEMORY} \
+                                          -T {output}.tmp -O bam -o {output} {input} \
+                 && [[ -s {output} ]]")
+
+# Calculate read depth histograms per genomic scaffold and summarise low coverage (< 5x)
+# regions across the genome for plotting
 rule calculate_coverage:
     input:  SORTED_DATA
-    output: COVERAGE_DATA
+    output: PARSEDPLOT_DATA, REFORMED_DATA
     run:
         check_files_arent_empty(input)
-        shell("{tools[coverage]} -ibam {input} -g {COVERAGE_FILE} > {output} && [[ -s {output} ]]")
-
-# Parse read depth information for each sample and output data for plotting
-rule parse_low_coverage_regions:
-    input:  COVERAGE_DATA
-    output: PARSEDPLOT_DATA
-    run:
-        check_files_arent_empty(input)
-        shell("bash genomecov_output_parser.sh {input} {output} && [[ -s {output} ]]")
-
-# Reformat data in format applicable with stacked bar plots
-rule reformat_plot_data:
-    input:  PARSEDPLOT_DATA
-    output: REFORMED_DATA
-    run:
-        shell("Rscript reformat_for_plot_test.R {input} {output} && [[ -s {output} ]]")
+        calculate_coverage_histogram(input[0], COVERAGE_FILE, output[0], output[1],
+                                     sample=wildcards.samples)
+        check_files_arent_empty(output)
 
 # Combine plot data for a comparative plots for samples
 rule combine_plot_input:
@@ -0,0 +1,36 @@
+#!/usr/bin/env bash
+##############################################################################
+##
+## Author: Joe Colgan                   Program: compare_sorted_bams.sh
+##
+## Date: 18/10/2026
+##
+## Purpose:
+## Check that two sorted BAM files contain byte-identical alignment records,
+## e.g. output of alignment_to_coverage.py run with FUSED_ALIGN_SORT = True
+## and with FUSED_ALIGN_SORT = False for the same sample.
+## The BAM headers are not compared as the @PG lines record each command line.
+## Compressed BAM bytes are not compared as they depend on BGZF block boundaries.
+##
+## Usage:
+## bash compare_sorted_bams.sh <first.bam> <second.bam> [path/to/samtools]
+##
+##############################################################################
+
+set -euo pipefail
+
+first=$1
+second=$2
+samtools=${3:-samtools}
+
+## Calculate a checksum of the decoded alignment records of each file:
+first_sum="$("$samtools" view "$first" | md5sum | cut -d ' ' -f 1)"
+second_sum="$("$samtools" view "$second" | md5sum | cut -d ' ' -f 1)"
+
+## Compare checksums and print to console:
+if [[ "$first_sum" == "$second_sum" ]]; then
+    echo "Identical alignment records ($first_sum): $first, $second"
+else
+    echo "Alignment records differ: $first ($first_sum), $second ($second_sum)" >&2
+    exit 1
+fi
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: coverage_histogram.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a coordinate-sorted BAM file and a genome file (two columns: scaffold
+# name and scaffold length, e.g. 'cut -f 1,2 genome.fna.fai') as input and calculates a
+# read depth histogram per genomic scaffold in a single pass over the BAM file.
+# It replaces genomeCoverageBed -ibam + genomecov_output_parser.sh + reformat_for_plot_test.R.
+#
+# Output:
+# 1) Low coverage summary: the 'genome' rows of the genomeCoverageBed histogram with depth < 5
+#    (columns: genome, depth, number of bases at depth, genome size, fraction of genome)
+# 2) Plot data: one row per depth < 5 (columns: sample, depth, percentage of genome)
+# 3) Optionally, the full per-scaffold histogram in genomeCoverageBed format
+#
+# Usage:
+# python3 coverage_histogram.py <sorted.bam> <genome_file> <low_coverage.txt> <plot_data.txt>\
+#        [--histogram full_histogram.txt] [--max-depth 5]
+
+# Import modules
+import argparse
+import os.path
+from array import array
+
+import numpy as np
+import pysam
+
+
+def read_genome_file(genome_file):
+    # This function takes a genome file as input and returns a dictionary of scaffold name to
+    # scaffold length, in file order
+    lengths = {}
+    with open(genome_file) as genome:
+        for line in genome:
+            if line.strip():
+                fields = line.split('\t')
+                lengths[fields[0]] = int(fields[1])
+    return lengths
+
+
+def depth_histogram(starts, ends, length):
+    # This function takes the start and end coordinates (0-based, half-open) of aligned
+    # segments on one scaffold and returns a histogram of per-base read depth: element i
+    # holds the number of bases covered by exactly i reads
+    if len(starts) == 0:
+        return np.array([length], dtype=np.int64)
+    starts = np.minimum(np.frombuffer(starts, dtype=np.int64), length)
+    ends = np.minimum(np.frombuffer(ends, dtype=np.int64), length)
+    # Depth changes by +1 at every start and -1 at every end; a cumulative sum recovers depth
+    delta = np.bincount(starts, minlength=length + 1) - np.bincount(ends, minlength=length + 1)
+    depth = np.cumsum(delta[:length])
+    return np.bincount(depth)
+
+
+def scaffold_histograms(bam_file, lengths, split=False):
+    # This function takes a sorted BAM file and a dictionary of scaffold lengths as input and
+    # returns a dictionary of scaffold name to depth histogram. Unmapped reads are ignored.
+    # As genomeCoverageBed, each alignment covers its full reference span unless split=True,
+    # in which case only aligned blocks are counted (deletions and introns are skipped).
+    histograms = {}
+    current = None
+    starts, ends = array('q'), array('q')
+    with pysam.AlignmentFile(bam_file, 'rb') as bam:
+        for read in bam.fetch(until_eof=True):
+            if read.is_unmapped:
+                continue
+            if read.reference_name != current:
+                if current in lengths:
+                    histograms[current] = depth_histogram(starts, ends, lengths[current])
+                current = read.reference_name
+                starts, ends = array('q'), array('q')
+            if current not in lengths:
+                continue
+            if split:
+                for block_start, block_end in read.get_blocks():
+                    starts.append(block_start)
+                    ends.append(block_end)
+            elif read.reference_end is not None:
+                # Mapped records without a CIGAR have no reference span (and no blocks)
+                starts.append(read.reference_start)
+                ends.append(read.reference_end)
+        if current in lengths:
+            histograms[current] = depth_histogram(starts, ends, lengths[current])
+    # Scaffolds without any aligned reads have zero depth throughout
+    for scaffold, length in lengths.items():
+        if scaffold not in histograms:
+            histograms[scaffold] = np.array([length], dtype=np.int64)
+    return histograms
+
+
+def genome_histogram(histograms):
+    # This function combines per-scaffold histograms into a single genome-wide histogram
+    genome = np.zeros(max(len(hist) for hist in histograms.values()), dtype=np.int64)
+    for hist in histograms.values():
+        genome[:len(hist)] += hist
+    return genome
+
+
+def write_histogram_rows(handle, name, hist, size, max_depth=None):
+    # This function writes histogram rows in genomeCoverageBed format, skipping depths without
+    # any bases (as genomeCoverageBed does) and depths at or above max_depth if given
+    limit = len(hist) if max_depth is None else min(len(hist), max_depth)
+    for depth in np.flatnonzero(hist[:limit]):
+        handle.write("%s\t%d\t%d\t%d\t%g\n" % (name, depth, hist[depth], size, hist[depth] / size))
+
+
+def calculate_coverage(bam_file, genome_file, low_coverage_file, plot_file,
+                       histogram_file=None, max_depth=5, split=False, sample=None):
+    # This function runs the coverage stage for one sample and writes its output files
+    lengths = read_genome_file(genome_file)
+    histograms = scaffold_histograms(bam_file, lengths, split)
+    genome = genome_histogram(histograms)
+    genome_size = sum(lengths.values())
+    if sample is None:
+        sample = os.path.basename(bam_file).split('.')[0]
+    if histogram_file is not None:
+        with open(histogram_file, 'w') as output:
+            for scaffold, length in lengths.items():
+                write_histogram_rows(output, scaffold, histograms[scaffold], length)
+            write_histogram_rows(output, 'genome', genome, genome_size)
+    with open(low_coverage_file, 'w') as output:
+        write_histogram_rows(output, 'genome', genome, genome_size, max_depth)
+    with open(plot_file, 'w') as output:
+        for depth in range(max_depth):
+            bases = genome[depth] if depth < len(genome) else 0
+            output.write("%s\t%d\t%.4f\n" % (sample, depth, 100.0 * bases / genome_size))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-scaffold read depth histogram from a BAM")
+    parser.add_argument('bam', help="Coordinate-sorted BAM file")
+    parser.add_argument('genome', help="Genome file: scaffold name and length per line")
+    parser.add_argument('low_coverage', help="Output: genome rows with depth < --max-depth")
+    parser.add_argument('plot_data', help="Output: sample, depth, percentage of genome")
+    parser.add_argument('--histogram', help="Output: full genomeCoverageBed-style histogram")
+    parser.add_argument('--max-depth', type=int, default=5)
+    parser.add_argument('--split', action='store_true',
+                        help="Count aligned blocks only (as genomeCoverageBed -split)")
+    parser.add_argument('--sample', help="Sample name for plot data (default: BAM file prefix)")
+    args = parser.parse_args()
+    calculate_coverage(args.bam, args.genome, args.low_coverage, args.plot_data,
+                       args.histogram, args.max_depth, args.split, args.sample)
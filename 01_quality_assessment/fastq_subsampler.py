@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: fastq_subsampler.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script contains custom defined functions to:
+# 1) Randomly subsample read pairs from paired-end fastq files in a single pass
+#    using reservoir sampling (Algorithm L; Li 1994), for one or more subsample sizes at once
+# 2) Subsample several samples in parallel and write the subsampled pairs for all
+#    samples straight into combined gzip-compressed fastq files (one per pair and size)
+#
+# Usage:
+# python3 fastq_subsampler.py --sizes 100000 500000 --prefix temp/02_combined/combined \
+#        data/sampleA.R1.fastq data/sampleA.R2.fastq data/sampleB.R1.fastq data/sampleB.R2.fastq
+# Output: temp/02_combined/combined.R1.100000.fastq.gz, combined.R2.100000.fastq.gz, ...
+
+# Import modules
+import argparse
+import gzip
+import itertools
+import math
+import multiprocessing
+import random
+import time
+
+from helper_functions import open_fastq, fastq_read_name, check_files_arent_empty
+
+
+class Reservoir:
+    # Holds a fixed-size random sample of a stream using Algorithm L. Rather than drawing a
+    # random number per record, the index of the next record to keep is drawn directly, so
+    # the cost per skipped record is a single comparison.
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.items = []
+        self.weight = math.exp(math.log(self._uniform()) / size)
+        self.next_index = size - 1 + self._skip()
+
+    def _uniform(self):
+        # random() can return 0.0, which log() cannot take
+        return 1.0 - self.rng.random()
+
+    def _skip(self):
+        # Number of records to move forward before the next replacement
+        if self.weight >= 1.0:
+            return 1
+        return int(math.log(self._uniform()) / math.log(1.0 - self.weight)) + 1
+
+    def offer(self, index, item):
+        # Consider the record at (0-based) position index of the stream
+        if index < self.size:
+            self.items.append(item)
+        elif index == self.next_index:
+            self.items[self.rng.randrange(self.size)] = item
+            self.weight *= math.exp(math.log(self._uniform()) / self.size)
+            self.next_index += self._skip()
+
+
+def subsample_pairs(file1, file2, sizes, seed):
+    # This function takes two (optionally gzipped) fastq files as input and returns a dictionary
+    # of subsample size to a list of (R1 record, R2 record) tuples, sampled uniformly without
+    # replacement in one pass over both files. Mates are read together so pairs stay in sync and
+    # the read names of every pair are checked on the way.
+    rng = random.Random(seed)
+    reservoirs = [Reservoir(size, rng) for size in sorted(set(sizes))]
+    start = time.time()
+    index = -1
+    with open_fastq(file1) as fastq1, open_fastq(file2) as fastq2:
+        # zip() of the same iterator four times groups the lines of each record
+        records1 = zip(fastq1, fastq1, fastq1, fastq1)
+        records2 = zip(fastq2, fastq2, fastq2, fastq2)
+        next_index = min(reservoir.next_index for reservoir in reservoirs)
+        for index, (record1, record2) in enumerate(itertools.zip_longest(records1, records2)):
+            if record1 is None or record2 is None:
+                raise IOError("Fastq record count differs: %s, %s after record %d"
+                              % (file1, file2, index))
+            if fastq_read_name(record1[0]) != fastq_read_name(record2[0]):
+                raise IOError("Fastq Id differences between: %s, %s at record %d"
+                              % (file1, file2, index + 1))
+            if index < reservoirs[-1].size or index == next_index:
+                pair = (b''.join(record1), b''.join(record2))
+                for reservoir in reservoirs:
+                    reservoir.offer(index, pair)
+                next_index = min(reservoir.next_index for reservoir in reservoirs)
+    total = index + 1
+    elapsed = max(time.time() - start, 1e-9)
+    print("Subsampled %d pairs in %.1f s (%.0f records/s): %s, %s"
+          % (total, elapsed, total / elapsed, file1, file2))
+    for reservoir in reservoirs:
+        if total < reservoir.size:
+            print("Warning: %s contains %d pairs, fewer than subsample size %d"
+                  % (file1, total, reservoir.size))
+    return {reservoir.size: reservoir.items for reservoir in reservoirs}
+
+
+def _subsample_pairs_worker(args):
+    return subsample_pairs(*args)
+
+
+def subsample_to_combined(pairs, sizes, output1, output2, seed, threads=1):
+    # This function takes a list of (R1, R2) fastq paths (one tuple per sample), a list of
+    # subsample sizes and two dictionaries of subsample size to gzip output path (one per pair).
+    # Each sample is subsampled once for all sizes, samples are processed in parallel on
+    # threads processes, and the sampled pairs are written in sample order to the outputs.
+    for pair in pairs:
+        check_files_arent_empty(pair)
+    jobs = [(file1, file2, sizes, seed + number) for number, (file1, file2) in enumerate(pairs)]
+    handles = {}
+    try:
+        for size in sizes:
+            handles[size] = (gzip.open(output1[size], 'wb'), gzip.open(output2[size], 'wb'))
+        with multiprocessing.Pool(max(1, min(threads, len(jobs)))) as pool:
+            for samples in pool.imap(_subsample_pairs_worker, jobs):
+                for size, items in samples.items():
+                    handles[size][0].writelines(record1 for record1, _ in items)
+                    handles[size][1].writelines(record2 for _, record2 in items)
+    finally:
+        for handle1, handle2 in handles.values():
+            handle1.close()
+            handle2.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Single-pass paired fastq reservoir subsampler")
+    parser.add_argument('--sizes', type=int, nargs='+', required=True,
+                        help="Number of read pairs to sample (one or more)")
+    parser.add_argument('--prefix', required=True,
+                        help="Output prefix; writes <prefix>.R1.<size>.fastq.gz and R2")
+    parser.add_argument('--seed', type=int, default=int(time.time() * 10000))
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('fastq', nargs='+', help="R1 R2 [R1 R2 ...]")
+    args = parser.parse_args()
+    if len(args.fastq) % 2 != 0:
+        parser.error("Expected an even number of fastq files (R1 R2 per sample)")
+    subsample_to_combined(list(zip(args.fastq[0::2], args.fastq[1::2])), args.sizes,
+                          {size: "%s.R1.%d.fastq.gz" % (args.prefix, size) for size in args.sizes},
+                          {size: "%s.R2.%d.fastq.gz" % (args.prefix, size) for size in args.sizes},
+                          args.seed, args.threads)
@@ -11,9 +11,14 @@
 # 3) Check input paired-end files contain the same identifiers
 
 # Import modules
+import gzip
+import io
+import itertools
 import os.path
-import tempfile
-import subprocess
+import time
+
+# Size of read buffer (bytes) used when streaming fastq files
+FASTQ_BUFFER_SIZE = 16 * 1024 * 1024
 
 
 def check_files_arent_empty(files):
@@ -34,17 +39,50 @@ def check_tools(tools):
             raise IOError("Cannot execute (try chmod?): %s" % tools[toolname])
 
 
-def check_identical_fastq_headers(file1, file2):
-    # This function takes two files as input, grabs sequence identifiers and compares to check
-    # there is no difference. If there is an difference, an error is raised
-    mytempfile = tempfile.mkstemp()
-    head1 = tempfile.mkstemp()
-    head2 = tempfile.mkstemp()
+def open_fastq(path, buffer_size=FASTQ_BUFFER_SIZE):
+    # This function takes a path to a plain or gzip-compressed fastq file as input and returns
+    # a binary handle that reads the file in large blocks. Compression is detected from the
+    # gzip magic number rather than the file extension
+    with open(path, 'rb') as handle:
+        is_gzipped = handle.read(2) == b'\x1f\x8b'
+    if is_gzipped:
+        return io.BufferedReader(gzip.open(path, 'rb'), buffer_size=buffer_size)
+    return open(path, 'rb', buffering=buffer_size)
 
-    subprocess.call("grep '@HWI' %s | cut -d ' ' -f 1 - > %s" % (file1, head1[1]), shell=True)
-    subprocess.call("grep '@HWI' %s | cut -d ' ' -f 1 - > %s" % (file2, head2[1]), shell=True)
 
-    os.system("diff %s %s > %s" % (head1[1], head2[1], mytempfile[1]))
+def fastq_read_name(header):
+    # This function takes a fastq header line as input and returns the read name shared by
+    # both mates: the first whitespace-delimited field without '@' or a '/1' or '/2' suffix
+    name = header.split(None, 1)[0]
+    if name.endswith((b'/1', b'/2')):
+        name = name[:-2]
+    return name[1:]
 
-    if os.path.getsize(mytempfile[1]) != 0:
-        raise IOError("Fastq Id differences between: %s, %s" % (file1, file2))
+
+def check_identical_fastq_headers(file1, file2):
+    # This function takes two (optionally gzipped) fastq files as input and walks both files in
+    # lockstep, comparing the read name of each record pair in a single pass. If a pair of names
+    # differ, or one file contains more records than the other, an error is raised reporting the
+    # (1-based) record number. Returns the number of record pairs checked.
+    start = time.time()
+    count = 0
+    with open_fastq(file1) as fastq1, open_fastq(file2) as fastq2:
+        # Every fourth line from the first line of each file is a header
+        headers1 = itertools.islice(fastq1, 0, None, 4)
+        headers2 = itertools.islice(fastq2, 0, None, 4)
+        for header1, header2 in itertools.zip_longest(headers1, headers2):
+            count += 1
+            if header1 is None or header2 is None:
+                longer, shorter = (file2, file1) if header1 is None else (file1, file2)
+                raise IOError("Fastq record count differs: %s ends after %d records, %s has more"
+                              % (shorter, count - 1, longer))
+            if not header1.startswith(b'@') or not header2.startswith(b'@'):
+                raise IOError("Malformed fastq record %d in: %s, %s" % (count, file1, file2))
+            if fastq_read_name(header1) != fastq_read_name(header2):
+                raise IOError("Fastq Id differences between: %s, %s at record %d (%s != %s)"
+                              % (file1, file2, count,
+                                 header1.rstrip().decode(), header2.rstrip().decode()))
+    elapsed = max(time.time() - start, 1e-9)
+    print("Checked %d fastq pairs in %.1f s (%.0f records/s): %s, %s"
+          % (count, elapsed, count / elapsed, file1, file2))
+    return count
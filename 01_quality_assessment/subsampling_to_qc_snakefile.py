@@ -12,6 +12,7 @@ import time
 import sys
 
 from helper_functions import *
+from fastq_subsampler import subsample_to_combined
 
 # This script takes two fastq files (i.e. pairs) per sample as input and performs
 # a quality assessment of a subsampled dataset for one or more samples.
@@ -21,12 +22,12 @@ from helper_functions import *
 # outline commands to execute sequentially to take user-defined input and generate
 # final output (as defined by user in rule all).
 #
-# For this script, three rules are defined.
-# 1) rule subsample_each_pair:
-#    - For each input sample, a specific number of random sequences are subsampled from each pair.
-# 2) rule combine_each_pair:
-#  - For each input sample, subsampled sequences are combined per pair.
-# 3) rule fastqc_each_pair:
+# For this script, two rules are defined.
+# 1) rule subsample_and_combine:
+#    - For each input sample, one or more specific numbers of random read pairs are subsampled
+#    from both pairs in a single pass (reservoir sampling; see fastq_subsampler.py).
+#  - Subsampled sequences for all samples are written directly to one gzipped file per pair.
+# 2) rule fastqc_each_pair:
 #  - Using the combined subsampled sequences as input, quality assessment is performed\
 #   for each pair. This step results in the required output defined in rule all.
 
@@ -48,10 +49,10 @@ from helper_functions import *
 
 # To run read_filtering_snakefile.py:
 #  1. Download and install the following software:
-#   seqtk (https://github.com/lh3/seqtk)
 #   fastqc (https://github.com/dib-lab/khmer)
 #
-#  2. Ensure helper_functions.py is within the same directory of the Snakefile.
+#  2. Ensure helper_functions.py and fastq_subsampler.py are within the same directory of the
+#   Snakefile.
 #
 #  3. Assign global variables for use within specific rules
 #   Please see section below for further information on variable to be assigned
@@ -64,6 +65,7 @@ from helper_functions import *
 #
 #  7. Input data should be formatted in the context of defined wildcards: {sample}.{pair}.fastq
 #       For example: 2014_Bter_P_D_14_260_head.R1.fastq
+#       Input files may also be gzip-compressed (keep the .fastq name or adjust RAW_DATA).
 #
 #  8. Make a text.file called 'sample_list.txt' and put in same directory as Snakfile.\
 #    Populate 'sample_list.txt' with names of samples to be analysed.
@@ -86,11 +88,15 @@ from helper_functions import *
 # Assign global variables for use in rules (see below)
 ##############################################################################
 
-# For rule subsample_each_pair, assign path for working data
+# For rule subsample_and_combine, assign path for working data
 RAW_DATA  = "data/{samples}.{pair}.fastq"
 
-# For rule subsample_each_pair, specify a number (INT) of sequences to subsample
-SUBSAMPLE = 100000
+# For rule subsample_and_combine, specify one or more numbers (INT) of sequences to subsample.
+# All sizes are drawn from the same pass over the input data.
+SUBSAMPLE = [100000]
+
+# For rule subsample_and_combine; number of samples to subsample in parallel
+SUBSAMPLE_THREADS = 8
 
 # For rule fastqc_each_pair; Snakemake will use min(MAX_THREADS, --cores)
 MAX_THREADS = 40
@@ -112,11 +118,8 @@ PAIR = ["R1", "R2"]
 # Specify all input/output files in terms of sample wildcards
 ##############################################################################
 
-# Assign path for subsample data output
-RANDOM_SUBSAMPLE_DATA = "temp/01_subsample/{samples}.{pair}.{subsample}.fastq"
-
 # Combine subsampled data and output
-COMBINED_DATA         = "temp/02_combined/combined.{pair}.{subsample}.fastq"
+COMBINED_DATA         = "temp/02_combined/combined.{pair}.{subsample}.fastq.gz"
 
 # Assign directory to contain information from fastqc analysis
 FASTQC_DATA           = "temp/02_combined/combined.{pair}.{subsample}_fastqc.html",\
@@ -133,7 +136,6 @@ dirs['project'] = os.path.abspath('../../')
 dirs['src']     = os.path.join(dirs['project'], 'src')
 
 tools = {}
-tools['seqtk']  = os.path.join(dirs['src'], 'seqtk/seqtk')
 tools['fastqc'] = os.path.join(dirs['src'], 'FastQC/fastqc')
 check_tools(tools)
 
@@ -147,30 +149,24 @@ check_tools(tools)
 rule all:
     input: expand(FASTQC_DATA, pair=PAIR, subsample=SUBSAMPLE)
 
-# Subsample sequences per pair per sample
-rule subsample_each_pair:
-    input: expand("data/{{samples}}.{pair}.fastq", pair=PAIR)
-    output: expand("temp/01_subsample/{{samples}}.{pair}.{subsample}.fastq",
-                   pair=PAIR,
-                   subsample=SUBSAMPLE)
+# Subsample sequences per pair for all samples and combine per pair
+# Each sample is read once (both pairs together) for all subsample sizes
+rule subsample_and_combine:
+    input: expand(RAW_DATA, samples=SAMPLES, pair=PAIR)
+    output: expand(COMBINED_DATA, pair=PAIR, subsample=SUBSAMPLE)
+    threads: SUBSAMPLE_THREADS
     run:
-        check_identical_fastq_headers(input[0], input[1])
         check_files_arent_empty(input)
         seed = int(time.time() * 10000)
-        shell("{tools[seqtk]} sample -s {seed} {input[0]} {SUBSAMPLE} > {output[0]}"
-              " && {tools[seqtk]} sample -s {seed} {input[1]} {SUBSAMPLE} > {output[1]}"
-              " && [[ -s {output[0]} ]] && [[ -s {output[1]} ]]")
-        check_identical_fastq_headers(output[0], output[1])
-
-# Combine the subsampled sequences for each pair
-rule combine_each_pair:
-    input: expand("temp/01_subsample/{samples}.{{pair}}.{subsample}.fastq",
-                  samples=SAMPLES,
-                  subsample=SUBSAMPLE)
-    output: COMBINED_DATA
-    run:
-        check_files_arent_empty(input)
-        shell("cat {input} > {output} && [[ -s {output} ]]")
+        pairs = [(RAW_DATA.format(samples=sample, pair=PAIR[0]),
+                  RAW_DATA.format(samples=sample, pair=PAIR[1])) for sample in SAMPLES]
+        subsample_to_combined(pairs, SUBSAMPLE,
+                              {size: COMBINED_DATA.format(pair=PAIR[0], subsample=size)
+                               for size in SUBSAMPLE},
+                              {size: COMBINED_DATA.format(pair=PAIR[1], subsample=size)
+                               for size in SUBSAMPLE},
+                              seed, threads)
+        check_files_arent_empty(output)
 
 # Run fastqc on combined subsampled reads
 rule fastqc_each_pair:
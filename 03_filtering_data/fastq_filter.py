@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: fastq_filter.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script contains custom defined functions to filter paired-end fastq files by base
+# quality and ambiguous bases, replacing fastq_quality_filter (fastx_toolkit) in
+# read_filtering_snakefile.py:
+# 1) Both mates are read in lockstep in chunks of reads. For each chunk, the quality and sequence
+#    lines are joined and decoded into NumPy uint8 arrays, and the rules are applied to all
+#    reads of the chunk at once:
+#      - at least PERCENT_BASES percent of bases must have a quality of at least MIN_QUALITY
+#        (Phred offset QUAL_PHRED), as fastq_quality_filter -Q -q -p
+#      - at most N_BASES bases may be 'N'
+#    A pair is kept only if both mates pass, so pairs stay in sync. Read names of each pair
+#    are checked on the way.
+# 2) Chunks are filtered and gzip-compressed on a process pool; compressed chunks are written
+#    in input order (concatenated gzip members are a valid gzip file). Kept pairs are written
+#    interleaved (R1 then R2).
+# 3) A benchmark harness times the filter on synthetic reads against a per-read reference
+#    implementation (and fastq_quality_filter, if found on the PATH) and checks that the
+#    outputs are identical.
+#
+# Requires helper_functions.py (from 01_quality_assessment) in the same directory.
+#
+# Usage:
+# python3 fastq_filter.py filter <R1.fastq[.gz]> <R2.fastq[.gz]> <output.R1_R2.fastq.gz>
+#        [--phred 33] [--min-quality 20] [--percent-bases 40] [--max-n 15] [--threads 8]
+# python3 fastq_filter.py benchmark [--reads 200000] [--length 150]
+
+# Import modules
+import argparse
+import gzip
+import itertools
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+from helper_functions import open_fastq, fastq_read_name
+
+# Number of read pairs per chunk sent to a worker process
+CHUNK_PAIRS = 50000
+
+NEWLINE = ord('\n')
+
+
+def _line_counts(lines, mask_function):
+    # This function joins lines (each ending with a newline, except possibly the last line of a
+    # file) into one uint8 array and returns, per line, the number of bases (excluding the
+    # newline) and the number of bases for which mask_function(array) is True
+    joined = np.frombuffer(b''.join(lines), dtype=np.uint8)
+    lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+    if not len(lines):
+        return lengths, lengths
+    ends = np.cumsum(lengths)
+    bases = lengths - (joined[ends - 1] == NEWLINE)
+    if lengths.min() == lengths.max() and bases.min() == bases.max():
+        # Reads of equal length (the usual case): one row per read
+        rows = mask_function(joined.reshape(len(lines), -1)).view(np.uint8)
+        return bases, rows.sum(axis=1, dtype=np.int64)
+    # Every line holds at least one byte, so reduceat never sees an empty segment
+    counts = np.add.reduceat(mask_function(joined), ends - lengths, dtype=np.int64)
+    return bases, counts
+
+
+def reads_passing(records, phred=33, min_quality=20, percent_bases=40, max_n=15):
+    # This function takes a list of fastq lines (four per record) as input and returns a boolean
+    # array, True for each record passing the quality and ambiguous base rules
+    threshold = phred + min_quality
+    bases, good = _line_counts(records[3::4], lambda quals: quals >= threshold)
+    _, ambiguous = _line_counts(records[1::4], lambda seqs: (seqs | 0x20) == ord('n'))
+    # Integer comparison avoids rounding of the percentage
+    return (good * 100 >= percent_bases * bases) & (bases > 0) & (ambiguous <= max_n)
+
+
+def filter_chunk(args):
+    # This function takes a chunk of R1 and R2 fastq lines and the filter settings as input and
+    # returns (gzip-compressed interleaved kept pairs, number of pairs, number of pairs kept).
+    # If compresslevel is None, the kept pairs are returned uncompressed.
+    lines1, lines2, first_record, settings, compresslevel = args
+    if list(map(fastq_read_name, lines1[0::4])) != list(map(fastq_read_name, lines2[0::4])):
+        for offset, (header1, header2) in enumerate(zip(lines1[0::4], lines2[0::4])):
+            if fastq_read_name(header1) != fastq_read_name(header2):
+                raise IOError("Fastq Id differences at record %d (%s != %s)"
+                              % (first_record + offset, header1.rstrip().decode(),
+                                 header2.rstrip().decode()))
+    keep = np.flatnonzero(reads_passing(lines1, **settings) & reads_passing(lines2, **settings))
+    # Gather the lines of the kept pairs, R1 record then R2 record
+    kept = []
+    for index in (4 * keep).tolist():
+        kept += lines1[index:index + 4]
+        kept += lines2[index:index + 4]
+    # The last line of a file may lack a newline
+    if not (lines1[-1].endswith(b'\n') and lines2[-1].endswith(b'\n')):
+        kept = [line if line.endswith(b'\n') else line + b'\n' for line in kept]
+    data = b''.join(kept)
+    if compresslevel is not None:
+        data = gzip.compress(data, compresslevel)
+    return data, len(lines1) // 4, len(keep)
+
+
+def _paired_chunks(file1, file2, settings, compresslevel, chunk_pairs):
+    # Yield the worker arguments for each chunk of read pairs of both files
+    with open_fastq(file1) as fastq1, open_fastq(file2) as fastq2:
+        first_record = 1
+        while True:
+            lines1 = list(itertools.islice(fastq1, 4 * chunk_pairs))
+            lines2 = list(itertools.islice(fastq2, 4 * chunk_pairs))
+            if len(lines1) != len(lines2) or len(lines1) % 4:
+                raise IOError("Fastq record count differs or is truncated: %s, %s after record %d"
+                              % (file1, file2,
+                                 first_record - 1 + min(len(lines1), len(lines2)) // 4))
+            if not lines1:
+                return
+            yield lines1, lines2, first_record, settings, compresslevel
+            first_record += len(lines1) // 4
+
+
+def filter_pairs(file1, file2, output, phred=33, min_quality=20, percent_bases=40, max_n=15,
+                 threads=1, compresslevel=6, chunk_pairs=CHUNK_PAIRS):
+    # This function filters a pair of (optionally gzipped) fastq files and writes the pairs in
+    # which both mates pass to output as interleaved fastq (gzip-compressed if output ends in
+    # .gz). Returns (number of pairs, number of pairs kept).
+    settings = {'phred': phred, 'min_quality': min_quality,
+                'percent_bases': percent_bases, 'max_n': max_n}
+    if not output.endswith('.gz'):
+        compresslevel = None
+    chunks = _paired_chunks(file1, file2, settings, compresslevel, chunk_pairs)
+    start = time.time()
+    total = kept = 0
+    temp_output = "%s.tmp.%d" % (output, os.getpid())
+    pool = multiprocessing.Pool(threads) if threads > 1 else None
+    try:
+        results = pool.imap(filter_chunk, chunks) if pool else map(filter_chunk, chunks)
+        with open(temp_output, 'wb') as filtered:
+            for data, pairs, pairs_kept in results:
+                filtered.write(data)
+                total += pairs
+                kept += pairs_kept
+    except BaseException:
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+        raise
+    finally:
+        if pool:
+            pool.terminate()
+    os.replace(temp_output, output)
+    elapsed = max(time.time() - start, 1e-9)
+    print("Kept %d of %d fastq pairs in %.1f s (%.0f pairs/s): %s, %s"
+          % (kept, total, elapsed, total / elapsed, file1, file2))
+    return total, kept
+
+
+def reference_passing(record, phred=33, min_quality=20, percent_bases=40, max_n=15):
+    # This function applies the filter rules to one record (four lines) read by read, as
+    # fastq_quality_filter does. Used by the benchmark to check the vectorised filter.
+    sequence, quality = record[1].rstrip(b'\n'), record[3].rstrip(b'\n')
+    good = sum(1 for value in quality if value >= phred + min_quality)
+    ambiguous = sequence.upper().count(b'N')
+    return len(quality) > 0 and good * 100 >= percent_bases * len(quality) and ambiguous <= max_n
+
+
+def synthetic_pairs(number, length, seed=1):
+    # This function returns two lists of fastq lines (R1, R2) of random reads, with qualities
+    # spread around the default threshold and runs of N bases in about 10% of reads
+    rng = np.random.default_rng(seed)
+    lines = []
+    for mate in (1, 2):
+        mean_quality = rng.integers(10, 41, size=(number, 1))
+        qualities = np.clip(mean_quality + rng.integers(-8, 9, size=(number, length)), 2, 41) + 33
+        sequences = np.frombuffer(b'ACGT', dtype=np.uint8)[rng.integers(0, 4, (number, length))]
+        runs = np.flatnonzero(rng.random(number) < 0.1)
+        positions = rng.integers(0, length, len(runs))
+        run_lengths = rng.integers(1, 31, len(runs))
+        for read, position, run_length in zip(runs, positions, run_lengths):
+            sequences[read, position:position + run_length] = ord('N')
+        mate_lines = []
+        for index, (sequence, quality) in enumerate(zip(sequences.astype(np.uint8),
+                                                        qualities.astype(np.uint8))):
+            mate_lines.extend([b'@read%d/%d\n' % (index, mate), sequence.tobytes() + b'\n',
+                               b'+\n', quality.tobytes() + b'\n'])
+        lines.append(mate_lines)
+    return lines[0], lines[1]
+
+
+def benchmark(reads, length, chunk_pairs=CHUNK_PAIRS):
+    # This function times the vectorised filter (one process) on synthetic reads against the
+    # per-read reference implementation, checks both keep the same pairs, and times
+    # fastq_quality_filter on the same R1 reads if it is installed
+    lines1, lines2 = synthetic_pairs(reads, length)
+    settings = {'phred': 33, 'min_quality': 20, 'percent_bases': 40, 'max_n': 15}
+    print('method\treads\tseconds\treads_per_second')
+
+    start = time.perf_counter()
+    vectorised = []
+    for first in range(0, len(lines1), 4 * chunk_pairs):
+        vectorised.append(filter_chunk((lines1[first:first + 4 * chunk_pairs],
+                                        lines2[first:first + 4 * chunk_pairs],
+                                        first // 4 + 1, settings, None))[0])
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print('vectorised\t%d\t%.3f\t%.0f' % (2 * reads, elapsed, 2 * reads / elapsed))
+
+    start = time.perf_counter()
+    reference = []
+    for index in range(reads):
+        record1, record2 = lines1[4 * index:4 * index + 4], lines2[4 * index:4 * index + 4]
+        if reference_passing(record1, **settings) and reference_passing(record2, **settings):
+            reference.extend(record1 + record2)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print('per_read\t%d\t%.3f\t%.0f' % (2 * reads, elapsed, 2 * reads / elapsed))
+    if b''.join(vectorised) != b''.join(reference):
+        raise AssertionError("Vectorised and per-read filters kept different reads")
+
+    tool = shutil.which('fastq_quality_filter')
+    if tool:
+        with tempfile.NamedTemporaryFile(suffix='.fastq') as fastq:
+            fastq.write(b''.join(lines1))
+            fastq.flush()
+            start = time.perf_counter()
+            subprocess.run([tool, '-Q', '33', '-q', '20', '-p', '40', '-i', fastq.name,
+                            '-o', os.devnull], check=True)
+            elapsed = max(time.perf_counter() - start, 1e-9)
+        print('fastq_quality_filter\t%d\t%.3f\t%.0f' % (reads, elapsed, reads / elapsed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Vectorised paired fastq quality filter")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run = subparsers.add_parser('filter', help="Filter a pair of fastq files")
+    run.add_argument('fastq1', help="R1 fastq file (optionally gzipped)")
+    run.add_argument('fastq2', help="R2 fastq file (optionally gzipped)")
+    run.add_argument('output', help="Output: interleaved kept pairs (.gz to compress)")
+    run.add_argument('-Q', '--phred', type=int, default=33, help="Quality score offset")
+    run.add_argument('-q', '--min-quality', type=int, default=20, help="Minimum base quality")
+    run.add_argument('-p', '--percent-bases', type=int, default=40,
+                     help="Minimum percent of bases with at least the minimum quality")
+    run.add_argument('-n', '--max-n', type=int, default=15, help="Maximum number of N bases")
+    run.add_argument('--threads', type=int, default=1)
+    bench = subparsers.add_parser('benchmark', help="Time the filter on synthetic reads")
+    bench.add_argument('--reads', type=int, default=200000, help="Number of read pairs")
+    bench.add_argument('--length', type=int, default=150, help="Read length")
+    args = parser.parse_args()
+
+    if args.command == 'benchmark':
+        benchmark(args.reads, args.length)
+    else:
+        filter_pairs(args.fastq1, args.fastq2, args.output, args.phred, args.min_quality,
+                     args.percent_bases, args.max_n, args.threads)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: kmer_cutoff.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a k-mer abundance histogram (output of khmer abundance-dist.py) as input
+# and chooses the minimum k-mer abundance for filtering, i.e. the value previously written to
+# MIN_FREQ.txt by hand after looking at the histogram plot.
+#
+# The histogram of k-mer counts per abundance has a peak at abundance 1 (k-mers containing
+# sequencing errors) that falls to a valley before rising to the genomic peak (k-mers present
+# in the genome, at around the k-mer coverage). The cutoff is the valley: the first local
+# minimum of the log counts after smoothing with a moving average, found from the sign change
+# of the derivative.
+#
+# The confidence score (0-1) is the relative depth of the valley below the genomic peak:
+# 1 - count(valley) / count(peak). Close to 1 for a clear separation, close to 0 when the
+# error and genomic peaks merge. It is 0 if no valley or genomic peak is found.
+#
+# Usage:
+# python3 kmer_cutoff.py <histogram> <output> [--window 5]
+# Output: two lines, 'cutoff<TAB><int>' and 'confidence<TAB><float>'
+
+# Import modules
+import argparse
+
+import numpy as np
+
+
+def read_histogram(histogram_file):
+    # This function takes an abundance-dist.py output file (comma- or space-delimited, with or
+    # without header) as input and returns an array of counts where element i holds the
+    # number of distinct k-mers with abundance i
+    abundances, counts = [], []
+    with open(histogram_file) as histogram:
+        for line in histogram:
+            fields = line.replace(',', ' ').split()
+            if len(fields) < 2 or not fields[0].isdigit():
+                continue
+            abundances.append(int(fields[0]))
+            counts.append(float(fields[1]))
+    hist = np.zeros(max(abundances, default=0) + 1)
+    hist[abundances] = counts
+    return hist
+
+
+def smooth(values, window):
+    # This function returns the moving average of values over window points, shrinking the
+    # window at either end so the output has the same length as the input
+    kernel = np.ones(window)
+    totals = np.convolve(values, kernel, mode='same')
+    points = np.convolve(np.ones(len(values)), kernel, mode='same')
+    return totals / points
+
+
+def choose_cutoff(hist, window=5):
+    # This function takes a k-mer abundance histogram as input and returns the abundance
+    # cutoff and a confidence score (see above). If no valley is found, returns (None, 0.0).
+    if len(hist) < 3:
+        return None, 0.0
+    # Abundance 0 is not part of the distribution
+    log_counts = smooth(np.log1p(hist[1:]), window)
+    slope = np.diff(log_counts)
+    # A valley is where the smoothed counts stop falling and start rising
+    rising = np.flatnonzero((slope[:-1] < 0) & (slope[1:] >= 0))
+    if len(rising) == 0:
+        return None, 0.0
+    valley = int(rising[0]) + 1
+    if valley + 1 >= len(log_counts):
+        return valley + 1, 0.0
+    peak = valley + int(np.argmax(log_counts[valley:]))
+    if peak == valley:
+        return valley + 1, 0.0
+    valley_count = np.expm1(log_counts[valley])
+    peak_count = np.expm1(log_counts[peak])
+    confidence = float(max(0.0, 1.0 - valley_count / peak_count)) if peak_count > 0 else 0.0
+    # Index 0 of log_counts is abundance 1
+    return valley + 1, confidence
+
+
+def write_cutoff(output, cutoff, confidence):
+    # This function writes the cutoff and the confidence score
+    with open(output, 'w') as cutoff_file:
+        cutoff_file.write('cutoff\t%s\nconfidence\t%.3f\n'
+                          % ('NA' if cutoff is None else cutoff, confidence))
+
+
+def read_cutoff(cutoff_file):
+    # This function reads a file written by write_cutoff and returns (cutoff, confidence)
+    values = {}
+    with open(cutoff_file) as cutoffs:
+        for line in cutoffs:
+            key, value = line.split('\t')
+            values[key] = value.strip()
+    cutoff = None if values['cutoff'] == 'NA' else int(values['cutoff'])
+    return cutoff, float(values['confidence'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Choose a k-mer abundance cutoff")
+    parser.add_argument('histogram', help="abundance-dist.py output")
+    parser.add_argument('output', help="Output: cutoff and confidence score")
+    parser.add_argument('--window', type=int, default=5,
+                        help="Moving average window (abundance values) for smoothing")
+    args = parser.parse_args()
+    cutoff, confidence = choose_cutoff(read_histogram(args.histogram), args.window)
+    write_cutoff(args.output, cutoff, confidence)
+    print("cutoff: %s, confidence: %.3f" % (cutoff, confidence))
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: paired_reads.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script contains custom defined functions used by read_filtering_snakefile.py to:
+# 1) Write gzip-compressed fastq in parallel: data is cut into blocks that are compressed on a
+#    process pool and written in order as concatenated gzip members (a valid gzip file)
+# 2) Clean a k-mer filtered interleaved fastq file in one streaming pass, replacing
+#    seqtk seq -L, extract-paired-reads.py and split-paired-reads.py:
+#      - reads shorter than a minimum length are dropped
+#      - consecutive reads with the same name are written to the R1 and R2 outputs
+#      - reads left without a mate (orphans) are written to the single-end output
+# 3) Interleave a pair of fastq files in one pass, checking that the read names of each pair
+#    agree (replacing check_identical_fastq_headers followed by interleave-reads.py). The first
+#    pair with different names, or a file with fewer records, stops the run with its position.
+#    In read_filtering_snakefile.py pairs are interleaved and checked by filter_pairs
+#    (fastq_filter.py) while filtering; this is for pairs that are not filtered.
+#
+# Requires helper_functions.py (from 01_quality_assessment) in the same directory.
+#
+# Usage:
+# python3 paired_reads.py clean <interleaved.fastq.gz> <R1.fastq.gz> <R2.fastq.gz>
+#        <single.fastq.gz> [--min-length 50] [--threads 4]
+# python3 paired_reads.py interleave <R1.fastq[.gz]> <R2.fastq[.gz]> <R1_R2.fastq.gz>
+#        [--threads 4] [--no-reformat]
+
+# Import modules
+import argparse
+import collections
+import gzip
+import itertools
+import multiprocessing
+import os
+import time
+
+from helper_functions import open_fastq, fastq_read_name
+
+# Size (bytes of uncompressed fastq) of the blocks compressed in parallel
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class BlockWriter:
+    # Writes gzip-compressed data to a file, compressing blocks of BLOCK_SIZE bytes on a shared
+    # process pool (or in this process if pool is None). Writes to a temporary file that
+    # replaces output on close(), so an interrupted run leaves no partial output.
+    def __init__(self, output, pool=None, compresslevel=6, block_size=BLOCK_SIZE, max_pending=16):
+        self.output = output
+        self.temp_output = "%s.tmp.%d" % (output, os.getpid())
+        self.handle = open(self.temp_output, 'wb')
+        self.pool = pool
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.buffer = []
+        self.buffered = 0
+        self.pending = collections.deque()
+        # Blocks in flight are bounded so memory does not grow with a slow disk
+        self.max_pending = max_pending
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.block_size:
+            self._submit()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def _submit(self):
+        data = b''.join(self.buffer)
+        self.buffer, self.buffered = [], 0
+        if self.pool is None:
+            self.handle.write(gzip.compress(data, self.compresslevel))
+            return
+        self.pending.append(self.pool.apply_async(gzip.compress, (data, self.compresslevel)))
+        while len(self.pending) > self.max_pending:
+            self.handle.write(self.pending.popleft().get())
+
+    def close(self):
+        # Compress the last block (an empty member if nothing was written, so the output is
+        # still a valid gzip file) and wait for all blocks to be written
+        if self.buffer or (self.handle.tell() == 0 and not self.pending):
+            self._submit()
+        while self.pending:
+            self.handle.write(self.pending.popleft().get())
+        self.handle.close()
+        os.replace(self.temp_output, self.output)
+
+    def discard(self):
+        # Remove the temporary file after an error
+        self.handle.close()
+        if os.path.exists(self.temp_output):
+            os.remove(self.temp_output)
+
+
+def fastq_records(path):
+    # This function takes a path to a (optionally gzipped) fastq file as input and yields each
+    # record as a tuple of four lines, raising an error if the last record is truncated
+    with open_fastq(path) as fastq:
+        for number, header in enumerate(fastq, 1):
+            record = (header, next(fastq, None), next(fastq, None), next(fastq, None))
+            if record[3] is None:
+                raise IOError("Truncated fastq record %d in: %s" % (number, path))
+            if not header.startswith(b'@'):
+                raise IOError("Malformed fastq record %d in: %s" % (number, path))
+            if not record[3].endswith(b'\n'):
+                record = record[:3] + (record[3] + b'\n',)
+            yield record
+
+
+def clean_interleaved(interleaved, output1, output2, single_output, min_length=50, threads=1,
+                      compresslevel=6):
+    # This function takes an interleaved fastq file as input and in one pass drops reads shorter
+    # than min_length, writes the pairs (consecutive reads with the same read name) to output1
+    # and output2 and reads without a mate to single_output, all gzip-compressed.
+    # Returns a dictionary of read counts.
+    counts = {'reads': 0, 'short': 0, 'pairs': 0, 'single': 0}
+    start = time.time()
+    pool = multiprocessing.Pool(threads) if threads > 1 else None
+    writers = [BlockWriter(path, pool, compresslevel)
+               for path in (output1, output2, single_output)]
+    first, second, single = writers
+    try:
+        pending, pending_name = None, None
+        for record in fastq_records(interleaved):
+            counts['reads'] += 1
+            if len(record[1]) - 1 < min_length:
+                counts['short'] += 1
+                continue
+            name = fastq_read_name(record[0])
+            if pending is not None and name == pending_name:
+                first.writelines(pending)
+                second.writelines(record)
+                counts['pairs'] += 1
+                pending, pending_name = None, None
+                continue
+            if pending is not None:
+                single.writelines(pending)
+                counts['single'] += 1
+            pending, pending_name = record, name
+        if pending is not None:
+            single.writelines(pending)
+            counts['single'] += 1
+        for writer in writers:
+            writer.close()
+    except BaseException:
+        for writer in writers:
+            writer.discard()
+        raise
+    finally:
+        if pool:
+            pool.terminate()
+    elapsed = max(time.time() - start, 1e-9)
+    print("%d reads in %.1f s (%.0f reads/s): %d pairs, %d single, %d shorter than %d: %s"
+          % (counts['reads'], elapsed, counts['reads'] / elapsed, counts['pairs'],
+             counts['single'], counts['short'], min_length, interleaved))
+    return counts
+
+
+def mate_header(header, mate):
+    # This function returns a fastq header with the read name ending in /1 or /2 (mate), as
+    # interleave-reads.py writes them, keeping any comment after the name
+    fields = header.rstrip(b'\n').split(None, 1)
+    suffix = b'/%d' % mate
+    if not fields[0].endswith(suffix):
+        fields[0] = (fields[0][:-2] if fields[0].endswith((b'/1', b'/2')) else fields[0]) + suffix
+    return b' '.join(fields) + b'\n'
+
+
+def interleave_pairs(file1, file2, output, threads=1, reformat=True, compresslevel=6):
+    # This function takes two (optionally gzipped) fastq files as input and writes the records
+    # interleaved (R1, R2, R1, R2, ...) to output, gzip-compressed. The read names of each
+    # pair are compared on the way; the first mismatch raises an error reporting the (1-based)
+    # record number and line of both files. If reformat is True, read names end in /1 and /2.
+    # Returns the number of pairs.
+    start = time.time()
+    pool = multiprocessing.Pool(threads) if threads > 1 else None
+    writer = BlockWriter(output, pool, compresslevel)
+    count = 0
+    try:
+        records = itertools.zip_longest(fastq_records(file1), fastq_records(file2))
+        for count, (record1, record2) in enumerate(records, 1):
+            if record1 is None or record2 is None:
+                longer, shorter = (file2, file1) if record1 is None else (file1, file2)
+                raise IOError("Fastq record count differs: %s ends after %d records, %s has more"
+                              % (shorter, count - 1, longer))
+            if fastq_read_name(record1[0]) != fastq_read_name(record2[0]):
+                raise IOError("Fastq Id differences between: %s, %s at record %d (line %d): "
+                              "%s != %s" % (file1, file2, count, 4 * count - 3,
+                                            record1[0].rstrip().decode(),
+                                            record2[0].rstrip().decode()))
+            if reformat:
+                record1 = (mate_header(record1[0], 1),) + record1[1:]
+                record2 = (mate_header(record2[0], 2),) + record2[1:]
+            writer.writelines(record1)
+            writer.writelines(record2)
+        writer.close()
+    except BaseException:
+        writer.discard()
+        raise
+    finally:
+        if pool:
+            pool.terminate()
+    elapsed = max(time.time() - start, 1e-9)
+    print("Interleaved %d fastq pairs in %.1f s (%.0f pairs/s): %s, %s"
+          % (count, elapsed, count / elapsed, file1, file2))
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Paired fastq cleaning and parallel gzip")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    clean = subparsers.add_parser('clean', help="Length filter and split an interleaved file")
+    clean.add_argument('interleaved', help="Interleaved fastq file (optionally gzipped)")
+    clean.add_argument('output1', help="Output: R1 of pairs (.fastq.gz)")
+    clean.add_argument('output2', help="Output: R2 of pairs (.fastq.gz)")
+    clean.add_argument('single', help="Output: reads without a mate (.fastq.gz)")
+    clean.add_argument('-L', '--min-length', type=int, default=50,
+                       help="Drop reads shorter than this (default: 50)")
+    clean.add_argument('--threads', type=int, default=1)
+    interleave = subparsers.add_parser('interleave', help="Interleave a pair of fastq files")
+    interleave.add_argument('fastq1', help="R1 fastq file (optionally gzipped)")
+    interleave.add_argument('fastq2', help="R2 fastq file (optionally gzipped)")
+    interleave.add_argument('output', help="Output: interleaved fastq (.fastq.gz)")
+    interleave.add_argument('--threads', type=int, default=1)
+    interleave.add_argument('--no-reformat', action='store_true',
+                            help="Keep read names as they are (no /1 and /2)")
+    args = parser.parse_args()
+
+    if args.command == 'interleave':
+        interleave_pairs(args.fastq1, args.fastq2, args.output, args.threads,
+                         not args.no_reformat)
+    else:
+        clean_interleaved(args.interleaved, args.output1, args.output2, args.single,
+                          args.min_length, args.threads)
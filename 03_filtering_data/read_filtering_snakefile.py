@@ -11,6 +11,11 @@ import os.path
 import tempfile
 
 from helper_functions import *
+from fastq_filter import filter_pairs
+from paired_reads import clean_interleaved
+from kmer_counting import (estimate_distinct_kmers, table_parameters, write_sizing, read_sizing,
+                           count_partitioned, store_histogram, write_histogram, trim_reads)
+from kmer_cutoff import choose_cutoff, read_histogram, write_cutoff, read_cutoff
 
 # This script takes two fastq files (i.e. pairs) per sample(s) as input and filters
 #  input reads to remove low quality and ambigious sequences for one or more samples.
@@ -25,33 +30,46 @@ from helper_functions import *
 #    - Defines the expected final output of the Snakefile.
 # rule trim_reads:
 #    - For each input, a number of bases (INT) will be removed from left (-b) or from right (-e)
-# rule interleave_reads:
-#    - Pair-end trimmed sequences will be interleaved into a seperate file per sample.
-#    The rule checks if sequence headers for each input pair contain the same header information.
-#    If they differ, an error is raused.
 # rule filter_merged_reads:
-#    - For each sample, interleaved sequences will be filtered based on average base quality.
-#    - Sequences must contain at least 75% of bases with a quality score of >=20 to be retained.
-#    - Sequences with ambigious 'N' bases will be removed.
-# rule combine:
-#     - Prior to k-mer counting (a step that takes all samples as input), filtered and merged files
-#     are combined together.
+#    - For each sample, paired sequences will be filtered based on base quality (fastq_filter.py).
+#    - Pairs are interleaved as they are filtered, so no separate interleaving step is run. Read
+#    names of each pair are checked on the way; if they differ, an error is raised at the first
+#    mismatched pair.
+#    - Sequences must contain at least PERCENT_BASES % of bases with a quality score of
+#    >= MIN_QUALITY to be retained.
+#    - Sequences with more than N_BASES ambigious 'N' bases will be removed.
+#    - A pair is kept only if both sequences pass; kept pairs are written interleaved.
+# rule combine_samples:
+#     - Only used if COMBINE_MODE is 'concatenate'. Prior to k-mer counting (a step that takes all
+#     samples as input), filtered and merged files are combined together by concatenating the
+#     gzip files as they are (concatenated gzip members are a valid gzip file), without
+#     decompressing and recompressing.
+# rule estimate_kmer_table:
+#     - Estimates the number of distinct k-mers of all input reads (HyperLogLog, one pass)
+#     and chooses the number and size of k-mer count tables for TARGET_FPR within KMER_MEMORY
+#     (see kmer_counting.py).
 # rule count_kmers:
-#     - Builds a k-mer count table populated by k-mers (size=31) present within input.
+#     - Builds a k-mer count table populated by k-mers (size=31) present within input. If
+#     COMBINE_MODE is 'direct', the per-sample filtered files are read directly and the combined
+#     file is never written. If COUNT_MODE is 'partitioned', k-mers are counted exactly in
+#     partitions on disk within KMER_MEMORY instead of in a khmer count table.
 # rule calculate_distribution:
 #     - Calculates the abundance distribution of k-mers within input w/ pre-made k-mer count table.
 # rule plot_distribution:
-#     - Plots k-mer abundance vs count using a custom R script.
+#     - Plots k-mer abundance vs count using a custom R script (kept for audit of the cutoff).
+# rule choose_kmer_cutoff:
+#     - Chooses the minimum k-mer abundance to filter from the valley between the error peak and
+#     the genomic peak of the k-mer abundance distribution (see kmer_cutoff.py), and scores
+#     the confidence of the choice.
 # rule filter_kmers:
-#     - Initial Snakefile run will fail at this step due to the absence of MIN_FREQ.txt.
-#     - MIN_FREQ.txt contains the minimum k-mer abundance to filter and must be populated based off
-#     visual examination of plot generated by rule plot_distribution.
-#     - Once stated in MIN_FREQ.txt, rule will trim input sequences at minimum k-mer abundace.
-# rule remove_truncated_sequences:
-#     - Removes truncated k-mer filtered sequences below a specified length (-L)
-#     - Drops orphan sequences generated by k-mer filtering steps.
-# rule split_cleaned_reads:
-#     - Split cleaned interleaved sequences into individual pairs resulting in the generation of
+#     - Trims input sequences at the minimum k-mer abundance chosen by rule choose_kmer_cutoff
+#     (or KMER_CUTOFF if set). Fails if the confidence is below MIN_CUTOFF_CONFIDENCE, in which
+#     case set KMER_CUTOFF after looking at the plot generated by rule plot_distribution.
+# rule clean_kmer_free_reads:
+#     - In one pass over the k-mer filtered sequences (see paired_reads.py):
+#     - Removes truncated k-mer filtered sequences below a specified length (MIN_LENGTH)
+#     - Writes orphan sequences generated by k-mer filtering steps to a single-end file.
+#     - Splits cleaned interleaved sequences into individual pairs resulting in the generation of
 #     two fastq files.
 
 
@@ -78,10 +96,11 @@ from helper_functions import *
 # To run read_filtering_snakefile.py:
 #  1. Download and install the following software:
 #   seqtk (https://github.com/lh3/seqtk)
-#   fastx_toolkit (http://hannonlab.cshl.edu/fastx_toolkit/download.html)
+#   python modules: numpy
 #   khmer (https://github.com/dib-lab/khmer)
 #
-#  2. Ensure helper_functions.py is within the same directory of the Snakefile.
+#  2. Ensure helper_functions.py, fastq_filter.py, paired_reads.py, kmer_counting.py and
+#  kmer_cutoff.py are within the same directory of the Snakefile.
 #
 #  3. Assign global variables for use within specific rules
 #     Please see section below for further information on variable to be assigned
@@ -128,23 +147,57 @@ MIN_QUALITY                   = 20
 # For rule filter_merged_reads specify minimum percent of bases that must have minimum quality
 PERCENT_BASES                 = 40
 
+# For rule filter_merged_reads specify maximum number of 'N' bases per read
 N_BASES                       = 15
 
+# For rule filter_merged_reads specify number of processes filtering chunks of reads
+FILTER_THREADS                = 8
+
+# For rules count_kmers and calculate_distribution, specify how filtered samples are combined:
+# 'direct' reads the per-sample files (no combined file is written), 'concatenate' writes
+# COMBINED_DATA by concatenating the per-sample gzip files.
+COMBINE_MODE                  = "direct"
+
 # For rule count_kmers specify k-mer length for generation of count table
 KMER_LENGTH                   = 31
 
-# For rule count_kmers, specify the number of tables to use
-NUM_TABLES                    = 10
+# For rule count_kmers, specify 'table' (khmer count table) or 'partitioned' (exact counts in
+# partitions on disk, for nodes without the memory for a count table of TARGET_FPR)
+COUNT_MODE                    = "table"
+
+# For rules estimate_kmer_table and count_kmers, specify memory budget (bytes) for counting
+KMER_MEMORY                   = 64e9
+
+# For rule estimate_kmer_table, specify target false positive rate of the count table
+TARGET_FPR                    = 0.01
 
-# For rule count_kmers, specify hashtable size
-TABLE_SIZE                    = 8e9
+# For rule estimate_kmer_table, specify number of processes hashing k-mers
+ESTIMATE_THREADS              = 16
+
+# For rule count_kmers, specify the number of tables to use. Leave as None to use the estimate
+# of rule estimate_kmer_table
+NUM_TABLES                    = None
+
+# For rule count_kmers, specify hashtable size. Leave as None to use the estimate of rule
+# estimate_kmer_table
+TABLE_SIZE                    = None
 
 # For rule filter_kmers; Snakemake will use min(MAX_THREADS, --cores)
 MAX_THREADS                   = 80
 
-# For rule remove_truncated_sequences specify minimum length of reads to retain post-filtering
+# For rule filter_kmers, minimum k-mer abundance to keep. Leave as None to use the cutoff chosen
+# by rule choose_kmer_cutoff; set an INT to override it after looking at HISTOGRAM_PLOT.
+KMER_CUTOFF                   = None
+
+# For rule filter_kmers, minimum confidence score (0-1) of the chosen cutoff to continue
+MIN_CUTOFF_CONFIDENCE         = 0.5
+
+# For rule clean_kmer_free_reads specify minimum length of reads to retain post-filtering
 MIN_LENGTH                    = 50 # To be calculated based off length of trimmed reads
 
+# For rule clean_kmer_free_reads specify number of processes compressing the outputs
+CLEANUP_THREADS               = 4
+
 ##############################################################################
 # Assignment of wildcards to be used within rules
 ##############################################################################
@@ -167,9 +220,6 @@ ADAPTOR_REMOVED      = "temp/01_adaptor_removed/{sample}.R1.fastq",\
                        "temp/01_adaptor_removed/{sample}.R2.fastq",\
                        "temp/01_adaptor_removed/{sample}.R2.unpaired.fastq"
 
-# Output interleaved data here:
-INTERLEAVED_DATA          = "results/01_interleaved/{sample}.R1_R2.fastq.gz"
-
 # Output quality filtered data here
 FILTERED_DATA              = "results/02_filtered/{sample}.R1_R2.fastq.gz"
 
@@ -189,21 +239,24 @@ COMBINED_DATA        = "results/03_combined/combined_total.R1_R2.fastq.gz"
 # Output k-mer count data here
 COUNT_DATA           = "results/04_count/combined.R1_R2.ct"
 
+# Output estimated number of distinct k-mers and count table sizes here
+SIZING_DATA          = "results/04_count/combined.R1_R2.sizing.txt"
+
+# Output partitioned k-mer counts here (COUNT_MODE 'partitioned')
+COUNT_STORE          = "results/04_count/combined.R1_R2.partitions.txt"
+
 # Output histogram data here
 HISTOGRAM_DATA       = "results/04_count/combined.R1_R2.histo"
 
 # Output plotted .png file here
 HISTOGRAM_PLOT       = "temp/07_count/combined.R1_R2.histo.png"
 
+# Output chosen k-mer abundance cutoff and confidence score here
+CUTOFF_DATA          = "results/04_count/combined.R1_R2.cutoff.txt"
+
 # Output K-mer free paired-end fastq here
 KMER_FREE_DATA       = "results/05_kmer_free/{sample}.R1_R2.fastq.gz"
 
-# Output for cleaned data
-CLEANED_DATA         = "results/06_length_filtered/{sample}.R1_R2.fastq.gz"
-
-# Output split final cleaned data here
-PAIRED_DATA          = "results/07_extract_clean/{sample}.R1_R2.fastq.gz"
-
 # Output single "orphan" reads here
 SINGLE_DATA          = "results/07_extract_clean/{sample}.R1_R2_single.fastq.gz"
 
@@ -211,6 +264,22 @@ SINGLE_DATA          = "results/07_extract_clean/{sample}.R1_R2_single.fastq.gz"
 SPLIT_DATA           = ["results/08_split_clean/{sample}.R1.fastq.gz",
                        "results/08_split_clean/{sample}.R2.fastq.gz"]
 
+# Input of k-mer counting: the per-sample filtered files or the combined file
+if COMBINE_MODE == "direct":
+    KMER_INPUT       = expand(FILTERED_DATA, sample=SAMPLES)
+elif COMBINE_MODE == "concatenate":
+    KMER_INPUT       = [COMBINED_DATA]
+else:
+    raise ValueError("COMBINE_MODE should be 'direct' or 'concatenate', got: %s" % COMBINE_MODE)
+
+# K-mer counts: a khmer count table or a partitioned k-mer store
+if COUNT_MODE == "table":
+    KMER_COUNTS      = COUNT_DATA
+elif COUNT_MODE == "partitioned":
+    KMER_COUNTS      = COUNT_STORE
+else:
+    raise ValueError("COUNT_MODE should be 'table' or 'partitioned', got: %s" % COUNT_MODE)
+
 ##############################################################################
 # Define binaries in context of path relative to Snakefile
 ##############################################################################
@@ -225,12 +294,9 @@ tools = {}
 ve_path = 'KhmerEnv/bin/'
 print(ve_path)
 
-tools['interleave']           = os.path.join(ve_path, 'interleave-reads.py')
 tools['filter_abund']         = os.path.join(ve_path, 'filter-abund.py')
 tools['load_into_counting']   = os.path.join(ve_path, 'load-into-counting.py')
 tools['abundance_dist']       = os.path.join(ve_path, 'abundance-dist.py')
-tools['extract']              = os.path.join(ve_path, 'extract-paired-reads.py')
-tools['split']                = os.path.join(ve_path, 'split-paired-reads.py')
 check_tools(tools)  # Probably redundant - Snakemake will fail and throw error if can't locate tool
 
 ##############################################################################
@@ -241,7 +307,8 @@ check_tools(tools)  # Probably redundant - Snakemake will fail and throw error i
 
 # First rule is list the final output
 rule all:
-    input: expand(KMER_FREE_DATA, sample=SAMPLES, pair=PAIR)
+    input: expand(SPLIT_DATA, sample=SAMPLES), expand(SINGLE_DATA, sample=SAMPLES),
+           HISTOGRAM_PLOT
         
 # Second rule is to identify and trim adaptors
 rule adaptor_removal:
@@ -252,57 +319,91 @@ rule adaptor_removal:
         shell("java -jar {tools[trim]} PE {input[0]} {input[1]} {output[0]} {output[1]}\
                {output[2]} {output[3]} ILLUMINACLIP:combined.TruSeq_adaptors.fa:2:30:10 MINLEN:36")
 
-# Interleave paired-end data and output
-rule interleave_reads:
-    input: expand("temp/02_trimmed/{{sample}}.{pair}.fastq", pair=PAIR)
-    output: MERGED_DATA
-    run:
-        try:
-            if len(input) != 2:
-                raise ValueError("Was expecting two input files, got: {input}")
-            check_identical_fastq_headers(input[0], input[1])
-            shell("{tools[interleave]} {input[0]} {input[1]} -o {output} && [[ -s {output} ]]")
-        except ValueError:
-            raise IOError("%s does not exist" % (input))
-    # seqtk interleaving is incompatible with split-paired-reads.py
-
-# Filter interleaved data by base score and remove ambiguous bases
+# Filter paired data by base score and remove ambiguous bases, writing kept pairs interleaved
 rule filter_merged_reads:
     input:  ADAPTOR_REMOVED
     output: FILTERED_DATA
+    threads: FILTER_THREADS
     run:
         check_files_arent_empty(input)
-        shell("{tools[fastq_quality_filter]} \
-              -Q {QUAL_PHRED} \
-              -q {MIN_QUALITY} \
-              -p {PERCENT_BASES} \
-              -i {input[0]} > {output} && [[ -s {output} ]]")
-
-# Combine all sequences
+        # Paired reads (R1 and R2, not the unpaired reads) are filtered together
+        filter_pairs(input[0], input[2], output[0],
+                     phred=QUAL_PHRED,
+                     min_quality=MIN_QUALITY,
+                     percent_bases=PERCENT_BASES,
+                     max_n=N_BASES,
+                     threads=threads)
+        check_files_arent_empty(output)
+
+# Combine all sequences (COMBINE_MODE 'concatenate' only)
 rule combine_samples:
-    input: expand("results/02_filtered/{sample}.R1_R2.fastq.gz", sample=SAMPLES)
+    input: expand(FILTERED_DATA, sample=SAMPLES)
     output: COMBINED_DATA
     run:
         check_files_arent_empty(input)
-        shell("zcat {input} | gzip > {output} && [[ -s {output} ]]")
+        shell("cat {input} > {output} && [[ -s {output} ]]")
 
-# Count k-mers using combined data
+# Estimate the number of distinct k-mers and choose count table sizes
+rule estimate_kmer_table:
+    input: KMER_INPUT
+    output: SIZING_DATA
+    threads: ESTIMATE_THREADS
+    run:
+        check_files_arent_empty(input)
+        distinct, total = estimate_distinct_kmers(input, KMER_LENGTH, threads)
+        sizing = table_parameters(distinct, total, KMER_MEMORY, TARGET_FPR)
+        write_sizing(output[0], sizing)
+        if sizing['memory_needed'] > KMER_MEMORY:
+            print("Warning: a count table of false positive rate %g needs %d bytes (budget: %d);"
+                  " expected rate within budget: %.3g. Consider COUNT_MODE = 'partitioned'."
+                  % (TARGET_FPR, sizing['memory_needed'], KMER_MEMORY, sizing['expected_fpr']))
+
+# Count k-mers using combined data (load-into-counting.py takes one or more input files)
 rule count_kmers:
-    input: COMBINED_DATA
-    output: COUNT_DATA
+    input: reads=KMER_INPUT, sizing=SIZING_DATA
+    output: KMER_COUNTS
     threads: MAX_THREADS
     run:
         check_files_arent_empty(input)
-        shell("{tools[load_into_counting]} -k {KMER_LENGTH} -N {NUM_TABLES} -T {threads}"
-              " -x {TABLE_SIZE} -b {output} {input} && [[ -s {output} ]]")
+        sizing = read_sizing(input.sizing)
+        if COUNT_MODE == "partitioned":
+            count_partitioned(input.reads, output[0], KMER_LENGTH, sizing['partitions'])
+        else:
+            num_tables = NUM_TABLES or sizing['num_tables']
+            table_size = TABLE_SIZE or sizing['table_size']
+            reads = " ".join(input.reads)
+            shell("{tools[load_into_counting]} -k {KMER_LENGTH} -N {num_tables} -T {threads}"
+                  " -x {table_size} -b {output} {reads} && [[ -s {output} ]]")
 
 # Generate a histogram for k-mer count and k-mer frequency
+# abundance-dist.py takes a single input file: in COMBINE_MODE 'direct' the per-sample files are
+# streamed to it through a named pipe, so the combined file is not written to disk
 rule calculate_distribution:
-    input: COUNT_DATA, COMBINED_DATA
+    input: KMER_COUNTS, KMER_INPUT
     output: HISTOGRAM_DATA
     run:
         check_files_arent_empty(input)
-        shell("{tools[abundance_dist]} {input[0]} {input[1]} {output} && [[ -s {output} ]]")
+        if COUNT_MODE == "partitioned":
+            write_histogram(output[0], store_histogram(input[0]))
+        elif len(input) == 2:
+            shell("{tools[abundance_dist]} {input[0]} {input[1]} {output} && [[ -s {output} ]]")
+        else:
+            reads = " ".join(input[1:])
+            pipe = os.path.join(tempfile.mkdtemp(dir=os.path.dirname(output[0])),
+                                "combined.R1_R2.fastq.gz")
+            os.mkfifo(pipe)
+            try:
+                # The exit status of cat is checked once abundance-dist.py is done, so a
+                # failed read of the inputs fails the rule rather than leaving a histogram of
+                # partial input
+                shell("cat {reads} > {pipe} & cat_pid=$!; \
+                       {tools[abundance_dist]} {input[0]} {pipe} {output} \
+                       && wait $cat_pid && [[ -s {output} ]]")
+            finally:
+                # Release cat if abundance-dist.py failed before opening the pipe
+                os.close(os.open(pipe, os.O_RDONLY | os.O_NONBLOCK))
+                os.remove(pipe)
+                os.rmdir(os.path.dirname(pipe))
 
 # Plot histogram
 rule plot_distribution:
@@ -312,17 +413,32 @@ rule plot_distribution:
         check_files_arent_empty(input)
         shell("Rscript makegraph.R {input} {output} && [[ -s {output} ]]")
 
+# Choose k-mer frequency cut-off from the valley of the k-mer abundance distribution
+rule choose_kmer_cutoff:
+    input: HISTOGRAM_DATA
+    output: CUTOFF_DATA
+    run:
+        check_files_arent_empty(input)
+        cutoff, confidence = choose_cutoff(read_histogram(input[0]))
+        write_cutoff(output[0], cutoff, confidence)
+        print("K-mer abundance cutoff: %s (confidence: %.3f)" % (cutoff, confidence))
+
 # Filter individual samples using k-mer frequency cut-off
 rule filter_kmers:
-    input: COUNT_DATA, FILTERED_DATA
+    input: KMER_COUNTS, FILTERED_DATA, CUTOFF_DATA
     output: KMER_FREE_DATA
     threads: MAX_THREADS
-    message: "Executing khmer filtering. If it fails, set cut value like: 'echo 15 > MIN_FREQ.txt' \
-              after looking at {HISTOGRAM_PLOT}"
     run:
         check_files_arent_empty(input)
-        with open('MIN_FREQ.txt') as MIN_FREQ_FILE:
-            MIN_FREQ = int(MIN_FREQ_FILE.readlines()[0])
+        MIN_FREQ, confidence = read_cutoff(input[2])
+        if KMER_CUTOFF is not None:
+            MIN_FREQ = KMER_CUTOFF
+        elif MIN_FREQ is None or confidence < MIN_CUTOFF_CONFIDENCE:
+            raise ValueError("K-mer cutoff %s has low confidence (%.3f): set KMER_CUTOFF after"
+                             " looking at %s" % (MIN_FREQ, confidence, HISTOGRAM_PLOT))
+        if COUNT_MODE == "partitioned":
+            trim_reads(input[0], input[1], output[0], MIN_FREQ, threads=threads)
+        else:
             shell("{tools[filter_abund]}"
                   " -T {MAX_THREADS}"
                   " -C {MIN_FREQ}"
@@ -330,26 +446,13 @@ rule filter_kmers:
                   " {input[1]}"
                   " -o {output} --gzip")
 
-# Drop truncated and single-end reads generated from k-mer filtering step
-rule remove_truncated_sequences:
+# Drop truncated reads, write single-end reads and split paired-end reads in one pass
+rule clean_kmer_free_reads:
     input: KMER_FREE_DATA
-    output: CLEANED_DATA
-    run:
-        check_files_arent_empty(input)
-        shell("zcat {input} | {tools[seqtk]} seq -L {MIN_LENGTH} - | gzip > {output}")
-
-# Split paired-end reads and output
-rule extract_paired_cleaned_reads:
-    input: CLEANED_DATA
-    output: PAIRED_DATA, SINGLE_DATA
-    run:
-        check_files_arent_empty(input)
-        shell("{tools[extract]} -p {output[0]} -s {output[1]} --gzip {input}")
-
-# Split paired-end reads and output
-rule split_paired_cleaned_reads:
-    input: PAIRED_DATA
-    output: SPLIT_DATA
+    output: SPLIT_DATA, SINGLE_DATA
+    threads: CLEANUP_THREADS
     run:
         check_files_arent_empty(input)
-        shell("{tools[split]} -1 {output[0]} -2 {output[1]} --gzip {input}")
+        clean_interleaved(input[0], output[0], output[1], output[2],
+                          min_length=MIN_LENGTH,
+                          threads=threads)
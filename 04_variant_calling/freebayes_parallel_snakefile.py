@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+##############################################################################
+##############################################################################
+# Author: Joe Colgan                   Program: freebayes_parallel_snakefile.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# Import modules
+import os.path
+import time
+
+from helper_functions import *
+from freebayes_regions import *
+
+# This script takes a list of sorted and indexed BAM files (one per sample) and the reference
+# genome as input and calls variants with freebayes, using the same parameters as
+# run_freebayes.sh. Instead of one serial freebayes process over the whole genome, the genome
+# is split into groups of whole scaffolds of balanced expected workload, freebayes is run for
+# each group as a separate job, and the group VCF files are merged into one VCF sorted in
+# reference order. Scaffolds are not cut, so the merged VCF holds the same calls as a serial
+# run.
+#
+# To achieve final output, the Snakefile contains custom-defined rules (see below) that
+# outline commands to execute sequentially to take custom-defined input(s) and generate
+# final output (as defined in rule all).
+#
+# For this specific script, rules are defined as follows:
+# rule all:
+#   - Defines the expected final output of the Snakefile.
+# rule write_region_targets:
+#   - Writes a BED file of target scaffolds per job. Groups are balanced using scaffold
+#     lengths (.fai), the number of mapped reads per scaffold (BAM indexes) and, if set, the
+#     runtimes recorded by a previous run (PREVIOUS_RUNTIMES). The groups are planned when the
+#     Snakefile is read; all files of a plan are named after its checksum (PLAN), so a changed
+#     plan is written and called afresh rather than mixed with the files of an earlier plan.
+# rule call_region:
+#   - Runs freebayes on the target scaffolds of one job and records its runtime.
+# rule merge_regions:
+#   - Merges the job VCF files into one VCF sorted in reference order.
+# rule record_runtimes:
+#   - Writes the runtime of every scaffold of the plan to REGION_RUNTIMES. To balance the next
+#     run with them, set PREVIOUS_RUNTIMES to this file.
+
+##############################################################################
+# Prior to use
+##############################################################################
+# To run freebayes_parallel_snakefile.py:
+#  1. Download and install the following software:
+#   freebayes
+#   samtools
+#   python modules: pysam
+#
+#  2. Ensure helper_functions.py and freebayes_regions.py are within the same directory of
+#  the Snakefile.
+#
+#  3. Index the reference genome (samtools faidx) and each BAM file (samtools index).
+#
+#  4. Make a text file called 'bam_list.txt' with the path of one BAM file per line
+#  (as used by run_freebayes.sh).
+
+##############################################################################
+# Running Snakemake
+##############################################################################
+# snakemake -s freebayes_parallel_snakefile.py -p -j <number of cores>
+# Region jobs can also be submitted to a cluster with --cluster.
+
+##############################################################################
+# Assign global variables for use in rules (see below)
+##############################################################################
+# Specify the reference genome and its samtools faidx index
+REFERENCE       = "./data/refseq_files/GCF_000214255.1_Bter_1.0_genomic.fna"
+REFERENCE_INDEX = REFERENCE + ".fai"
+
+# Specify the list of BAM files
+BAM_LIST        = "bam_list.txt"
+
+# Specify the number of region jobs to split the genome into
+NUM_REGIONS     = 200
+
+# Specify the runtimes of each scaffold from a previous run (REGION_RUNTIMES of that run), or
+# None to balance groups by read density (or length)
+PREVIOUS_RUNTIMES = None
+
+##############################################################################
+# Read in BAM files and split the genome into regions
+##############################################################################
+BAMS = open(BAM_LIST).read().split()
+
+SCAFFOLDS = read_fai(REFERENCE_INDEX)
+if all(os.path.exists(bam + ".bai") for bam in BAMS):
+    READ_COUNTS = mapped_reads_per_scaffold(BAMS)
+else:
+    READ_COUNTS = {}
+REGIONS = balanced_regions(weighted_segments(SCAFFOLDS, READ_COUNTS,
+                                             read_runtimes(PREVIOUS_RUNTIMES)),
+                           NUM_REGIONS)
+PLAN = plan_checksum(REGIONS)
+print("%d scaffolds in %d region jobs (plan %s)" % (len(SCAFFOLDS), len(REGIONS), PLAN))
+
+##############################################################################
+# Specify all input/output files in terms of region wildcards
+##############################################################################
+# Output target regions per job here
+REGION_BED      = "temp/01_regions/plan_" + PLAN + "/region_{region}.bed"
+
+# Output variants per job here
+REGION_VCF      = "temp/02_region_vcf/plan_" + PLAN + "/region_{region}.vcf"
+
+# Output runtime (seconds) per job here
+REGION_TIME     = "temp/02_region_vcf/plan_" + PLAN + "/region_{region}.seconds.txt"
+
+# Output runtime (seconds) per scaffold of the plan here
+REGION_RUNTIMES = "results/freebayes_region_runtimes.plan_" + PLAN + ".txt"
+
+# Output merged variants here
+MERGED_VCF      = "results/freebayes_hap0_minQ_1_minaltfrac_0.25_minCov1.vcf"
+
+##############################################################################
+# Define binaries in context of path relative to Snakefile
+##############################################################################
+tools = {}
+tools['freebayes'] = 'freebayes'
+
+##############################################################################
+#
+# Specify rules with commands to be executed
+#
+##############################################################################
+# First rule is list the final output
+rule all:
+    input: MERGED_VCF, REGION_RUNTIMES
+
+# Write the target regions of each job
+# (PREVIOUS_RUNTIMES is an input unless it gave the same plan again, when it is the output of
+# rule record_runtimes for this plan)
+rule write_region_targets:
+    input:  [REFERENCE_INDEX] + ([PREVIOUS_RUNTIMES] if PREVIOUS_RUNTIMES and
+                                 os.path.abspath(PREVIOUS_RUNTIMES) !=
+                                 os.path.abspath(REGION_RUNTIMES) else [])
+    output: expand(REGION_BED, region=range(len(REGIONS)))
+    run:
+        write_targets(REGIONS, REGION_BED)
+
+# Call variants within the target regions of one job
+rule call_region:
+    input:  bed=REGION_BED, bams=BAMS, reference=REFERENCE
+    output: vcf=REGION_VCF, seconds=REGION_TIME
+    run:
+        check_files_arent_empty(input)
+        start = time.time()
+        shell("{tools[freebayes]} \
+               -f {input.reference} \
+               --bam-list {BAM_LIST} \
+               --targets {input.bed} \
+               --ploidy 2 \
+               --report-genotype-likelihood-max \
+               --use-mapping-quality \
+               --genotype-qualities \
+               --use-best-n-alleles 4 \
+               --haplotype-length 0 \
+               --min-base-quality 3 \
+               --min-mapping-quality 1 \
+               --min-alternate-fraction 0.25 \
+               --min-coverage 1 \
+               --use-reference-allele > {output.vcf}")
+        with open(output.seconds, 'w') as seconds:
+            seconds.write('%.3f\n' % (time.time() - start))
+
+# Merge region VCF files in reference order
+rule merge_regions:
+    input:  expand(REGION_VCF, region=range(len(REGIONS)))
+    output: MERGED_VCF
+    run:
+        merge_vcfs(input, SCAFFOLDS, output[0])
+        check_files_arent_empty(output)
+
+# Record the runtime of every region for balancing the next run
+rule record_runtimes:
+    input:  beds=expand(REGION_BED, region=range(len(REGIONS))),
+            seconds=expand(REGION_TIME, region=range(len(REGIONS)))
+    output: REGION_RUNTIMES
+    run:
+        write_runtimes(output[0], input.beds, input.seconds)
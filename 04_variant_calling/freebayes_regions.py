@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: freebayes_regions.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script contains custom defined functions used by freebayes_parallel_snakefile.py to:
+# 1) Split the reference genome into groups of whole scaffolds of balanced expected workload,
+#    using the scaffold lengths from the reference .fai index and, where available, the
+#    density of aligned reads per scaffold (from the BAM indexes) or the runtimes of a
+#    previous run. Scaffolds are never cut: freebayes calls variants in haplotype windows that
+#    would be called differently on either side of a cut, so only whole scaffolds give the
+#    same calls as a serial run. Bter_1.0 has thousands of scaffolds, so packing whole
+#    scaffolds still balances the groups.
+# 2) Write each group of scaffolds as a BED file of freebayes targets
+# 3) Merge the per-group VCF files into one VCF sorted in reference order
+# 4) Record the runtime of each scaffold so that groups are balanced better next time
+
+# Import modules
+import hashlib
+import heapq
+import os
+
+import pysam
+
+
+def read_fai(fai_file):
+    # This function takes a samtools faidx index as input and returns a list of
+    # (scaffold name, scaffold length) tuples in reference order
+    scaffolds = []
+    with open(fai_file) as fai:
+        for line in fai:
+            fields = line.split('\t')
+            scaffolds.append((fields[0], int(fields[1])))
+    return scaffolds
+
+
+def mapped_reads_per_scaffold(bam_files):
+    # This function sums the number of mapped reads per scaffold over all (indexed) BAM files,
+    # read from the BAM index without scanning the alignments
+    counts = {}
+    for bam_file in bam_files:
+        with pysam.AlignmentFile(bam_file, 'rb') as bam:
+            for stats in bam.get_index_statistics():
+                counts[stats.contig] = counts.get(stats.contig, 0) + stats.mapped
+    return counts
+
+
+def read_runtimes(runtimes_file):
+    # This function takes a runtimes table written by write_runtimes as input and returns a
+    # dictionary of scaffold name to a list of (start, end, seconds) tuples
+    runtimes = {}
+    if runtimes_file is None or not os.path.exists(runtimes_file):
+        return runtimes
+    with open(runtimes_file) as table:
+        for line in table:
+            if line.startswith('#'):
+                continue
+            chrom, start, end, seconds = line.split('\t')[:4]
+            runtimes.setdefault(chrom, []).append((int(start), int(end), float(seconds)))
+    return runtimes
+
+
+def weighted_segments(scaffolds, read_counts=None, runtimes=None):
+    # This function returns a list of (chrom, start, end, weight) segments, one per scaffold,
+    # where weight is the expected workload of the scaffold. Previous runtimes take precedence
+    # over read density, which takes precedence over scaffold length.
+    read_counts = read_counts or {}
+    runtimes = runtimes or {}
+    # Scaffolds without a previous runtime are given the mean runtime per base of a previous run
+    timed_bases = sum(end - start for regions in runtimes.values() for start, end, _ in regions)
+    timed_seconds = sum(seconds for regions in runtimes.values() for _, _, seconds in regions)
+    segments = []
+    for chrom, length in scaffolds:
+        if chrom in runtimes:
+            segments.append((chrom, 0, length,
+                             sum(seconds for _, _, seconds in runtimes[chrom])))
+        elif runtimes and timed_bases:
+            segments.append((chrom, 0, length, length * timed_seconds / timed_bases))
+        elif read_counts:
+            segments.append((chrom, 0, length, float(read_counts.get(chrom, 0))))
+        else:
+            segments.append((chrom, 0, length, float(length)))
+    # Express all weights on the same scale (share of total workload)
+    total = sum(weight for _, _, _, weight in segments)
+    if total == 0:
+        total_length = float(sum(length for _, length in scaffolds))
+        return [(chrom, start, end, (end - start) / total_length)
+                for chrom, start, end, _ in segments]
+    return [(chrom, start, end, weight / total) for chrom, start, end, weight in segments]
+
+
+def balanced_regions(segments, number):
+    # This function takes weighted segments (whole scaffolds) and packs them into at most
+    # number groups of close to equal total weight: scaffolds are taken from the heaviest and
+    # each is added to the lightest group so far (longest processing time first). Returns a
+    # list of groups, each a list of (chrom, start, end) in reference order.
+    number = max(1, min(number, len(segments)))
+    groups = [[] for _ in range(number)]
+    lightest = [(0.0, group) for group in range(number)]
+    order = sorted(range(len(segments)), key=lambda index: (-segments[index][3], index))
+    for index in order:
+        weight, group = heapq.heappop(lightest)
+        groups[group].append(index)
+        heapq.heappush(lightest, (weight + segments[index][3], group))
+    return [[segments[index][:3] for index in sorted(group)] for group in groups if group]
+
+
+def plan_checksum(groups):
+    # This function returns a short checksum of groups of regions, used to name the files of a
+    # plan so that a changed plan is written and called afresh
+    text = '\n'.join('%d\t%s\t%d\t%d' % ((number,) + region)
+                      for number, group in enumerate(groups) for region in group)
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def write_targets(groups, bed_template):
+    # This function writes each group of regions to a BED file (bed_template with {region})
+    for number, group in enumerate(groups):
+        with open(bed_template.format(region=number), 'w') as bed:
+            for chrom, start, end in group:
+                bed.write('%s\t%d\t%d\n' % (chrom, start, end))
+
+
+def read_targets(bed_file):
+    # This function reads a BED file of regions into a list of (chrom, start, end) tuples
+    with open(bed_file) as bed:
+        return [(fields[0], int(fields[1]), int(fields[2]))
+                for fields in (line.rstrip('\n').split('\t') for line in bed) if fields[0]]
+
+
+def write_runtimes(output, region_files, runtime_files):
+    # This function combines the runtime of each group into one table with one row per
+    # scaffold. The runtime of a group is shared between its scaffolds in proportion to length.
+    with open(output, 'w') as table:
+        table.write('#chrom\tstart\tend\tseconds\n')
+        for region_file, runtime_file in zip(region_files, runtime_files):
+            with open(runtime_file) as runtime:
+                seconds = float(runtime.read().strip())
+            regions = read_targets(region_file)
+            total_length = float(sum(end - start for _, start, end in regions)) or 1.0
+            for chrom, start, end in regions:
+                table.write('%s\t%d\t%d\t%.3f\n'
+                            % (chrom, start, end, seconds * (end - start) / total_length))
+
+
+def _vcf_records(vcf_file, order):
+    # Yield (sort key, line) for each record of a VCF file
+    with open(vcf_file) as vcf:
+        for line in vcf:
+            if not line.startswith('#'):
+                fields = line.split('\t', 5)
+                yield (order[fields[0]], int(fields[1]), fields[3], fields[4]), line
+
+
+def merge_vcfs(vcf_files, scaffolds, output):
+    # This function merges per-group VCF files into one VCF sorted in reference order. The
+    # header is taken from the first file. Groups hold whole scaffolds, so no record is
+    # reported by more than one group.
+    order = {chrom: index for index, (chrom, _) in enumerate(scaffolds)}
+    temp_output = "%s.tmp.%d" % (output, os.getpid())
+    with open(temp_output, 'w') as merged:
+        with open(vcf_files[0]) as first:
+            for line in first:
+                if not line.startswith('#'):
+                    break
+                merged.write(line)
+        # Each group VCF is already sorted, as its scaffolds are written in reference order
+        streams = [_vcf_records(vcf_file, order) for vcf_file in vcf_files]
+        for _, line in heapq.merge(*streams):
+            merged.write(line)
+    os.replace(temp_output, output)
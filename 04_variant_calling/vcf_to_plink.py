@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: vcf_to_plink.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a (optionally gzip/bgzip-compressed) VCF file as input and converts the
+# genotypes to PLINK binary files (.bed/.bim/.fam) in a single pass, without the text PED/MAP
+# intermediate of 'vcftools --plink' followed by 'plink --file --make-bed':
+# - Genotypes (GT) are packed two bits per call, SNP-major, in batches of variants
+# - Only biallelic variants are converted (as SNPRelate method = "biallelic.only"); others are
+#   counted and skipped
+# - Haploid calls (e.g. '1') are read as homozygous, as PLINK does
+# - A minor allele frequency filter (--maf, as plink --maf) is applied on the way
+# - A1 is the minor allele (ALT unless ALT is the more frequent allele), as plink --make-bed
+# - Samples are written to the .fam file with family and individual ID both set to the VCF
+#   sample name (as plink --double-id)
+#
+# If the output prefix contains '{chrom}', one set of files is written per chromosome with
+# '{chrom}' replaced by the chromosome name (as running plink once per chromosome).
+#
+# Further outputs (--outputs):
+#   bed          .bed/.bim/.fam (default)
+#   ped          .ped/.map with alleles coded 1 (A1) and 2 (A2) (as plink --recode12), for
+#                plink2chromopainter.pl
+#   selscan-map  .map with chromosome, variant ID, position and position (physical distance
+#                used as genetic distance), for selscan
+#
+# Usage:
+# python3 vcf_to_plink.py <input.vcf[.gz]> <output_prefix> [--maf 0.1] [--numeric-chromosomes]
+#        [--outputs bed ped selscan-map]
+# Examples:
+# python3 vcf_to_plink.py input.vcf results/input.vcf.plink --maf 0.1 --numeric-chromosomes
+# python3 vcf_to_plink.py input.vcf 'map/{chrom}' --outputs selscan-map
+
+# Import modules
+import argparse
+import gzip
+import os
+
+import numpy as np
+
+# Number of variants packed at once
+BATCH_SIZE = 10000
+
+# PLINK .bed magic number and SNP-major mode
+BED_HEADER = bytes([0x6c, 0x1b, 0x01])
+
+# Number of ALT alleles of each genotype (-1: missing)
+ALT_COUNTS = {b'0/0': 0, b'0|0': 0, b'0': 0,
+              b'0/1': 1, b'1/0': 1, b'0|1': 1, b'1|0': 1,
+              b'1/1': 2, b'1|1': 2, b'1': 2}
+
+# .bed code of each number of A1 alleles (index: count + 1, so index 0 is missing):
+# missing 01, zero copies (homozygous A2) 11, heterozygous 10, homozygous A1 00
+BED_CODES = np.array([0b01, 0b11, 0b10, 0b00], dtype=np.uint8)
+
+# recode12 genotype text of each number of A1 alleles (index: count + 1)
+PED_GENOTYPES = np.array(['0 0', '2 2', '1 2', '1 1'])
+
+OUTPUT_FORMATS = ('bed', 'ped', 'selscan-map')
+
+
+def open_vcf(path):
+    # This function returns a binary handle to a plain or gzip/bgzip-compressed VCF file
+    with open(path, 'rb') as handle:
+        is_gzipped = handle.read(2) == b'\x1f\x8b'
+    return gzip.open(path, 'rb') if is_gzipped else open(path, 'rb')
+
+
+def pack_genotypes(a1_counts):
+    # This function takes a matrix of A1 allele counts (variants x samples, -1 for missing) as
+    # input and returns the .bed bytes of the variants: 2 bits per sample, four samples per
+    # byte from the lowest bits, each variant padded to a whole byte
+    codes = BED_CODES[a1_counts + 1]
+    padding = -codes.shape[1] % 4
+    if padding:
+        codes = np.pad(codes, ((0, 0), (0, padding)))
+    codes = codes.reshape(codes.shape[0], -1, 4)
+    packed = codes[:, :, 0] | (codes[:, :, 1] << 2) | (codes[:, :, 2] << 4) | (codes[:, :, 3] << 6)
+    return packed.astype(np.uint8).tobytes()
+
+
+def minor_allele_counts(alt_counts):
+    # This function takes a matrix of ALT allele counts (variants x samples, -1 for missing) and
+    # returns (A1 allele counts, minor allele frequency, True where A1 is ALT)
+    called = alt_counts >= 0
+    alleles = 2 * called.sum(axis=1)
+    alt_frequency = np.divide(np.where(called, alt_counts, 0).sum(axis=1), alleles,
+                              out=np.zeros(len(alleles)), where=alleles > 0)
+    a1_is_alt = alt_frequency <= 0.5
+    a1_counts = np.where(a1_is_alt[:, None] | ~called, alt_counts, 2 - alt_counts)
+    return a1_counts, np.minimum(alt_frequency, 1.0 - alt_frequency), a1_is_alt
+
+
+class PlinkWriter:
+    # Writes the outputs of one set of variants (one chromosome or all chromosomes)
+    def __init__(self, prefix, samples, outputs, chromosome_code=None):
+        self.prefix = prefix
+        self.samples = samples
+        self.outputs = outputs
+        self.chromosome_code = chromosome_code
+        self.variants = 0
+        self.handles = {}
+        if 'bed' in outputs:
+            self.handles['bed'] = open(prefix + '.bed', 'wb')
+            self.handles['bed'].write(BED_HEADER)
+            self.handles['bim'] = open(prefix + '.bim', 'w')
+            write_fam(prefix + '.fam', samples)
+        if 'ped' in outputs:
+            # The PED file is sample-major: variants are kept until close()
+            self.ped_counts = []
+            self.handles['map'] = open(prefix + '.map', 'w')
+        if 'selscan-map' in outputs:
+            self.handles['selscan'] = open(prefix + ('.selscan.map' if 'ped' in outputs
+                                                     else '.map'), 'w')
+
+    def write(self, chroms, ids, positions, alleles, a1_counts, a1_is_alt):
+        # Write a batch of variants: alleles is a list of (REF, ALT) tuples
+        for chrom, variant_id, position, (ref, alt), is_alt in zip(chroms, ids, positions,
+                                                                   alleles, a1_is_alt.tolist()):
+            chrom = self.chromosome_code or chrom
+            if 'bim' in self.handles:
+                a1, a2 = (alt, ref) if is_alt else (ref, alt)
+                self.handles['bim'].write('%s\t%s\t0\t%s\t%s\t%s\n'
+                                          % (chrom, variant_id, position, a1, a2))
+            if 'map' in self.handles:
+                self.handles['map'].write('%s\t%s\t0\t%s\n' % (chrom, variant_id, position))
+            if 'selscan' in self.handles:
+                self.handles['selscan'].write('%s\t%s\t%s\t%s\n'
+                                              % (chrom, variant_id, position, position))
+        if 'bed' in self.handles:
+            self.handles['bed'].write(pack_genotypes(a1_counts))
+        if 'ped' in self.outputs:
+            self.ped_counts.append(a1_counts)
+        self.variants += len(ids)
+
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+        if 'ped' in self.outputs:
+            write_ped(self.prefix + '.ped', self.samples, self.ped_counts)
+
+
+def write_fam(output, samples):
+    # This function writes a .fam file: FID, IID, father, mother, sex, phenotype
+    with open(output, 'w') as fam:
+        for sample in samples:
+            fam.write('%s\t%s\t0\t0\t0\t-9\n' % (sample, sample))
+
+
+def write_ped(output, samples, batches):
+    # This function writes a .ped file (recode12) from batches of A1 allele count matrices
+    a1_counts = (np.concatenate(batches) if batches
+                 else np.zeros((0, len(samples)), dtype=np.int8))
+    genotypes = PED_GENOTYPES[a1_counts + 1]
+    with open(output, 'w') as ped:
+        for index, sample in enumerate(samples):
+            ped.write('%s %s 0 0 0 -9 %s\n' % (sample, sample, ' '.join(genotypes[:, index])))
+
+
+def vcf_to_plink(vcf_file, prefix, maf=0.0, outputs=('bed',), numeric_chromosomes=False,
+                 batch_size=BATCH_SIZE):
+    # This function converts a VCF file to PLINK files (see above) and returns a dictionary of
+    # variant counts
+    counts = {'variants': 0, 'written': 0, 'not_biallelic': 0, 'maf': 0}
+    split = '{chrom}' in prefix
+    chromosome_codes = {}
+    writer, samples = None, None
+    batch = []
+
+    def flush():
+        # Filter and write the variants of the batch
+        if not batch:
+            return
+        chroms, ids, positions, alleles, rows = zip(*batch)
+        a1_counts, frequencies, a1_is_alt = minor_allele_counts(np.array(rows, dtype=np.int8))
+        keep = frequencies >= maf if maf > 0 else np.ones(len(rows), dtype=bool)
+        counts['maf'] += int(np.count_nonzero(~keep))
+        counts['written'] += int(np.count_nonzero(keep))
+        selected = np.flatnonzero(keep).tolist()
+        writer.write([chroms[i] for i in selected], [ids[i] for i in selected],
+                     [positions[i] for i in selected], [alleles[i] for i in selected],
+                     a1_counts[keep], a1_is_alt[keep])
+        del batch[:]
+
+    current_chrom = None
+    with open_vcf(vcf_file) as vcf:
+        for line in vcf:
+            if line.startswith(b'##'):
+                continue
+            if line.startswith(b'#'):
+                samples = [sample.decode() for sample in line.rstrip(b'\r\n').split(b'\t')[9:]]
+                continue
+            fields = line.rstrip(b'\r\n').split(b'\t')
+            counts['variants'] += 1
+            if b',' in fields[4] or fields[4] == b'.':
+                counts['not_biallelic'] += 1
+                continue
+            chrom = fields[0].decode()
+            if chrom != current_chrom:
+                flush()
+                if chrom not in chromosome_codes:
+                    chromosome_codes[chrom] = str(len(chromosome_codes) + 1)
+                if writer is None or split:
+                    if writer is not None:
+                        writer.close()
+                    writer = PlinkWriter(prefix.replace('{chrom}', chrom), samples, outputs,
+                                         chromosome_codes[chrom] if numeric_chromosomes else None)
+                current_chrom = chrom
+            if numeric_chromosomes and not split:
+                writer.chromosome_code = chromosome_codes[chrom]
+            batch.append((chrom, fields[2].decode(), fields[1].decode(),
+                          (fields[3].decode(), fields[4].decode()),
+                          [ALT_COUNTS.get(sample.split(b':', 1)[0], -1)
+                           for sample in fields[9:]]))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    if samples is None:
+        raise IOError("No #CHROM header line in VCF: %s" % vcf_file)
+    if writer is None:
+        writer = PlinkWriter(prefix.replace('{chrom}', 'none'), samples, outputs)
+    writer.close()
+    print("%d variants: %d written, %d not biallelic, %d with minor allele frequency < %g: %s"
+          % (counts['variants'], counts['written'], counts['not_biallelic'], counts['maf'], maf,
+             vcf_file))
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert a VCF file to PLINK binary files")
+    parser.add_argument('vcf', help="Input VCF file (optionally gzip/bgzip-compressed)")
+    parser.add_argument('prefix', help="Output prefix; '{chrom}' writes one set per chromosome")
+    parser.add_argument('--maf', type=float, default=0.0,
+                        help="Minimum minor allele frequency (as plink --maf)")
+    parser.add_argument('--numeric-chromosomes', action='store_true',
+                        help="Number chromosomes 1, 2, ... in order of appearance (for ADMIXTURE)")
+    parser.add_argument('--outputs', nargs='+', choices=OUTPUT_FORMATS, default=['bed'])
+    args = parser.parse_args()
+
+    output_dir = os.path.dirname(args.prefix)
+    if output_dir and '{chrom}' not in output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    vcf_to_plink(args.vcf, args.prefix, args.maf, args.outputs, args.numeric_chromosomes)
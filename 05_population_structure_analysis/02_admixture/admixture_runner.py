@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: admixture_runner.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a PLINK .bed file (with .bim and .fam files alongside) as input and runs
+# ADMIXTURE with cross-validation (--cv) for a range of numbers of populations (K) and one or
+# more random seeds (replicates):
+# 1) Runs are scheduled concurrently within a budget of cores: each run uses --threads cores
+#    and as many runs as fit in --cores run at once. Runs with the largest K are started first,
+#    as the runtime of ADMIXTURE grows with K, so low-K runs fill in the gaps at the end.
+# 2) Each run is made in its own directory of the cache, named after the checksum (SHA-256) of
+#    the .bed file, K and the seed. A run whose log reports a CV error and whose .Q file
+#    exists is reused instead of being run again.
+# 3) The CV error and final log likelihood of each run are parsed from the logs into one
+#    tab-delimited summary table (K, seed, cv_error, loglikelihood, seconds, cached, q_file),
+#    and the K with the lowest mean CV error is reported.
+# The log, .Q and .P files of each run are also copied to the output directory (as log<K>.out
+# and <prefix>.<K>.Q/P, with .seed<seed> added for more than one seed), as previously written by
+# run_admixture.sh.
+#
+# Usage:
+# python3 admixture_runner.py <input.plink.bed> <output_dir> [--k-min 1] [--k-max 20]
+#        [--seeds 43] [--cores 20] [--threads 4] [--cache-dir <output_dir>/cache]
+# Output: <output_dir>/admixture_cv_summary.txt
+
+# Import modules
+import argparse
+import concurrent.futures
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import time
+
+CV_ERROR = re.compile(r'^CV error \(K=(\d+)\): ([-+0-9.eE]+)', re.MULTILINE)
+LOGLIKELIHOOD = re.compile(r'^Loglikelihood: ([-+0-9.eE]+)', re.MULTILINE)
+
+
+def file_checksum(path, block_size=1024 * 1024):
+    # This function returns the SHA-256 checksum of a file, read in blocks
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def parse_log(log_file):
+    # This function takes an ADMIXTURE log as input and returns (CV error, log likelihood),
+    # with None for values not found
+    with open(log_file) as log:
+        text = log.read()
+    cv_errors = CV_ERROR.findall(text)
+    loglikelihoods = LOGLIKELIHOOD.findall(text)
+    return (float(cv_errors[-1][1]) if cv_errors else None,
+            float(loglikelihoods[-1]) if loglikelihoods else None)
+
+
+def run_directory(cache_dir, checksum, k, seed):
+    # This function returns the cache directory of the run of K and seed for a .bed checksum
+    return os.path.join(cache_dir, checksum, "K%d.seed%d" % (k, seed))
+
+
+def run_admixture(bed_file, k, seed, directory, threads, admixture='admixture'):
+    # This function runs ADMIXTURE for one K and seed in directory (unless a completed run is
+    # found there) and returns a dictionary describing the run
+    prefix = os.path.basename(bed_file)[:-len('.bed')]
+    log_file = os.path.join(directory, "log%d.out" % k)
+    q_file = os.path.join(directory, "%s.%d.Q" % (prefix, k))
+    result = {'k': k, 'seed': seed, 'log': log_file, 'q_file': q_file, 'cached': True,
+              'seconds': 0.0}
+    if os.path.exists(log_file) and os.path.exists(q_file):
+        result['cv_error'], result['loglikelihood'] = parse_log(log_file)
+        if result['cv_error'] is not None:
+            return result
+    os.makedirs(directory, exist_ok=True)
+    start = time.time()
+    # ADMIXTURE writes its outputs to the working directory
+    with open(log_file + ".tmp", 'w') as log:
+        process = subprocess.run([admixture, '--cv', '-s', str(seed), '-j%d' % threads,
+                                  os.path.abspath(bed_file), str(k)],
+                                 cwd=directory, stdout=log, stderr=subprocess.STDOUT)
+    if process.returncode != 0:
+        raise RuntimeError("ADMIXTURE failed for K=%d, seed %d (exit code %d), see: %s.tmp"
+                           % (k, seed, process.returncode, log_file))
+    os.replace(log_file + ".tmp", log_file)
+    result['seconds'] = time.time() - start
+    result['cached'] = False
+    result['cv_error'], result['loglikelihood'] = parse_log(log_file)
+    return result
+
+
+def run_grid(bed_file, ks, seeds, cores, threads, cache_dir, admixture='admixture'):
+    # This function runs ADMIXTURE for every K and seed, at most cores // threads runs at a
+    # time, largest K first. Returns a list of run dictionaries sorted by K and seed.
+    checksum = file_checksum(bed_file)
+    jobs = sorted(((k, seed) for k in ks for seed in seeds), key=lambda job: (-job[0], job[1]))
+    workers = max(1, cores // threads)
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_admixture, bed_file, k, seed,
+                                   run_directory(cache_dir, checksum, k, seed),
+                                   min(threads, cores), admixture)
+                   for k, seed in jobs]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                # Do not start the remaining runs after a failure
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            print("K=%d seed=%d: CV error %s (%s)"
+                  % (result['k'], result['seed'], result['cv_error'],
+                     'cached' if result['cached'] else '%.0f s' % result['seconds']))
+            results.append(result)
+    return sorted(results, key=lambda result: (result['k'], result['seed']))
+
+
+def format_value(value, template='%g'):
+    # This function formats a number, writing missing values as NA
+    return 'NA' if value is None else template % value
+
+
+def write_summary(output, results):
+    # This function writes one row per run to a tab-delimited summary table
+    with open(output, 'w') as summary:
+        summary.write('K\tseed\tcv_error\tloglikelihood\tseconds\tcached\tq_file\n')
+        for result in results:
+            summary.write('%d\t%d\t%s\t%s\t%.1f\t%s\t%s\n'
+                          % (result['k'], result['seed'], format_value(result['cv_error']),
+                             format_value(result['loglikelihood'], '%.6f'), result['seconds'],
+                             'yes' if result['cached'] else 'no', result['q_file']))
+
+
+def best_k(results):
+    # This function returns the K with the lowest mean CV error over seeds (None if no run
+    # reported a CV error)
+    cv_errors = {}
+    for result in results:
+        if result['cv_error'] is not None:
+            cv_errors.setdefault(result['k'], []).append(result['cv_error'])
+    if not cv_errors:
+        return None
+    return min(cv_errors, key=lambda k: sum(cv_errors[k]) / len(cv_errors[k]))
+
+
+def copy_outputs(results, output_dir):
+    # This function copies the log, .Q and .P files of each run to the output directory
+    several_seeds = len(set(result['seed'] for result in results)) > 1
+    for result in results:
+        q_file = result['q_file']
+        for path in (result['log'], q_file, q_file[:-len('.Q')] + '.P'):
+            name = os.path.basename(path)
+            if several_seeds:
+                root, extension = os.path.splitext(name)
+                name = "%s.seed%d%s" % (root, result['seed'], extension)
+            if os.path.exists(path):
+                shutil.copyfile(path, os.path.join(output_dir, name))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run ADMIXTURE for a grid of K and seeds")
+    parser.add_argument('bed', help="PLINK .bed file (with .bim and .fam alongside)")
+    parser.add_argument('output_dir', help="Output directory for logs and the summary table")
+    parser.add_argument('--k-min', type=int, default=1)
+    parser.add_argument('--k-max', type=int, default=20)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[43],
+                        help="Random seeds, one run per seed and K (default: 43)")
+    parser.add_argument('--cores', type=int, default=20, help="Total cores to use")
+    parser.add_argument('--threads', type=int, default=4, help="Cores per ADMIXTURE run")
+    parser.add_argument('--cache-dir', help="Directory of runs (default: <output_dir>/cache)")
+    parser.add_argument('--admixture', default='admixture', help="ADMIXTURE executable")
+    args = parser.parse_args()
+    if not args.bed.endswith('.bed'):
+        parser.error("Expected a PLINK .bed file: %s" % args.bed)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    results = run_grid(args.bed, range(args.k_min, args.k_max + 1), args.seeds, args.cores,
+                       args.threads, args.cache_dir or os.path.join(args.output_dir, 'cache'),
+                       args.admixture)
+    copy_outputs(results, args.output_dir)
+    write_summary(os.path.join(args.output_dir, 'admixture_cv_summary.txt'), results)
+    print("K with the lowest mean CV error: %s" % best_k(results))
@@ -7,14 +7,10 @@
 # Purpose:
 # The script takes a VCF file as input.
 # The first step involves the conversion of VCF to PLINK file format.
-# The second step runs ADMIXTURE for a number of used defined populations.
+# The second step runs ADMIXTURE for a number of used defined populations (admixture_runner.py).
 #
 ##############################################################################
 
-## Load modules:
-module load vcftools
-module load plink
-
 ## Take input from command line:
 input=$1 ## The first argument on the command line will be taken as input
 
@@ -30,16 +26,13 @@ mkdir -p results/admixture/"$abbrev_name"
 ## Print to console:
 echo "Step One: Converting VCF to plink file format"
 
-## Use vcftools to convert VCF to PED file format:
-vcftools --vcf results/"$input" \
-         --plink \
-         --out results/admixture/"$abbrev_name"/"$input".plink
-
-## Use plink to convert PED file to BED files:
-plink --file results/admixture/"$abbrev_name"/"$input".plink \
-         --maf 0.1 \
-         --make-bed \
-         --out results/admixture/"$abbrev_name"/"$input".plink
+## Convert VCF to BED files in one pass, keeping biallelic variants with minor allele frequency >= 0.1.
+## Chromosomes are numbered 1, 2, ... as ADMIXTURE only accepts numeric chromosome codes:
+python3 "$(dirname "$0")"/../../04_variant_calling/vcf_to_plink.py \
+        results/"$input" \
+        results/admixture/"$abbrev_name"/"$input".plink \
+        --maf 0.1 \
+        --numeric-chromosomes
 
 ## Print to console:
 echo "Step One - complete!"
@@ -51,12 +44,16 @@ echo "Step One - complete!"
 ## Print to console:
 echo "Step Two: Running admixture"
 
-## Run admixture for 20 potential populations:  
-for K in {1..20};
-do
-admixture --cv results/admixture/"$abbrev_name"/"$input".plink.bed \
--j20 $K | tee results/admixture/"$abbrev_name"/log${K}.out;
-done
+## Run admixture for 20 potential populations, several K at a time within a budget of cores.
+## Runs are cached by the checksum of the .bed file, so re-running only runs missing K.
+## CV errors of all K are summarised in admixture_cv_summary.txt:
+python3 "$(dirname "$0")"/admixture_runner.py \
+        results/admixture/"$abbrev_name"/"$input".plink.bed \
+        results/admixture/"$abbrev_name" \
+        --k-min 1 \
+        --k-max 20 \
+        --cores 20 \
+        --threads 4
 
 ## Print to console:
 echo "Step Two - complete!"
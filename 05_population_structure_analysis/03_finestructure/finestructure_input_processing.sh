@@ -1,17 +1,14 @@
 #!/usr/bin/env bash  
 ## Processing of data for running fineSTRUCTURE:
-module load plink
 
-## Run plink: Plink converts VCF into a ped and map file. 
+## Convert VCF into a ped and map file (alleles coded 1 and 2, as plink --recode12).
 ## The output can be used by chromopainter to generate formatted data for input into fs.
+vcf_to_plink="$(dirname "$0")"/../../04_variant_calling/vcf_to_plink.py
 
 for name in NC*vcf
 do
-plink --vcf "$name" \
-      --double-id \
-      --recode12 \
-      --allow-extra-chr \
-      --out "$name"
+python3 "$vcf_to_plink" "$name" "$name" \
+        --outputs ped
 done
 
 ## Run plink2chrompainter.pl:
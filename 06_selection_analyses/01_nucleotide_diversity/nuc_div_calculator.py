@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: nuc_div_calculator.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a text file with information on the chromosome-level VCF files as input
+# (three whitespace-delimited columns, as read by the previous nuc_div_calculator.R):
+# 1) Name of and relative path to a (bgzipped) chromosome-level VCF file
+# 2) Start position of chromosome
+# 3) End position of chromosome
+# and calculates diversity and neutrality statistics in sliding genomic windows:
+# - The genotypes of each chromosome are read once, into int8 blocks of sites x haplotypes
+#   (-1 for missing alleles; each allele of a call is one haplotype, or sequence); each row is
+#   written into a preallocated block as it is read, and per-site statistics are taken from
+#   each block when it is full, so only one block of genotypes is held at a time
+# - Per-site pairwise diversity (from the allele counts of called haplotypes) and segregating
+#   status are summed over windows with prefix sums, so any number of window and step sizes
+#   are calculated from one load of the data
+# - Tajima's D uses the number of haplotypes of the VCF file as the sample size n (as
+#   PopGenome, which takes the number of sequences), while per-site diversity uses the
+#   haplotypes called at the site. At sites with missing calls, Tajima's D is therefore an
+#   approximation; it is exact where all haplotypes are called.
+# - Windows run from the start position of a chromosome in steps of the step size; only
+#   windows that end before the end position of the chromosome are reported
+#
+# One tab-delimited table is written per window size and step, with columns:
+#   chrom, start, end, nuc_diversity (pairwise differences per base: sum over sites / window
+#   size), tajima_d (NaN without segregating sites), seg_sites, midpoint
+# The chromosome name is the VCF file name without '.recode.vcf.bgz'.
+#
+# Usage:
+# python3 nuc_div_calculator.py <chromosome_info.txt> [--windows 100000 10000:5000]
+#        [--output bter_all_chrom_100kb_approx_F_jump_size_zero.txt] [--threads 4]
+# Windows are given as <size> (step of the same size) or <size>:<step>. With more than one
+# window, the output name must contain '{window}' and '{step}', e.g.:
+# python3 nuc_div_calculator.py chromosome_info.txt --windows 100000 10000:5000
+#        --output 'bter_all_chrom_{window}_{step}.txt'
+
+# Import modules
+import argparse
+import array
+import gzip
+import multiprocessing
+import os
+
+import numpy as np
+
+# Number of sites per block of genotypes
+BLOCK_SITES = 100000
+
+
+def open_vcf(path):
+    # This function returns a binary handle to a plain or gzip/bgzip-compressed VCF file
+    with open(path, 'rb') as handle:
+        is_gzipped = handle.read(2) == b'\x1f\x8b'
+    return gzip.open(path, 'rb') if is_gzipped else open(path, 'rb')
+
+
+def parse_genotype(genotype, ploidy):
+    # This function takes a GT field (e.g. b'0/1', b'1', b'./.') and returns the ploidy allele
+    # indices as int8 bytes, with -1 for missing (or absent) alleles
+    alleles = [-1 if allele == b'.' else int(allele)
+               for allele in genotype.replace(b'|', b'/').split(b'/')]
+    return np.array(alleles[:ploidy] + [-1] * (ploidy - len(alleles)), dtype=np.int8).tobytes()
+
+
+def load_genotypes(vcf_file, start, end, block_sites=BLOCK_SITES):
+    # This function takes a VCF file and a region as input and yields (positions, genotype
+    # block) per block of block_sites sites: an int8 array of sites x haplotypes, -1 for
+    # missing alleles
+    positions = array.array('q')
+    block, filled = None, 0
+    ploidy, samples = None, 0
+    genotypes = {}
+    with open_vcf(vcf_file) as vcf:
+        for line in vcf:
+            if line.startswith(b'##'):
+                continue
+            if line.startswith(b'#'):
+                samples = len(line.rstrip(b'\r\n').split(b'\t')) - 9
+                continue
+            fields = line.rstrip(b'\r\n').split(b'\t')
+            position = int(fields[1])
+            if position < start or position > end:
+                continue
+            calls = [sample.split(b':', 1)[0] for sample in fields[9:]]
+            if ploidy is None:
+                ploidy = max(len(call.replace(b'|', b'/').split(b'/')) for call in calls)
+            if block is None:
+                block = np.empty((block_sites, samples * ploidy), dtype=np.int8)
+            row = []
+            for call in calls:
+                if call not in genotypes:
+                    genotypes[call] = parse_genotype(call, ploidy)
+                row.append(genotypes[call])
+            block[filled] = np.frombuffer(b''.join(row), dtype=np.int8)
+            positions.append(position)
+            filled += 1
+            if filled == block_sites:
+                yield np.frombuffer(positions, dtype=np.int64), block
+                positions, block, filled = array.array('q'), None, 0
+    if filled:
+        yield np.frombuffer(positions, dtype=np.int64), block[:filled]
+
+
+def site_statistics(matrix):
+    # This function takes a genotype matrix (sites x haplotypes) as input and returns per-site
+    # (pairwise diversity, True if segregating). Diversity is the proportion of pairs of called
+    # haplotypes that differ: (n^2 - sum of squared allele counts) / (n * (n - 1))
+    called = (matrix >= 0).sum(axis=1).astype(np.float64)
+    squares = np.zeros(len(matrix))
+    alleles = np.zeros(len(matrix), dtype=np.int64)
+    for allele in range(int(matrix.max()) + 1 if matrix.size else 0):
+        count = (matrix == allele).sum(axis=1)
+        squares += count.astype(np.float64) ** 2
+        alleles += count > 0
+    pairs = called * (called - 1)
+    diversity = np.divide(called ** 2 - squares, pairs, out=np.zeros(len(matrix)),
+                          where=pairs > 0)
+    return diversity, alleles > 1
+
+
+def tajima_d(pairwise, segregating, n):
+    # This function returns Tajima's D of windows from the summed pairwise diversity and
+    # number of segregating sites, for a sample of n sequences (NaN without segregating sites)
+    if n < 2:
+        return np.full(len(pairwise), np.nan)
+    i = np.arange(1, n)
+    a1 = np.sum(1.0 / i)
+    a2 = np.sum(1.0 / i ** 2)
+    b1 = (n + 1) / (3.0 * (n - 1))
+    b2 = 2.0 * (n ** 2 + n + 3) / (9.0 * n * (n - 1))
+    c1 = b1 - 1 / a1
+    c2 = b2 - (n + 2) / (a1 * n) + a2 / a1 ** 2
+    e1 = c1 / a1
+    e2 = c2 / (a1 ** 2 + a2)
+    variance = e1 * segregating + e2 * segregating * (segregating - 1)
+    return np.divide(pairwise - segregating / a1, np.sqrt(variance),
+                     out=np.full(len(pairwise), np.nan), where=segregating > 0)
+
+
+def window_statistics(positions, diversity, segregating, n, start, end, window, step):
+    # This function returns the statistics of sliding windows over start-end, summing per-site
+    # values with prefix sums. Returns (starts, ends, nuc_diversity, tajima_d, seg_sites).
+    starts = np.arange(start, end - window + 2, step, dtype=np.int64)
+    ends = starts + window - 1
+    first = np.searchsorted(positions, starts, side='left')
+    last = np.searchsorted(positions, ends, side='right')
+    diversity_sums = np.concatenate(([0.0], np.cumsum(diversity)))
+    segregating_sums = np.concatenate(([0], np.cumsum(segregating)))
+    pairwise = diversity_sums[last] - diversity_sums[first]
+    seg_sites = segregating_sums[last] - segregating_sums[first]
+    return (starts, ends, pairwise / window,
+            tajima_d(pairwise, seg_sites.astype(np.float64), n), seg_sites)
+
+
+def chromosome_windows(args):
+    # This function loads one chromosome and returns its window statistics for each window
+    # size and step
+    vcf_file, start, end, windows = args
+    # Empty arrays first, for chromosomes without sites in the region
+    positions = [np.zeros(0, dtype=np.int64)]
+    diversity, segregating = [np.zeros(0)], [np.zeros(0, dtype=bool)]
+    n_haplotypes = 0
+    for block_positions, block in load_genotypes(vcf_file, start, end):
+        block_diversity, block_segregating = site_statistics(block)
+        positions.append(block_positions)
+        diversity.append(block_diversity)
+        segregating.append(block_segregating)
+        n_haplotypes = block.shape[1]
+    positions = np.concatenate(positions)
+    diversity, segregating = np.concatenate(diversity), np.concatenate(segregating)
+    print("%d sites, %d haplotypes: %s" % (len(positions), n_haplotypes, vcf_file))
+    return [window_statistics(positions, diversity, segregating, n_haplotypes, start, end,
+                              window, step)
+            for window, step in windows]
+
+
+def chromosome_name(vcf_file):
+    # This function returns the chromosome name of a chromosome-level VCF file
+    return os.path.basename(vcf_file).replace('.recode.vcf.bgz', '')
+
+
+def write_windows(output, chromosomes, results):
+    # This function writes the window statistics of all chromosomes to a tab-delimited table
+    with open(output + '.tmp', 'w') as table:
+        table.write('chrom\tstart\tend\tnuc_diversity\ttajima_d\tseg_sites\tmidpoint\n')
+        for chrom, (starts, ends, diversity, tajima, seg_sites) in zip(chromosomes, results):
+            for row in zip(starts.tolist(), ends.tolist(), diversity.tolist(), tajima.tolist(),
+                           seg_sites.tolist()):
+                table.write('%s\t%d\t%d\t%.15g\t%s\t%d\t%d\n'
+                            % (chrom, row[0], row[1], row[2],
+                               'NaN' if np.isnan(row[3]) else '%.15g' % row[3], row[4],
+                               round((row[0] + row[1]) / 2)))
+    os.replace(output + '.tmp', output)
+
+
+def parse_window(text):
+    # This function parses a window given as <size> or <size>:<step>
+    size, _, step = text.partition(':')
+    window = (int(size), int(step or size))
+    if window[0] < 1 or window[1] < 1:
+        raise ValueError("Window size and step must be positive: %s" % text)
+    return window
+
+
+def read_chromosome_info(info_file):
+    # This function reads the chromosome info file: VCF file, start and end per line
+    chromosomes = []
+    with open(info_file) as info:
+        for line in info:
+            fields = line.split()
+            if fields:
+                chromosomes.append((fields[0], int(fields[1]), int(fields[2])))
+    return chromosomes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sliding window nucleotide diversity, "
+                                                 "segregating sites and Tajima's D")
+    parser.add_argument('info', help="Chromosome info file: VCF file, start, end per line")
+    parser.add_argument('--windows', nargs='+', type=parse_window, default=[(100000, 100000)],
+                        help="Window sizes as <size> or <size>:<step> (default: 100000)")
+    parser.add_argument('--output', default='bter_all_chrom_100kb_approx_F_jump_size_zero.txt',
+                        help="Output table; with several windows, a name containing "
+                             "'{window}' and '{step}'")
+    parser.add_argument('--threads', type=int, default=1,
+                        help="Number of chromosomes processed at once")
+    args = parser.parse_args()
+    if len(args.windows) > 1 and not ('{window}' in args.output and '{step}' in args.output):
+        parser.error("With more than one window, --output must contain '{window}' and '{step}'")
+
+    chromosomes = read_chromosome_info(args.info)
+    jobs = [(vcf_file, start, end, args.windows) for vcf_file, start, end in chromosomes]
+    if args.threads > 1:
+        with multiprocessing.Pool(args.threads) as pool:
+            results = pool.map(chromosome_windows, jobs)
+    else:
+        results = [chromosome_windows(job) for job in jobs]
+    names = [chromosome_name(vcf_file) for vcf_file, start, end in chromosomes]
+    for index, (window, step) in enumerate(args.windows):
+        output = args.output.format(window=window, step=step)
+        write_windows(output, names, [result[index] for result in results])
+        print("Windows of %d bp (step %d bp): %s" % (window, step, output))
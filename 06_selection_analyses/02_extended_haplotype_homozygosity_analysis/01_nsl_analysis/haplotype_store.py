@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: haplotype_store.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a (optionally gzip/bgzip-compressed) VCF file as input and writes a
+# bit-packed haplotype store, replacing the text genotype matrices of VCF_to_genomatrix_hap.R:
+# - Each sample is one haplotype coded as previously (genotype '2' rewritten to '1'):
+#   1: carries the REF allele, 0: homozygous for the ALT allele
+# - Only biallelic SNPs are kept (as SNPRelate method = "biallelic.only"). SNPs with missing
+#   calls are skipped, as they cannot be coded as 0/1 (and were rejected by selscan).
+# - Per chromosome, haplotypes are written as a NumPy array of SNPs x ceil(haplotypes / 8)
+#   bytes (8 haplotypes per byte), which can be memory-mapped (numpy.load(mmap_mode='r')),
+#   along with a map of positions (chromosome, '.', position, position; tab-delimited).
+#   Each SNP is packed as it is read, so memory held per chromosome is close to the size of
+#   its packed haplotypes.
+# - Chromosomes of a bgzipped VCF with a tabix index (.tbi) are converted in parallel, each
+#   worker seeking to its chromosome through the index; other VCF files are read in one pass
+#
+# Outputs (in store_dir):
+#   <chrom>.hap.npy      bit-packed haplotypes
+#   <chrom>.map          map of SNP positions (as used by selscan)
+#   samples.txt          sample (haplotype) names, in order
+#   index.txt            chromosome, number of SNPs, number of haplotypes, number of SNPs
+#                        skipped for missing calls (tab-delimited)
+#
+# Haplotypes of a chromosome can be exported as a selscan-compatible text matrix (as written
+# by VCF_to_genomatrix_hap.R: one row per haplotype, one column per SNP, space-delimited).
+#
+# Usage:
+# python3 haplotype_store.py convert <input.vcf[.gz]> <store_dir> [--threads 20]
+# python3 haplotype_store.py export <store_dir> <chrom> <output.hap.out>
+
+# Import modules
+import argparse
+import array
+import concurrent.futures
+import gzip
+import os
+import struct
+
+import numpy as np
+
+# Tabix pseudo-bin holding index metadata rather than file offsets
+TABIX_PSEUDO_BIN = 37450
+
+
+def open_vcf(path):
+    # This function returns a binary handle to a plain or gzip/bgzip-compressed VCF file
+    with open(path, 'rb') as handle:
+        is_gzipped = handle.read(2) == b'\x1f\x8b'
+    return gzip.open(path, 'rb') if is_gzipped else open(path, 'rb')
+
+
+# Byte of a haplotype with a missing call, before packing
+MISSING = b'\x02'
+
+
+def haplotype_code(genotype):
+    # This function returns the haplotype of a GT field as one byte: 1 if it carries the REF
+    # allele, 0 if it carries only ALT alleles and MISSING if missing
+    alleles = genotype.replace(b'|', b'/').split(b'/')
+    if b'.' in alleles:
+        return MISSING
+    return b'\x01' if b'0' in alleles else b'\x00'
+
+
+def vcf_samples(vcf_file):
+    # This function returns the sample names of a VCF file
+    with open_vcf(vcf_file) as vcf:
+        for line in vcf:
+            if line.startswith(b'#CHROM'):
+                return [sample.decode() for sample in line.rstrip(b'\r\n').split(b'\t')[9:]]
+    raise IOError("No #CHROM header line in VCF: %s" % vcf_file)
+
+
+def tabix_offsets(index_file):
+    # This function takes a tabix index (.tbi) as input and returns a dictionary of the first
+    # virtual file offset (compressed offset << 16 | offset within block) of each chromosome
+    with gzip.open(index_file, 'rb') as index:
+        data = index.read()
+    magic, n_ref, _, _, _, _, _, _, names_length = struct.unpack_from('<4s8i', data)
+    if magic != b'TBI\x01':
+        raise IOError("Not a tabix index: %s" % index_file)
+    names = data[36:36 + names_length].split(b'\x00')[:n_ref]
+    cursor = 36 + names_length
+    offsets = {}
+    for name in names:
+        (n_bin,) = struct.unpack_from('<i', data, cursor)
+        cursor += 4
+        starts = []
+        for _ in range(n_bin):
+            bin_number, n_chunk = struct.unpack_from('<Ii', data, cursor)
+            cursor += 8
+            chunks = struct.unpack_from('<%dQ' % (2 * n_chunk), data, cursor)
+            cursor += 16 * n_chunk
+            if bin_number != TABIX_PSEUDO_BIN:
+                starts.extend(chunks[::2])
+        (n_intv,) = struct.unpack_from('<i', data, cursor)
+        cursor += 4 + 8 * n_intv
+        if starts:
+            offsets[name] = min(starts)
+    return offsets
+
+
+def read_records(vcf_file, offset=None):
+    # This function yields the data lines of a VCF file, from a virtual file offset of a
+    # bgzipped VCF file if given
+    if offset is None:
+        with open_vcf(vcf_file) as vcf:
+            for line in vcf:
+                if not line.startswith(b'#'):
+                    yield line
+        return
+    with open(vcf_file, 'rb') as handle:
+        handle.seek(offset >> 16)
+        with gzip.GzipFile(fileobj=handle) as vcf:
+            vcf.read(offset & 0xFFFF)
+            for line in vcf:
+                yield line
+
+
+def read_chromosomes(vcf_file, n_samples, chrom=None, offset=None):
+    # This function takes a VCF file as input and yields (chromosome, positions, bit-packed
+    # haplotypes, number of SNPs skipped for missing calls) per chromosome; only the
+    # chromosome chrom (starting at a virtual file offset) if given. The haplotypes of each SNP
+    # are packed as it is read and appended to a byte array.
+    codes = {}
+    width = (n_samples + 7) // 8
+    current, positions, packed, skipped = None, array.array('q'), bytearray(), 0
+
+    def chromosome():
+        haplotypes = np.frombuffer(packed, dtype=np.uint8).reshape(len(positions), width)
+        return (current.decode(), np.frombuffer(positions, dtype=np.int64), haplotypes,
+                skipped)
+
+    for line in read_records(vcf_file, offset):
+        fields = line.rstrip(b'\r\n').split(b'\t')
+        if fields[0] != current:
+            if current is not None:
+                yield chromosome()
+            if chrom is not None and current is not None:
+                return
+            current, positions, packed, skipped = fields[0], array.array('q'), bytearray(), 0
+        if b',' in fields[4] or fields[4] == b'.':
+            continue
+        row = []
+        for sample in fields[9:]:
+            genotype = sample.split(b':', 1)[0]
+            if genotype not in codes:
+                codes[genotype] = haplotype_code(genotype)
+            row.append(codes[genotype])
+        row = b''.join(row)
+        if MISSING in row:
+            skipped += 1
+            continue
+        positions.append(int(fields[1]))
+        packed += np.packbits(np.frombuffer(row, dtype=np.uint8)).tobytes()
+    if current is not None:
+        yield chromosome()
+
+
+def write_chromosome(store_dir, chrom, positions, packed):
+    # This function writes the bit-packed haplotypes and map of one chromosome
+    hap_file = os.path.join(store_dir, chrom + '.hap.npy')
+    with open(hap_file + '.tmp', 'wb') as hap:
+        np.save(hap, packed)
+    os.replace(hap_file + '.tmp', hap_file)
+    map_file = os.path.join(store_dir, chrom + '.map')
+    with open(map_file + '.tmp', 'w') as snp_map:
+        for position in positions.tolist():
+            snp_map.write('%s\t.\t%d\t%d\n' % (chrom, position, position))
+    os.replace(map_file + '.tmp', map_file)
+
+
+def convert_chromosome(args):
+    # This function converts one chromosome of an indexed VCF file to the store
+    vcf_file, n_samples, chrom, offset, store_dir = args
+    for name, positions, packed, skipped in read_chromosomes(vcf_file, n_samples,
+                                                             chrom.encode(), offset):
+        write_chromosome(store_dir, name, positions, packed)
+        return name, len(positions), skipped
+    return chrom, 0, 0
+
+
+def convert(vcf_file, store_dir, threads=1):
+    # This function converts a VCF file to a haplotype store (see above) and returns the index:
+    # a list of (chromosome, number of SNPs, number of skipped SNPs)
+    os.makedirs(store_dir, exist_ok=True)
+    samples = vcf_samples(vcf_file)
+    index = []
+    if os.path.exists(vcf_file + '.tbi'):
+        offsets = tabix_offsets(vcf_file + '.tbi')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=threads) as executor:
+            index = list(executor.map(convert_chromosome,
+                                      [(vcf_file, len(samples), chrom.decode(), offset, store_dir)
+                                       for chrom, offset in offsets.items()]))
+    else:
+        for chrom, positions, packed, skipped in read_chromosomes(vcf_file, len(samples)):
+            write_chromosome(store_dir, chrom, positions, packed)
+            index.append((chrom, len(positions), skipped))
+    with open(os.path.join(store_dir, 'samples.txt'), 'w') as sample_file:
+        sample_file.write(''.join(sample + '\n' for sample in samples))
+    with open(os.path.join(store_dir, 'index.txt'), 'w') as index_file:
+        for chrom, n_snps, skipped in index:
+            index_file.write('%s\t%d\t%d\t%d\n' % (chrom, n_snps, len(samples), skipped))
+    print("%d SNPs of %d haplotypes on %d chromosomes (%d skipped for missing calls): %s"
+          % (sum(entry[1] for entry in index), len(samples), len(index),
+             sum(entry[2] for entry in index), store_dir))
+    return index
+
+
+def read_index(store_dir):
+    # This function returns the index of a store: a list of (chromosome, number of SNPs,
+    # number of haplotypes, number of skipped SNPs)
+    with open(os.path.join(store_dir, 'index.txt')) as index:
+        return [(fields[0], int(fields[1]), int(fields[2]), int(fields[3]))
+                for fields in (line.split('\t') for line in index)]
+
+
+def load_chromosome(store_dir, chrom):
+    # This function returns (positions, memory-mapped bit-packed haplotypes) of a chromosome
+    positions = np.loadtxt(os.path.join(store_dir, chrom + '.map'), dtype=np.int64,
+                           usecols=2, ndmin=1)
+    packed = np.load(os.path.join(store_dir, chrom + '.hap.npy'), mmap_mode='r')
+    return positions, packed
+
+
+def export_hap(store_dir, chrom, output, block_size=10000):
+    # This function writes the haplotypes of a chromosome as a text matrix: one row per
+    # haplotype, one column per SNP (0/1, space-delimited)
+    n_haplotypes = {entry[0]: entry[2] for entry in read_index(store_dir)}[chrom]
+    _, packed = load_chromosome(store_dir, chrom)
+    rows = [[] for _ in range(n_haplotypes)]
+    for start in range(0, len(packed), block_size):
+        block = np.unpackbits(packed[start:start + block_size], axis=1, count=n_haplotypes)
+        text = np.where(block.T, '1', '0')
+        for row, values in zip(rows, text):
+            row.append(' '.join(values))
+    with open(output + '.tmp', 'w') as hap:
+        for row in rows:
+            hap.write(' '.join(row) + '\n')
+    os.replace(output + '.tmp', output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bit-packed haplotype store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    convert_parser = subparsers.add_parser('convert', help="Convert a VCF file to a store")
+    convert_parser.add_argument('vcf', help="Input VCF file (bgzipped with a .tbi index to "
+                                            "convert chromosomes in parallel)")
+    convert_parser.add_argument('store_dir', help="Output directory of the store")
+    convert_parser.add_argument('--threads', type=int, default=1,
+                                help="Number of chromosomes converted at once")
+    export_parser = subparsers.add_parser('export', help="Export selscan text haplotypes")
+    export_parser.add_argument('store_dir', help="Directory of the store")
+    export_parser.add_argument('chrom', help="Chromosome to export")
+    export_parser.add_argument('output', help="Output text matrix (.hap.out)")
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        convert(args.vcf, args.store_dir, args.threads)
+    else:
+        export_hap(args.store_dir, args.chrom, args.output)
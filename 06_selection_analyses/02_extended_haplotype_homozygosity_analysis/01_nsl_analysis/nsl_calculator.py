@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: nsl_calculator.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a bit-packed haplotype store (written from a VCF file by haplotype_store.py)
+# as input and calculates the nSL statistic (number of segregating sites by length;
+# Ferrer-Admetlla et al. 2014) for each SNP, followed by frequency-bin normalisation, as
+# 'selscan --nsl' followed by 'norm --nsl':
+# 1) Haplotypes of each chromosome are memory-mapped from the store (bit-packed per SNP, 1:
+#    carries the REF allele, 0: homozygous for the ALT allele).
+# 2) For each chromosome (on a process pool), SNPs are scanned left to right and right to left.
+#    For every pair of haplotypes, the number of consecutive identical sites before the current
+#    SNP is carried over from the previous SNP (reset at a mismatch), capped at --max-extend
+#    sites (as selscan --max-extend-nsl). The shared length of a pair at a SNP is 1 + left +
+#    right; sl1 and sl0 are the mean lengths over pairs both carrying '1' and '0'.
+# 3) SNPs with a '1' frequency (or 1 - frequency) below --maf are not reported; the
+#    unstandardised nSL is ln(sl1 / sl0).
+# 4) Unstandardised scores of all chromosomes are normalised together within --bins bins of
+#    '1' frequency: (score - mean of bin) / standard deviation of bin.
+#
+# Outputs per chromosome (in output_dir, space-delimited as selscan/norm):
+#   <chrom>.nsl.out                              locus ID, position, '1' freq, sl1, sl0,
+#                                                unstandardised nSL
+#   <chrom>.nsl.out.<bins>bins.norm              as above, plus standardised nSL and 1 if
+#                                                |standardised nSL| > 2 (0 otherwise)
+#   <chrom>.nsl.out.<bins>bins.norm_plus_chrom.txt  tab-delimited norm file with the chromosome
+#                                                name as the first column
+#
+# Usage:
+# python3 nsl_calculator.py <store_dir> <output_dir> [--threads 20] [--maf 0.05]
+#        [--max-extend 100] [--bins 100]
+
+# Import modules
+import argparse
+import concurrent.futures
+import os
+
+import numpy as np
+
+from haplotype_store import read_index, load_chromosome
+
+# Number of SNPs unpacked and compared at once
+BLOCK_SIZE = 1024
+
+
+def extension_sums(packed, n_haplotypes, max_extend, block_size=BLOCK_SIZE):
+    # This function scans the SNPs of bit-packed haplotypes in order and returns, per SNP, the
+    # sum over pairs of haplotypes carrying '1' (and '0') at the SNP of the number of identical
+    # sites before it (at most max_extend). The run length of each pair is carried from block
+    # to block as the (1-based) index of its last mismatch, 0 if none.
+    first, second = np.triu_indices(n_haplotypes, 1)
+    ones = np.zeros(len(packed))
+    zeros = np.zeros(len(packed))
+    last_mismatch = np.zeros(len(first), dtype=np.int32)
+    for start in range(0, len(packed), block_size):
+        block = np.unpackbits(packed[start:start + block_size], axis=1,
+                              count=n_haplotypes).astype(bool)
+        haplotype1, haplotype2 = block[:, first], block[:, second]
+        sites = np.arange(start + 1, start + len(block) + 1, dtype=np.int32)[:, None]
+        mismatches = (haplotype1 != haplotype2) * sites
+        np.maximum(mismatches[0], last_mismatch, out=mismatches[0])
+        np.maximum.accumulate(mismatches, axis=0, out=mismatches)
+        last_mismatch = mismatches[-1].copy()
+        extension = np.minimum(sites - mismatches - 1, max_extend)
+        ones[start:start + len(block)] = (extension * (haplotype1 & haplotype2)).sum(axis=1)
+        zeros[start:start + len(block)] = (extension * ~(haplotype1 | haplotype2)).sum(axis=1)
+    return ones, zeros
+
+
+def nsl_scan(packed, n_haplotypes, max_extend=100, maf=0.05):
+    # This function takes the bit-packed haplotypes of a chromosome as input and returns
+    # (index of reported SNPs, '1' frequency, sl1, sl0, unstandardised nSL)
+    left_ones, left_zeros = extension_sums(packed, n_haplotypes, max_extend)
+    right_ones, right_zeros = extension_sums(packed[::-1], n_haplotypes, max_extend)
+    carriers = np.unpackbits(packed, axis=1, count=n_haplotypes).sum(axis=1).astype(np.float64)
+    frequency = carriers / n_haplotypes
+    reported = np.flatnonzero((np.minimum(frequency, 1 - frequency) >= maf)
+                              & (carriers >= 2) & (n_haplotypes - carriers >= 2))
+    pairs1 = carriers * (carriers - 1) / 2
+    pairs0 = (n_haplotypes - carriers) * (n_haplotypes - carriers - 1) / 2
+    sl1 = 1 + (left_ones + right_ones[::-1])[reported] / pairs1[reported]
+    sl0 = 1 + (left_zeros + right_zeros[::-1])[reported] / pairs0[reported]
+    return reported, frequency[reported], sl1, sl0, np.log(sl1 / sl0)
+
+
+def chromosome_nsl(args):
+    # This function calculates unstandardised nSL for one chromosome
+    store_dir, chrom, n_haplotypes, max_extend, maf = args
+    positions, packed = load_chromosome(store_dir, chrom)
+    reported, frequency, sl1, sl0, scores = nsl_scan(packed, n_haplotypes, max_extend, maf)
+    print("%s: %d SNPs, %d reported" % (chrom, len(positions), len(reported)))
+    return chrom, positions[reported], frequency, sl1, sl0, scores
+
+
+def normalise(frequencies, scores, bins=100):
+    # This function standardises scores within bins of frequency, over all chromosomes:
+    # (score - mean of bin) / standard deviation of bin (NaN for bins of one score)
+    frequencies, scores = np.concatenate(frequencies), np.concatenate(scores)
+    bin_index = np.minimum((frequencies * bins).astype(np.int64), bins - 1)
+    counts = np.bincount(bin_index, minlength=bins).astype(np.float64)
+    means = np.bincount(bin_index, scores, minlength=bins) / np.maximum(counts, 1)
+    squares = np.bincount(bin_index, (scores - means[bin_index]) ** 2, minlength=bins)
+    deviations = np.sqrt(np.divide(squares, counts - 1, out=np.full(bins, np.nan),
+                                   where=counts > 1))
+    return (scores - means[bin_index]) / deviations[bin_index]
+
+
+def write_results(output_dir, result, standardised, bins):
+    # This function writes the nSL, norm and norm-with-chromosome files of one chromosome
+    chrom, positions, frequency, sl1, sl0, scores = result
+    prefix = os.path.join(output_dir, chrom + '.nsl.out')
+    norm_file = '%s.%dbins.norm' % (prefix, bins)
+    with open(prefix, 'w') as nsl, open(norm_file, 'w') as norm, \
+            open(norm_file + '_plus_chrom.txt', 'w') as plus_chrom:
+        for row in zip(positions.tolist(), frequency.tolist(), sl1.tolist(), sl0.tolist(),
+                       scores.tolist(), standardised.tolist()):
+            values = '. %d %g %g %g %g' % row[:5]
+            critical = 1 if abs(row[5]) > 2 else 0
+            nsl.write(values + '\n')
+            norm.write('%s %g %d\n' % (values, row[5], critical))
+            plus_chrom.write('%s\t%s\t%g\t%d\n' % (chrom, values.replace(' ', '\t'), row[5],
+                                                   critical))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="nSL with frequency-bin normalisation")
+    parser.add_argument('store_dir', help="Haplotype store (written by haplotype_store.py)")
+    parser.add_argument('output_dir', help="Output directory")
+    parser.add_argument('--threads', type=int, default=1,
+                        help="Number of chromosomes processed at once")
+    parser.add_argument('--maf', type=float, default=0.05,
+                        help="Minimum minor allele frequency of reported SNPs (default: 0.05)")
+    parser.add_argument('--max-extend', type=int, default=100,
+                        help="Maximum number of sites a haplotype is extended (default: 100)")
+    parser.add_argument('--bins', type=int, default=100,
+                        help="Number of frequency bins for normalisation (default: 100)")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(chromosome_nsl,
+                                    [(args.store_dir, chrom, n_haplotypes, args.max_extend,
+                                      args.maf)
+                                     for chrom, _, n_haplotypes, _ in read_index(args.store_dir)]))
+    if not results:
+        raise IOError("No chromosomes in haplotype store: %s" % args.store_dir)
+    standardised = normalise([result[2] for result in results],
+                             [result[5] for result in results], args.bins)
+    offsets = np.cumsum([0] + [len(result[1]) for result in results])
+    for index, result in enumerate(results):
+        write_results(args.output_dir, result, standardised[offsets[index]:offsets[index + 1]],
+                      args.bins)
+    print("nSL of %d SNPs on %d chromosomes normalised in %d frequency bins: %s"
+          % (offsets[-1], len(results), args.bins, args.output_dir))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: extract_greatest_value_per_gene.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes as input a BED file of gene coordinates (generated from the ensembl gff3
+# file: chromosome, start, end, locus ID) and one or more BED files of SNP positions with an
+# assigned standardised iHS or nSL value (chromosome, start, end, value), and outputs the
+# greatest absolute value of the SNPs overlapping each gene, for all genes at once:
+# 1) Scores are loaded once into arrays per chromosome, sorted by position
+# 2) The SNPs overlapping each gene (BED intervals: start < gene end and end > gene start, as
+#    intersectBed) are found by binary search (numpy.searchsorted)
+# 3) The greatest absolute value of every gene is taken in one vectorised pass over the
+#    sorted scores (numpy.maximum.reduceat over the (start, end) index pairs of all genes)
+# The output file is a tab-delimited text file containing two columns, one row per gene in
+# the order of the gene BED file (the value is empty for genes without SNPs):
+# 1) Locus ID
+# 2) Greatest absolute iHS or nSL value for that gene
+#
+# Usage:
+# python3 extract_greatest_value_per_gene.py <genes.bed> <output.txt> <scores.bed> [...]
+# Example:
+# python3 extract_greatest_value_per_gene.py Bombus_terrestris.Bter_1.0.42.gff3.gene.bed
+#         nsl_scores_per_gene.tmp NC_*.nsl.out.100bins.norm.abs.bed.tmp
+
+# Import modules
+import argparse
+import os
+
+import numpy as np
+
+
+def read_scores(score_files):
+    # This function reads BED files of scores and returns a dictionary of (starts, ends,
+    # absolute scores) arrays per chromosome, sorted by start
+    columns = {}
+    for score_file in score_files:
+        with open(score_file) as scores:
+            for line in scores:
+                fields = line.split('\t')
+                if len(fields) < 4 or line.startswith(('#', 'track', 'browser')):
+                    continue
+                chrom = columns.setdefault(fields[0], ([], [], []))
+                chrom[0].append(int(fields[1]))
+                chrom[1].append(int(fields[2]))
+                chrom[2].append(abs(float(fields[3])))
+    sites = {}
+    for chrom, (starts, ends, values) in columns.items():
+        order = np.argsort(np.array(starts, dtype=np.int64), kind='stable')
+        starts = np.array(starts, dtype=np.int64)[order]
+        ends = np.array(ends, dtype=np.int64)[order]
+        if np.any(np.diff(ends) < 0):
+            raise ValueError("Score intervals on %s are nested; expected SNP positions" % chrom)
+        sites[chrom] = (starts, ends, np.array(values)[order])
+    return sites
+
+
+def read_genes(gene_file):
+    # This function reads a BED file of genes and returns a list of (chromosome, start, end,
+    # locus ID), in file order
+    genes = []
+    with open(gene_file) as bed:
+        for line in bed:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 4 or line.startswith(('#', 'track', 'browser')):
+                continue
+            genes.append((fields[0], int(fields[1]), int(fields[2]), fields[3]))
+    return genes
+
+
+def greatest_values(starts, ends, values, gene_starts, gene_ends):
+    # This function takes the sorted sites of a chromosome and gene intervals as input and
+    # returns the greatest value of the sites overlapping each gene (NaN if none)
+    first = np.searchsorted(ends, gene_starts, side='right')
+    last = np.searchsorted(starts, gene_ends, side='left')
+    greatest = np.full(len(gene_starts), np.nan)
+    overlapping = first < last
+    if np.any(overlapping):
+        # reduceat over the pairs (first, last) gives the maximum of values[first:last] at even
+        # positions; a sentinel allows last == number of sites
+        padded = np.append(values, -np.inf)
+        bounds = np.column_stack((first[overlapping], last[overlapping])).ravel()
+        greatest[overlapping] = np.maximum.reduceat(padded, bounds)[::2]
+    return greatest
+
+
+def extract_greatest_values(gene_file, score_files, output):
+    # This function writes the greatest absolute score of each gene (see above) and returns
+    # the number of genes with overlapping SNPs
+    sites = read_scores(score_files)
+    genes = read_genes(gene_file)
+    greatest = np.full(len(genes), np.nan)
+    by_chrom = {}
+    for index, gene in enumerate(genes):
+        by_chrom.setdefault(gene[0], []).append(index)
+    for chrom, indices in by_chrom.items():
+        if chrom not in sites:
+            continue
+        indices = np.array(indices)
+        gene_starts = np.array([genes[index][1] for index in indices], dtype=np.int64)
+        gene_ends = np.array([genes[index][2] for index in indices], dtype=np.int64)
+        greatest[indices] = greatest_values(*sites[chrom], gene_starts, gene_ends)
+    with open(output + '.tmp', 'w') as table:
+        for gene, value in zip(genes, greatest.tolist()):
+            table.write('%s\t%s\n' % (gene[3], '' if np.isnan(value) else '%.15g' % value))
+    os.replace(output + '.tmp', output)
+    with_sites = int(np.count_nonzero(~np.isnan(greatest)))
+    print("%d genes, %d with overlapping SNPs: %s" % (len(genes), with_sites, output))
+    return with_sites
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Greatest absolute iHS/nSL value per gene")
+    parser.add_argument('genes', help="BED file of genes: chromosome, start, end, locus ID")
+    parser.add_argument('output', help="Output: locus ID and greatest absolute value")
+    parser.add_argument('scores', nargs='+',
+                        help="BED files of SNP scores: chromosome, start, end, value")
+    args = parser.parse_args()
+
+    extract_greatest_values(args.genes, args.scores, args.output)
@@ -10,6 +10,7 @@
 import os.path
 
 from helper_functions import *
+from depth_median import summarise_depth_files
 
 # This script takes an alignment BAM file per sample and intersects with multiple BED files
 # containing the genomic positions of individual putative duplication events. 
@@ -48,7 +49,8 @@ from helper_functions import *
 #   samtools
 #   bedtools2
 #
-#  2. Ensure helper_functions.py is within the same directory of the Snakefile.
+#  2. Ensure helper_functions.py and depth_median.py are within the same directory of the
+#  Snakefile.
 #
 #  3. Assign global variables for use within specific rules
 #     Please see section below for further information on variable to be assigned
@@ -105,9 +107,6 @@ INTERSECTED_DATA        = "raw_median_temp/01_intersect_bam/{duplications}.{samp
 # Output depth counts here.
 DEPTH_DATA              = "raw_median_temp/02_depth_bam/{duplications}.{samples}.depth.txt"
 
-# Output mean counts per sample here.
-CALCULATED_MEDIAN_DATA  = "raw_median_temp/03_median_counts/{duplications}.{samples}.median_depth.txt"
-
 # Output combined mean data here.
 COMBINED_MEDIAN_DATA    = "raw_median_temp/04_combined_counts/{duplications}.combined.median_depth.txt"
 
@@ -156,23 +155,17 @@ rule count_depth:
     output: DEPTH_DATA
     run:
         check_files_arent_empty(input)
-        shell("{tools[samtools]} depth {input} > {output} && [[ -s {output} ]]")
+        shell("{tools[samtools]} depth {input} > {output}")
 
-# Calculate the median of aligned reads for each putative CNV.
+# Calculate the median of aligned reads for each putative CNV, for all samples in one batch.
+# Medians are written tab-separated on one line in the order of samples_list.txt.
 rule calculate_median:
-    input:  DEPTH_DATA
-    output: CALCULATED_MEDIAN_DATA
-    run:
-        check_files_arent_empty(input)
-        shell("Rscript median_counter_test.R {input} {output} && [[ -s {output} ]]")
-
-# Paste the means for each sample per row
-rule paste_means:
-    input:  expand("raw_median_temp/03_median_counts/{{duplications}}.{samples}.median_depth.txt", samples = SAMPLES)
+    input:  expand("raw_median_temp/02_depth_bam/{{duplications}}.{samples}.depth.txt", samples = SAMPLES)
     output: COMBINED_MEDIAN_DATA
     run:
-        check_files_arent_empty(input)
-        shell("paste {input} > {output} && [[ -s {output} ]]")
+        with open(output[0], 'w') as medians:
+            summarise_depth_files(input, medians, median_only=True)
+        check_files_arent_empty(output)
 
 # Combine the CNV mean rows
 rule combine_CNVs:
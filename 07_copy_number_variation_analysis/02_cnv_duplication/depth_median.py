@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: depth_median.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# The purpose of this script is to take in one or more text files containing three columns
+# (output of samtools depth):
+#      - Genomic scaffold - base - read depth
+#        NC_89788              1       6
+#              ..              ..      ..
+# and calculate summary statistics for the third column "read depth" of each file.
+# Each file is streamed into a histogram of read depth counts, so memory depends on the
+# maximum depth rather than on the number of lines (unlike median_counter.R, which loads
+# the whole file with read.table).
+#
+# Output (one row per input file, tab-delimited, with header):
+#   file, bases, median, mean, mad, and one column per requested quantile
+# The median is exact and matches R's median(); quantiles match R's quantile() (type 7);
+# mad is the unscaled median absolute deviation from the median.
+# An empty file (no aligned reads) is reported with 0 bases and depth statistics of 0.
+#
+# Usage:
+# python3 depth_median.py [--quantiles 0.05 0.95] [-o output.txt] <depth.txt> [<depth.txt> ...]
+# python3 depth_median.py --median-only -o medians.txt <depth.txt> [<depth.txt> ...]
+#   --median-only writes the medians only, tab-separated on one line, in input order.
+
+# Import modules
+import argparse
+import collections
+import sys
+
+
+def depth_histogram(depth_file):
+    # This function takes a samtools depth output file as input and returns a list of counts,
+    # where element i holds the number of bases with read depth i
+    with open(depth_file, 'rb') as depths:
+        # Counting the raw depth field avoids converting every line to an integer
+        counts = collections.Counter(line.rsplit(b'\t', 1)[-1] for line in depths if line.strip())
+    hist = []
+    for depth, count in counts.items():
+        depth = int(depth)
+        if depth >= len(hist):
+            hist.extend([0] * (depth + 1 - len(hist)))
+        hist[depth] += count
+    return hist
+
+
+def weighted_kth(values, counts, k):
+    # This function takes a list of values sorted in increasing order with their counts and
+    # returns the k-th smallest (0-based) of the expanded values
+    seen = 0
+    for value, count in zip(values, counts):
+        seen += count
+        if seen > k:
+            return value
+    raise IndexError("k (%d) is larger than the number of values (%d)" % (k, seen))
+
+
+def weighted_quantile(values, counts, probability):
+    # This function returns the quantile of the expanded values as R's quantile() (type 7):
+    # linear interpolation between the two closest order statistics
+    total = sum(counts)
+    position = (total - 1) * probability
+    lower = int(position)
+    low_value = weighted_kth(values, counts, lower)
+    if lower + 1 >= total or position == lower:
+        return low_value
+    high_value = weighted_kth(values, counts, lower + 1)
+    return low_value + (position - lower) * (high_value - low_value)
+
+
+def weighted_median(values, counts):
+    # This function returns the median of the expanded values as R's median()
+    total = sum(counts)
+    upper = weighted_kth(values, counts, total // 2)
+    if total % 2:
+        return upper
+    return (weighted_kth(values, counts, total // 2 - 1) + upper) / 2
+
+
+def depth_statistics(hist, quantiles=()):
+    # This function takes a read depth histogram as input and returns a dictionary of summary
+    # statistics: bases, median, mean, mad and one entry per requested quantile
+    bases = sum(hist)
+    if bases == 0:
+        stats = {'bases': 0, 'median': 0, 'mean': 0, 'mad': 0}
+        stats.update((probability, 0) for probability in quantiles)
+        return stats
+    depths = range(len(hist))
+    median = weighted_median(depths, hist)
+    # Absolute deviations from the median, sorted with their counts, give the MAD
+    deviations = sorted((abs(depth - median), count) for depth, count in zip(depths, hist) if count)
+    stats = {'bases': bases,
+             'median': median,
+             'mean': sum(depth * count for depth, count in zip(depths, hist)) / bases,
+             'mad': weighted_median([deviation for deviation, _ in deviations],
+                                    [count for _, count in deviations])}
+    stats.update((probability, weighted_quantile(depths, hist, probability))
+                 for probability in quantiles)
+    return stats
+
+
+def format_value(value):
+    # This function formats a number as R's write.table does (no trailing '.0')
+    if float(value).is_integer():
+        return "%d" % value
+    return "%g" % value
+
+
+def summarise_depth_files(depth_files, output, quantiles=(), median_only=False):
+    # This function calculates statistics for each depth file and writes them to output
+    # (an open file handle)
+    all_stats = [depth_statistics(depth_histogram(depth_file), quantiles)
+                 for depth_file in depth_files]
+    if median_only:
+        output.write('\t'.join(format_value(stats['median']) for stats in all_stats) + '\n')
+        return
+    columns = ['bases', 'median', 'mean', 'mad'] + list(quantiles)
+    output.write('\t'.join(['file', 'bases', 'median', 'mean', 'mad'] +
+                           ['q%g' % probability for probability in quantiles]) + '\n')
+    for depth_file, stats in zip(depth_files, all_stats):
+        output.write('\t'.join([depth_file] + [format_value(stats[column])
+                                               for column in columns]) + '\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exact streaming statistics of depth files")
+    parser.add_argument('depth_files', nargs='+', help="samtools depth output file(s)")
+    parser.add_argument('-o', '--output', help="Output file (default: standard output)")
+    parser.add_argument('-q', '--quantiles', type=float, nargs='+', default=[],
+                        help="Quantiles to report, e.g. 0.05 0.95")
+    parser.add_argument('--median-only', action='store_true',
+                        help="Write only the medians, tab-separated on one line")
+    args = parser.parse_args()
+    for probability in args.quantiles:
+        if not 0 <= probability <= 1:
+            parser.error("Quantiles must be between 0 and 1: %g" % probability)
+    if args.output:
+        with open(args.output, 'w') as output:
+            summarise_depth_files(args.depth_files, output, args.quantiles, args.median_only)
+    else:
+        summarise_depth_files(args.depth_files, sys.stdout, args.quantiles, args.median_only)
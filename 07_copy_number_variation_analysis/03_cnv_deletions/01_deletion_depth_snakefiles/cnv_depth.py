@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: cnv_depth.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script contains custom defined functions used by median_cnv_depth.py to:
+# 1) Read the list of putative CNV intervals (one BED file name per line)
+# 2) Split the interval list into shards by number of intervals or total length (bp)
+# 3) Calculate the median read depth of each interval for each sample BAM file, opening each
+#    indexed BAM file once and querying the sorted intervals by region
+# 4) Write per-shard median depth matrices and merge them into a CNV x sample matrix store
+# 5) Export the matrix store to the tab-delimited table (CNV name, one median per sample)
+#
+# The matrix store is three files sharing a prefix:
+#   <prefix>.npy            - float64 matrix, one row per CNV and one column per sample
+#   <prefix>.intervals.txt  - CNV names, one per line, in row order
+#   <prefix>.samples.txt    - sample names, one per line, in column order
+# The .npy file can be memory-mapped (numpy.load(..., mmap_mode='r') in Python, or
+# RcppCNPy::npyLoad in R) instead of re-parsing the text table.
+#
+# It can also be run on its own:
+# python3 cnv_depth.py calculate <interval_list> <interval_bed_template> <prefix> <sample.bam> [...]
+# python3 cnv_depth.py export <prefix> <output_table>
+# For example:
+# python3 cnv_depth.py calculate deleted_segments.txt 'deletion_beds/{shuffles}' medians *.bam
+# python3 cnv_depth.py export medians final_combined.median_depth.all_dups.txt
+
+# Import modules
+import argparse
+import os
+
+import numpy as np
+import pysam
+
+# Reads skipped when counting depth (as samtools depth): unmapped, secondary, QC fail, duplicate
+DEPTH_FLAG_FILTER = 0x4 | 0x100 | 0x200 | 0x400
+
+# Maximum number of bases of an interval held in memory at once
+DEPTH_CHUNK_SIZE = 1000000
+
+
+def read_interval_names(interval_list):
+    # This function takes a file listing one CNV BED file name per line as input and returns
+    # the names as a list, in file order
+    with open(interval_list) as names:
+        return [name.rstrip('\n') for name in names if name.strip()]
+
+
+def read_bed_intervals(bed_file):
+    # This function takes a BED file as input and returns a list of (chrom, start, end) tuples
+    intervals = []
+    with open(bed_file) as bed:
+        for line in bed:
+            if line.strip() and not line.startswith(('#', 'track', 'browser')):
+                fields = line.split('\t')
+                intervals.append((fields[0], int(fields[1]), int(fields[2])))
+    return intervals
+
+
+def interval_length(bed_file):
+    # This function returns the total number of bases covered by the intervals of a BED file
+    return sum(end - start for _, start, end in read_bed_intervals(bed_file))
+
+
+def shard_intervals(names, lengths, max_intervals=None, max_bp=None):
+    # This function takes a list of interval names and their lengths (bp) and splits the list,
+    # in order, into shards holding at most max_intervals intervals and/or at most max_bp bases.
+    # An interval longer than max_bp is placed in a shard of its own.
+    if max_intervals is None and max_bp is None:
+        return [list(names)]
+    shards = []
+    current, current_bp = [], 0
+    for name, length in zip(names, lengths):
+        full = ((max_intervals is not None and len(current) >= max_intervals) or
+                (max_bp is not None and current and current_bp + length > max_bp))
+        if full:
+            shards.append(current)
+            current, current_bp = [], 0
+        current.append(name)
+        current_bp += length
+    if current:
+        shards.append(current)
+    return shards
+
+
+def merge_intervals(intervals):
+    # This function takes a list of (chrom, start, end) tuples and returns them sorted, with
+    # overlapping intervals merged so that no base is counted twice
+    merged = []
+    for chrom, start, end in sorted(intervals):
+        if merged and merged[-1][0] == chrom and start <= merged[-1][2]:
+            merged[-1][2] = max(merged[-1][2], end)
+        else:
+            merged.append([chrom, start, end])
+    return [tuple(interval) for interval in merged]
+
+
+def region_depth_histogram(bam, chrom, start, end):
+    # This function takes an open, indexed BAM file and a region as input and returns a
+    # histogram of read depth over every base of the region (element i holds the number of
+    # bases covered by exactly i reads), including bases without any reads. Only aligned
+    # blocks are counted, so deletions and skipped regions do not add depth.
+    length = end - start
+    starts, ends = [], []
+    for read in bam.fetch(chrom, start, end):
+        if read.flag & DEPTH_FLAG_FILTER:
+            continue
+        for block_start, block_end in read.get_blocks():
+            if block_end > start and block_start < end:
+                starts.append(max(block_start, start) - start)
+                ends.append(min(block_end, end) - start)
+    if not starts:
+        return np.array([length], dtype=np.int64)
+    # Depth changes by +1 at every block start and -1 at every block end
+    delta = np.bincount(starts, minlength=length + 1) - np.bincount(ends, minlength=length + 1)
+    return np.bincount(np.cumsum(delta[:length]))
+
+
+def add_histograms(total, hist):
+    # This function adds two depth histograms of possibly different lengths
+    if len(hist) > len(total):
+        total, hist = hist, total
+    total = total.copy()
+    total[:len(hist)] += hist
+    return total
+
+
+def interval_depth_histogram(bam, intervals):
+    # This function returns the depth histogram over all bases of a CNV (a list of intervals).
+    # Long intervals are processed in chunks, so memory is bounded by the chunk size and the
+    # maximum depth rather than by the length of the CNV.
+    total = np.zeros(1, dtype=np.int64)
+    for chrom, start, end in merge_intervals(intervals):
+        for chunk_start in range(start, end, DEPTH_CHUNK_SIZE):
+            chunk_end = min(end, chunk_start + DEPTH_CHUNK_SIZE)
+            hist = region_depth_histogram(bam, chrom, chunk_start, chunk_end)
+            total = add_histograms(total, hist)
+    return total
+
+
+def histogram_median(hist):
+    # This function returns the exact median of the values summarised by a histogram, as R's
+    # median() does for the expanded values (mean of the two middle values for an even count).
+    # An empty histogram (CNV of length zero) returns 0.
+    count = int(hist.sum())
+    if count == 0:
+        return 0
+    cumulative = np.cumsum(hist)
+    # Depth of the k-th smallest base (0-based) is the first depth whose cumulative count > k
+    upper = int(np.searchsorted(cumulative, count // 2, side='right'))
+    if count % 2:
+        return upper
+    lower = int(np.searchsorted(cumulative, count // 2 - 1, side='right'))
+    return (lower + upper) / 2
+
+
+def format_depth(value):
+    # This function formats a depth value as R's write.table does (no trailing '.0')
+    if float(value).is_integer():
+        return "%d" % value
+    return "%g" % value
+
+
+def sample_median_depths(bam_file, cnvs):
+    # This function takes a sample BAM file (with .bai index) and a list of CNVs (each a list of
+    # intervals) as input and returns the median depth of each CNV. The BAM file is opened
+    # once and CNVs are visited in genomic order to keep index lookups local.
+    medians = [0] * len(cnvs)
+    order = sorted(range(len(cnvs)), key=lambda index: min(cnvs[index], default=('', 0, 0)))
+    with pysam.AlignmentFile(bam_file, 'rb') as bam:
+        for index in order:
+            medians[index] = histogram_median(interval_depth_histogram(bam, cnvs[index]))
+    return medians
+
+
+def write_matrix_atomically(output, matrix):
+    # This function saves a matrix in .npy format to a temporary file and renames it to output,
+    # so an interrupted job never leaves a partially written matrix behind
+    temp_output = "%s.tmp.%d" % (output, os.getpid())
+    with open(temp_output, 'wb') as handle:
+        np.save(handle, matrix)
+    os.replace(temp_output, output)
+
+
+def write_names_atomically(output, names):
+    # This function writes one name per line to output via a temporary file
+    temp_output = "%s.tmp.%d" % (output, os.getpid())
+    with open(temp_output, 'w') as handle:
+        handle.writelines(name + '\n' for name in names)
+    os.replace(temp_output, output)
+
+
+def store_files(prefix):
+    # This function returns the matrix, interval index and sample index paths of a store
+    return prefix + '.npy', prefix + '.intervals.txt', prefix + '.samples.txt'
+
+
+def calculate_shard(names, bed_template, bam_files, output):
+    # This function calculates the median depth of every CNV in a shard for every sample and
+    # saves them as a .npy matrix with one row per CNV and one column per sample
+    cnvs = [read_bed_intervals(bed_template.format(shuffles=name)) for name in names]
+    matrix = np.zeros((len(names), len(bam_files)), dtype=np.float64)
+    for column, bam_file in enumerate(bam_files):
+        matrix[:, column] = sample_median_depths(bam_file, cnvs)
+    write_matrix_atomically(output, matrix)
+
+
+def merge_shards(shard_matrices, names, samples, prefix):
+    # This function stacks per-shard matrices, in shard order, into a single matrix store.
+    # The merged matrix is filled through a memory map, so shards never all sit in memory.
+    matrix_file, intervals_file, samples_file = store_files(prefix)
+    temp_output = "%s.tmp.%d" % (matrix_file, os.getpid())
+    merged = np.lib.format.open_memmap(temp_output, mode='w+', dtype=np.float64,
+                                       shape=(len(names), len(samples)))
+    row = 0
+    for shard_matrix in shard_matrices:
+        shard = np.load(shard_matrix, mmap_mode='r')
+        if shard.shape[1] != len(samples):
+            raise ValueError("Expected %d samples, found %d in: %s"
+                             % (len(samples), shard.shape[1], shard_matrix))
+        merged[row:row + shard.shape[0]] = shard
+        row += shard.shape[0]
+    if row != len(names):
+        raise ValueError("Expected %d CNVs, found %d in shards" % (len(names), row))
+    merged.flush()
+    del merged
+    write_names_atomically(intervals_file, names)
+    write_names_atomically(samples_file, samples)
+    os.replace(temp_output, matrix_file)
+
+
+def load_store(prefix, mmap_mode='r'):
+    # This function returns the (memory-mapped) matrix, CNV names and sample names of a store
+    matrix_file, intervals_file, samples_file = store_files(prefix)
+    return (np.load(matrix_file, mmap_mode=mmap_mode),
+            read_interval_names(intervals_file),
+            read_interval_names(samples_file))
+
+
+def export_table(prefix, output):
+    # This function writes a matrix store as the tab-delimited table of the original workflow:
+    # one row per CNV with the CNV name followed by one median per sample (no header)
+    matrix, names, _ = load_store(prefix)
+    temp_output = "%s.tmp.%d" % (output, os.getpid())
+    with open(temp_output, 'w') as table:
+        for name, row in zip(names, matrix):
+            table.write(name + '\t' + '\t'.join(map(format_depth, row.tolist())) + '\n')
+    os.replace(temp_output, output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Median read depth per CNV and sample")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    calculate = subparsers.add_parser('calculate', help="Write a CNV x sample matrix store")
+    calculate.add_argument('interval_list', help="File with one CNV BED file name per line")
+    calculate.add_argument('interval_bed',
+                           help="BED path template, e.g. 'deletion_beds/{shuffles}'")
+    calculate.add_argument('prefix', help="Output matrix store prefix")
+    calculate.add_argument('bams', nargs='+', help="Indexed sample BAM files")
+    export = subparsers.add_parser('export', help="Export a matrix store as a text table")
+    export.add_argument('prefix', help="Matrix store prefix")
+    export.add_argument('output', help="Output table: CNV name followed by one median per sample")
+    args = parser.parse_args()
+    if args.command == 'calculate':
+        names = read_interval_names(args.interval_list)
+        samples = [os.path.basename(bam).rsplit('.bam', 1)[0] for bam in args.bams]
+        shard_matrix = args.prefix + '.shard.npy'
+        calculate_shard(names, args.interval_bed, args.bams, shard_matrix)
+        merge_shards([shard_matrix], names, samples, args.prefix)
+        os.remove(shard_matrix)
+    else:
+        export_table(args.prefix, args.output)
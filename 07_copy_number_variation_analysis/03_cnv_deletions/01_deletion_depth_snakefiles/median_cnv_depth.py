@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+##############################################################################
+##############################################################################
+# Author: Joe Colgan                   Program: median_cnv_depth.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# Import modules
+import os.path
+
+from helper_functions import *
+from cnv_depth import *
+
+# """
+# This script takes an alignment BAM file per sample and a list of BED files containing the
+# genomic positions of individual putative CNV events (deletions, or randomly shuffled
+# intervals for the null distribution). For each CNV and sample, the median number of reads
+# aligned per genomic base of the CNV (including bases without aligned reads) is calculated,
+# opening each indexed BAM file once per shard (see cnv_depth.py). Output is a CNV x sample
+# matrix store (median_depth.npy plus CNV and sample index files) and the same matrix as a
+# table with one row per CNV: CNV name followed by the median depth for each sample (in the
+# order of samples_list.txt).
+#
+# It replaces the per-shard copies median_deletion_depth.{aa..ak}.py and
+# median_shuffle_depth.{aa..ai,total}.py: the full interval list is split into shards
+# automatically and each shard is a separate job, so shards are scheduled across cores
+# (-j) or cluster nodes (--cluster) by Snakemake.
+
+# To achieve final output, the Snakefile contains custom-defined rules (see below) that
+# outline commands to execute sequentially to take custom-defined input(s) and generate
+# final output (as defined in rule all).
+
+# For this specific script, rules are defined as follows:
+# rule all:
+#   - Defines the expected final output of the Snakefile.
+# rule index_bam:
+#   - Indexes each sample BAM file for region queries.
+# rule calculate_shard_median:
+#   - For each shard of CNVs, calculates the median depth per CNV and sample.
+# rule combine_shards:
+#   - Combines the shard matrices into a single CNV x sample matrix store.
+# rule export_final_table:
+#   - Writes the matrix store as the final tab-delimited table.
+
+##############################################################################
+# Sample information
+##############################################################################
+# Bumblebee (Bombus terrestris) males were collected summer 2014
+# Sample sites (n=26) were from across the UK
+# Each individual and site were assigned unique identifiers
+# Example: '2014_Bter_P_D_14_260_head'
+# Explanation:{year_collected}_{species}_{site_type}_{sex}_{site_number}_{tube_number}_{tissue_type}
+# species: Bter = Bombus terrestris
+# site_type: P = Pastoral, M = Mixed, A = Arable
+# sex: D = Male (drone)
+
+##############################################################################
+# Prior to use
+##############################################################################
+# To run median_cnv_depth.py:
+#  1. Download and install the following software:
+#   samtools
+#   python modules: numpy, pysam
+#
+#  2. Ensure helper_functions.py and cnv_depth.py are within the same directory of the Snakefile.
+#
+#  3. Assign global variables for use within specific rules
+#     Please see section below for further information on variable to be assigned
+#     Each variable can also be set on the command line, for example for the shuffle analysis:
+#     snakemake -s median_cnv_depth.py -p -j 20 --config \
+#         interval_list=total_shuffle_bed.filtered.txt \
+#         interval_bed=shuffle_bed/{shuffles}.bed \
+#         output_dir=shuffle_median_temp
+#
+#  4. Make a text.file called 'samples_list.txt' and put in same directory as Snakfile.
+#     Populate 'samples_list.txt' with names of samples to be analysed.
+#       For example:
+#       2014_Bter_P_D_14_260_head
+#       2014_Blap_P_D_21_412_thorax
+#       2014_Bpas_A_D_20_391_thorax
+#
+##############################################################################
+# Assign global variables for use in rules (see below)
+##############################################################################
+# Assign name for list of CNVs - one BED file name per line
+INTERVAL_LIST    = config.get('interval_list', "deletion_beds/deleted_segments.txt")
+
+# Assign path for BED files containing CNV information ({shuffles} is a name from INTERVAL_LIST)
+INTERVAL_BED     = config.get('interval_bed', "deletion_beds/{shuffles}")
+
+# Assign directory for intermediate and final output
+OUTPUT_DIR       = config.get('output_dir', "deletion_bed_temp")
+
+# Assign maximum number of CNVs per shard and/or maximum total length (bp) of CNVs per shard.
+# Set either to None to ignore it.
+SHARD_INTERVALS  = config.get('shard_intervals', 500)
+SHARD_BP         = config.get('shard_bp', None)
+
+##############################################################################
+# Assignment of wildcards to be used within rules
+##############################################################################
+# Open file and read in contents - one sample per line
+with open('samples_list.txt') as samples:
+    content = samples.readlines()
+    SAMPLES = [samples.rstrip('\n') for samples in content]
+    print(SAMPLES)
+
+# Read in the content of the CNV list - one CNV per line - and split into shards
+INTERVALS = read_interval_names(INTERVAL_LIST)
+if SHARD_BP is not None:
+    LENGTHS = [interval_length(INTERVAL_BED.format(shuffles=name)) for name in INTERVALS]
+else:
+    LENGTHS = [0] * len(INTERVALS)
+SHARDS = shard_intervals(INTERVALS, LENGTHS, SHARD_INTERVALS, SHARD_BP)
+print("%d CNVs in %d shards" % (len(INTERVALS), len(SHARDS)))
+
+##############################################################################
+# Specify all input/output files in terms of sample wildcards
+##############################################################################
+# Assign path for input alignment BAM files.
+ALIGNED_DATA            = "./{samples}.bam"
+
+# Output BAM index files here.
+ALIGNED_INDEX           = "./{samples}.bam.bai"
+
+# Output median depth per CNV and sample for each shard here.
+SHARD_MEDIAN_DATA       = OUTPUT_DIR + "/01_shard_medians/shard_{shard}.median_depth.npy"
+
+# Output CNV x sample median depth matrix store here (see cnv_depth.py).
+MATRIX_PREFIX           = OUTPUT_DIR + "/05_matrix/median_depth"
+MATRIX_DATA             = store_files(MATRIX_PREFIX)
+
+# Output final data file here.
+FINAL_DATA              = OUTPUT_DIR + "/06_final/final_combined.median_depth.all_dups.txt"
+
+##############################################################################
+# Define binaries in context of path relative to Snakefile
+##############################################################################
+# binaries
+# Align lines of code using 'Assign Align' using cmd+shift+p and selecting 'align'
+# Create dictionaries for directories and  tools'
+dirs  = {}
+dirs['project']        = os.path.abspath('../../../../')
+dirs['src']            = os.path.join(dirs['project'], 'src')
+
+# Create an empty dictionary called 'tools'
+tools = {}
+tools['samtools']      = os.path.join(dirs['src'], 'samtools-1.2/samtools')
+
+##############################################################################
+#
+# Specify rules with commands to be executed
+#
+##############################################################################
+# First rule is list the final output
+rule all:
+    input: FINAL_DATA
+
+# Index BAM files for region queries.
+rule index_bam:
+    input:  ALIGNED_DATA
+    output: ALIGNED_INDEX
+    run:
+        check_files_arent_empty(input)
+        shell("{tools[samtools]} index {input} && [[ -s {output} ]]")
+
+# Calculate the median depth of each CNV in a shard for each sample.
+rule calculate_shard_median:
+    input:  bams=expand(ALIGNED_DATA, samples=SAMPLES),
+            bais=expand(ALIGNED_INDEX, samples=SAMPLES),
+            beds=lambda wildcards: [INTERVAL_BED.format(shuffles=name)
+                                    for name in SHARDS[int(wildcards.shard)]]
+    output: SHARD_MEDIAN_DATA
+    run:
+        check_files_arent_empty(input)
+        calculate_shard(SHARDS[int(wildcards.shard)], INTERVAL_BED, input.bams, output[0])
+        check_files_arent_empty(output)
+
+# Combine the shard matrices in the order of the CNV list
+rule combine_shards:
+    input:  expand(SHARD_MEDIAN_DATA, shard=range(len(SHARDS)))
+    output: MATRIX_DATA
+    run:
+        check_files_arent_empty(input)
+        merge_shards(input, INTERVALS, SAMPLES, MATRIX_PREFIX)
+        check_files_arent_empty(output)
+
+# Export the matrix store as a table: CNV name followed by one median per sample
+rule export_final_table:
+    input:  MATRIX_DATA
+    output: FINAL_DATA
+    run:
+        export_table(MATRIX_PREFIX, output[0])
+        check_files_arent_empty(output)
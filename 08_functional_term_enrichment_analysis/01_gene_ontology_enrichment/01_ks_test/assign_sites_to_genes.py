@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: assign_sites_to_genes.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a BED file of gene coordinates (chromosome, start, end, locus ID; from
+# the ensembl gff3 file) and a tab-delimited table of sites (e.g. nsl_n41_unfiltered.txt:
+# chromosome, start, end, ..., with raw and corrected p-values in given columns) as input
+# and assigns every site to the genes it overlaps, in one pass:
+# 1) Both tables are loaded once; ensembl chromosome names (e.g. B01) are renamed in memory
+#    from a file of aliases (old name, new name) or, as previously, by pairing the gene
+#    chromosome names containing 'B' with the site chromosome names, both in order of
+#    appearance (--pair-chromosomes)
+# 2) Genes and sites of each chromosome are sorted by start and swept together: genes are
+#    added to a heap of active genes (ordered by end) as the sweep reaches their start and
+#    dropped once it passes their end, so each site is compared only with the genes active
+#    at its position (BED intervals overlap if start < other end and end > other start)
+#
+# Outputs (with prefix given by --output):
+#   <prefix>.overlaps.txt          locus ID, chromosome, start, end, raw p-value, corrected
+#                                  p-value: one row per overlapping gene and site (replacing
+#                                  the per-gene intersectBed files)
+#   <prefix>.per_gene.txt          locus ID, number of sites, lowest raw p-value, lowest
+#                                  corrected p-value, number of sites with a corrected
+#                                  p-value < --alpha (header line; genes without sites: 0/NA)
+#   <prefix>.significant_genes.txt locus IDs of genes with a site with a corrected p-value <
+#                                  --alpha (gene list read by the Fisher's exact test notebook)
+#   <prefix>.ks_<raw|corrected>.txt locus ID, -log10(lowest p-value) and, with --lengths
+#                                  (locus ID, corrected gene length), the gene length: the
+#                                  ranked genelist layout read by the KS test notebook
+#
+# Usage:
+# python3 assign_sites_to_genes.py <genes.bed> <sites.txt> --output <prefix>
+#        [--aliases chromosome_names.txt | --pair-chromosomes] [--raw-column 6]
+#        [--corrected-column 7] [--alpha 0.05] [--lengths gene_by_corrected_length.txt]
+
+# Import modules
+import argparse
+import heapq
+import math
+import os
+
+
+def read_genes(gene_file):
+    # This function reads a BED file of genes and returns a list of (chromosome, start, end,
+    # locus ID), in file order
+    genes = []
+    with open(gene_file) as bed:
+        for line in bed:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) >= 4 and not line.startswith(('#', 'track', 'browser')):
+                genes.append((fields[0], int(fields[1]), int(fields[2]), fields[3]))
+    return genes
+
+
+def read_sites(site_file, raw_column, corrected_column):
+    # This function reads a table of sites and returns a list of (chromosome, start, end, raw
+    # p-value, corrected p-value); columns are 1-based (as cut). Lines whose start is not a
+    # number (e.g. a header) are skipped.
+    sites = []
+    with open(site_file) as table:
+        for line in table:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < max(3, raw_column, corrected_column) or not fields[1].isdigit():
+                continue
+            sites.append((fields[0], int(fields[1]), int(fields[2]),
+                          float(fields[raw_column - 1]), float(fields[corrected_column - 1])))
+    return sites
+
+
+def unique_in_order(names):
+    # This function returns the unique names of a sequence, in order of first appearance
+    return list(dict.fromkeys(names))
+
+
+def paired_aliases(genes, sites):
+    # This function pairs the gene chromosome names containing 'B' with the site chromosome
+    # names, both in order of appearance
+    old_names = [name for name in unique_in_order(gene[0] for gene in genes) if 'B' in name]
+    new_names = unique_in_order(site[0] for site in sites)
+    if len(old_names) != len(new_names):
+        raise ValueError("%d gene chromosomes but %d site chromosomes to pair"
+                         % (len(old_names), len(new_names)))
+    return dict(zip(old_names, new_names))
+
+
+def read_aliases(alias_file):
+    # This function reads a file of chromosome aliases: old name, new name
+    with open(alias_file) as aliases:
+        return dict(line.split()[:2] for line in aliases if line.strip())
+
+
+def sweep_overlaps(genes, sites):
+    # This function takes the genes and sites of one chromosome as input and yields (gene
+    # index, site index) for every overlapping pair, sweeping both sorted by start
+    gene_order = sorted(range(len(genes)), key=lambda index: genes[index][1])
+    site_order = sorted(range(len(sites)), key=lambda index: sites[index][1])
+    active = []
+    next_gene = 0
+    for site_index in site_order:
+        _, site_start, site_end = sites[site_index][:3]
+        while next_gene < len(gene_order) and genes[gene_order[next_gene]][1] < site_end:
+            gene_index = gene_order[next_gene]
+            heapq.heappush(active, (genes[gene_index][2], gene_index))
+            next_gene += 1
+        # Site starts only increase: genes ending at or before this start end before all
+        # later sites
+        while active and active[0][0] <= site_start:
+            heapq.heappop(active)
+        for gene_end, gene_index in active:
+            if genes[gene_index][1] < site_end:
+                yield gene_index, site_index
+
+
+def assign_sites(genes, sites, aliases):
+    # This function returns a list of (gene index, site index) of all overlapping genes and
+    # sites, with gene chromosomes renamed by aliases, sorted by gene then site
+    genes_by_chrom, sites_by_chrom = {}, {}
+    for index, gene in enumerate(genes):
+        genes_by_chrom.setdefault(aliases.get(gene[0], gene[0]), []).append(index)
+    for index, site in enumerate(sites):
+        sites_by_chrom.setdefault(site[0], []).append(index)
+    pairs = []
+    for chrom, gene_indices in genes_by_chrom.items():
+        site_indices = sites_by_chrom.get(chrom, [])
+        for gene_number, site_number in sweep_overlaps([genes[i] for i in gene_indices],
+                                                       [sites[i] for i in site_indices]):
+            pairs.append((gene_indices[gene_number], site_indices[site_number]))
+    return sorted(pairs)
+
+
+def format_pvalue(value):
+    # This function formats a p-value, writing missing values as NA
+    return 'NA' if value is None else '%.6g' % value
+
+
+def write_outputs(prefix, genes, sites, pairs, alpha, lengths):
+    # This function writes the overlap, per-gene, significant gene and KS genelist tables
+    per_gene = [[0, None, None, 0] for _ in genes]
+    with open(prefix + '.overlaps.txt', 'w') as overlaps:
+        for gene_index, site_index in pairs:
+            chrom, start, end, raw, corrected = sites[site_index]
+            overlaps.write('%s\t%s\t%d\t%d\t%s\t%s\n' % (genes[gene_index][3], chrom, start, end,
+                                                         format_pvalue(raw),
+                                                         format_pvalue(corrected)))
+            summary = per_gene[gene_index]
+            summary[0] += 1
+            summary[1] = raw if summary[1] is None else min(summary[1], raw)
+            summary[2] = corrected if summary[2] is None else min(summary[2], corrected)
+            summary[3] += corrected < alpha
+    with open(prefix + '.per_gene.txt', 'w') as table, \
+            open(prefix + '.significant_genes.txt', 'w') as significant:
+        table.write('locus\tn_sites\tmin_raw_pvalue\tmin_corrected_pvalue\tn_significant\n')
+        for gene, (n_sites, raw, corrected, n_significant) in zip(genes, per_gene):
+            table.write('%s\t%d\t%s\t%s\t%d\n' % (gene[3], n_sites, format_pvalue(raw),
+                                                  format_pvalue(corrected), n_significant))
+            if n_significant:
+                significant.write(gene[3] + '\n')
+    for name, column in (('raw', 1), ('corrected', 2)):
+        with open('%s.ks_%s.txt' % (prefix, name), 'w') as genelist:
+            for gene, summary in zip(genes, per_gene):
+                if summary[column] is None or (lengths is not None and gene[3] not in lengths):
+                    continue
+                score = -math.log10(max(summary[column], 1e-300))
+                row = [gene[3], '%.6g' % score]
+                if lengths is not None:
+                    row.append(lengths[gene[3]])
+                genelist.write('\t'.join(row) + '\n')
+    return sum(1 for summary in per_gene if summary[0])
+
+
+def read_lengths(length_file):
+    # This function reads corrected gene lengths: locus ID, length
+    with open(length_file) as lengths:
+        return dict(line.rstrip('\n').split('\t')[:2] for line in lengths if line.strip())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Assign sites to overlapping genes")
+    parser.add_argument('genes', help="BED file of genes: chromosome, start, end, locus ID")
+    parser.add_argument('sites', help="Table of sites: chromosome, start, end, ... p-values")
+    parser.add_argument('--output', required=True, help="Prefix of output files")
+    aliases = parser.add_mutually_exclusive_group()
+    aliases.add_argument('--aliases', help="Chromosome aliases: old name, new name per line")
+    aliases.add_argument('--pair-chromosomes', action='store_true',
+                         help="Rename gene chromosomes containing 'B' to the site chromosomes, "
+                              "both in order of appearance")
+    parser.add_argument('--raw-column', type=int, default=6,
+                        help="Column (1-based) of raw p-values (default: 6)")
+    parser.add_argument('--corrected-column', type=int, default=7,
+                        help="Column (1-based) of corrected p-values (default: 7)")
+    parser.add_argument('--alpha', type=float, default=0.05,
+                        help="Significance threshold of corrected p-values (default: 0.05)")
+    parser.add_argument('--lengths', help="Corrected gene lengths: locus ID, length")
+    args = parser.parse_args()
+
+    genes = read_genes(args.genes)
+    sites = read_sites(args.sites, args.raw_column, args.corrected_column)
+    if args.aliases:
+        chromosome_aliases = read_aliases(args.aliases)
+    elif args.pair_chromosomes:
+        chromosome_aliases = paired_aliases(genes, sites)
+    else:
+        chromosome_aliases = {}
+    pairs = assign_sites(genes, sites, chromosome_aliases)
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with_sites = write_outputs(args.output, genes, sites, pairs, args.alpha,
+                               read_lengths(args.lengths) if args.lengths else None)
+    print("%d sites, %d genes (%d with overlapping sites), %d overlaps: %s.*"
+          % (len(sites), len(genes), with_sites, len(pairs), args.output))
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: get_corrected_gene_length.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script takes a BED file of gene coordinates (chromosome, start, end, locus ID;
+# generated from the ensembl gff3 file) and a genome FASTA file with a samtools faidx index
+# (.fai) as input and calculates the corrected length of each gene: the length of the gene
+# minus the number of N bases (as fastaFromBed followed by seqtk comp, length - #N):
+# 1) Ensembl chromosome names (e.g. B01) are renamed to the names of the genome (e.g.
+#    NC_015762.1) in memory, from a file of aliases (two tab-delimited columns: old name, new
+#    name) or, as previously, by pairing the sorted gene BED chromosome names with the
+#    chromosomes of a VCF file in order (--vcf). Genes on unplaced scaffolds (GL) are skipped.
+# 2) The genome is memory-mapped and, using the sequence offsets of the .fai index, a
+#    cumulative count of N bases is built for each chromosome with genes
+# 3) The number of N bases of each gene is the difference of two cumulative counts
+#
+# The output file is a tab-delimited text file with two columns, one row per gene in the order
+# of the gene BED file:
+# 1) Locus ID
+# 2) Corrected gene length
+# If a file of scores per gene (locus ID, score) is given (--scores), a second table of
+# locus ID, score and corrected gene length is written (--scores-output).
+#
+# Usage:
+# python3 get_corrected_gene_length.py <genes.bed> <genome.fna> <output.txt>
+#        [--aliases chromosome_list.txt | --vcf input.vcf.gz]
+#        [--scores nsl_scores_per_gene.tmp --scores-output nsl_scores_per_gene.txt]
+
+# Import modules
+import argparse
+import gzip
+import mmap
+import os
+
+import numpy as np
+
+
+def read_fai(fai_file):
+    # This function reads a samtools faidx index and returns a dictionary of (length, offset,
+    # bases per line, bytes per line) per sequence
+    index = {}
+    with open(fai_file) as fai:
+        for line in fai:
+            fields = line.split('\t')
+            index[fields[0]] = tuple(int(field) for field in fields[1:5])
+    return index
+
+
+def cumulative_n_counts(genome, entry):
+    # This function takes a memory-mapped genome and the .fai entry of a sequence as input and
+    # returns the cumulative number of N bases before each position (length + 1 values)
+    length, offset, line_bases, line_bytes = entry
+    full_lines, last_line = divmod(length, line_bases)
+    size = full_lines * line_bytes + last_line
+    data = np.frombuffer(genome, dtype=np.uint8, count=size, offset=offset)
+    if line_bytes != line_bases:
+        # Drop line endings: keep the first line_bases bytes of each line
+        lines = data[:full_lines * line_bytes].reshape(full_lines, line_bytes)[:, :line_bases]
+        data = np.concatenate((lines.ravel(), data[full_lines * line_bytes:]))
+    counts = np.zeros(length + 1, dtype=np.int64)
+    np.cumsum((data == ord('N')) | (data == ord('n')), out=counts[1:])
+    return counts
+
+
+def vcf_aliases(genes, vcf_file):
+    # This function pairs the sorted chromosome names of the genes (unplaced GL scaffolds
+    # excluded) with the chromosomes of a VCF file, in order of appearance
+    old_names = sorted(set(gene[0] for gene in genes if 'GL' not in gene[0]))
+    new_names = []
+    opener = gzip.open if vcf_file.endswith('.gz') else open
+    with opener(vcf_file, 'rt') as vcf:
+        for line in vcf:
+            if not line.startswith('#'):
+                chrom = line.split('\t', 1)[0]
+                if not new_names or new_names[-1] != chrom:
+                    new_names.append(chrom)
+    if len(old_names) != len(new_names):
+        raise ValueError("%d gene chromosomes but %d VCF chromosomes: %s"
+                         % (len(old_names), len(new_names), vcf_file))
+    return dict(zip(old_names, new_names))
+
+
+def read_aliases(alias_file):
+    # This function reads a file of chromosome aliases: old name, new name
+    with open(alias_file) as aliases:
+        return dict(line.split()[:2] for line in aliases if line.strip())
+
+
+def read_genes(gene_file):
+    # This function reads a BED file of genes and returns a list of (chromosome, start, end,
+    # locus ID), in file order
+    genes = []
+    with open(gene_file) as bed:
+        for line in bed:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) >= 4 and not line.startswith(('#', 'track', 'browser')):
+                genes.append((fields[0], int(fields[1]), int(fields[2]), fields[3]))
+    return genes
+
+
+def corrected_lengths(genes, genome_file, aliases):
+    # This function returns a list of (locus ID, corrected length) of the genes on chromosomes
+    # of the genome (after renaming with aliases), in order
+    index = read_fai(genome_file + '.fai')
+    by_chrom = {}
+    for number, (chrom, start, end, locus) in enumerate(genes):
+        chrom = aliases.get(chrom, chrom)
+        if 'GL' not in chrom and chrom in index:
+            by_chrom.setdefault(chrom, []).append(number)
+    lengths = {}
+    with open(genome_file, 'rb') as handle:
+        genome = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for chrom, numbers in by_chrom.items():
+                counts = cumulative_n_counts(genome, index[chrom])
+                chrom_length = index[chrom][0]
+                for number in numbers:
+                    # Gene coordinates are clipped to the chromosome, as fastaFromBed
+                    start = min(max(genes[number][1], 0), chrom_length)
+                    end = min(max(genes[number][2], start), chrom_length)
+                    lengths[number] = (end - start) - int(counts[end] - counts[start])
+                del counts
+        finally:
+            genome.close()
+    return [(genes[number][3], lengths[number]) for number in sorted(lengths)]
+
+
+def write_table(output, rows):
+    # This function writes rows to a tab-delimited table
+    with open(output + '.tmp', 'w') as table:
+        for row in rows:
+            table.write('\t'.join(str(value) for value in row) + '\n')
+    os.replace(output + '.tmp', output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gene length minus N bases")
+    parser.add_argument('genes', help="BED file of genes: chromosome, start, end, locus ID")
+    parser.add_argument('genome', help="Genome FASTA file (indexed with samtools faidx)")
+    parser.add_argument('output', help="Output: locus ID and corrected gene length")
+    aliases = parser.add_mutually_exclusive_group()
+    aliases.add_argument('--aliases', help="Chromosome aliases: old name, new name per line")
+    aliases.add_argument('--vcf', help="VCF file whose chromosomes (in order) rename the "
+                                       "sorted gene chromosomes")
+    parser.add_argument('--scores', help="Scores per gene: locus ID, score")
+    parser.add_argument('--scores-output', help="Output: locus ID, score, corrected length")
+    args = parser.parse_args()
+    if bool(args.scores) != bool(args.scores_output):
+        parser.error("--scores and --scores-output are used together")
+
+    genes = read_genes(args.genes)
+    if args.aliases:
+        chromosome_aliases = read_aliases(args.aliases)
+    elif args.vcf:
+        chromosome_aliases = vcf_aliases(genes, args.vcf)
+    else:
+        chromosome_aliases = {}
+    lengths = corrected_lengths(genes, args.genome, chromosome_aliases)
+    write_table(args.output, lengths)
+    print("Corrected lengths of %d of %d genes: %s" % (len(lengths), len(genes), args.output))
+    if args.scores:
+        gene_lengths = dict(lengths)
+        with open(args.scores) as scores:
+            rows = [(fields[0], fields[1], gene_lengths[fields[0]])
+                    for fields in (line.rstrip('\n').split('\t') for line in scores)
+                    if fields[0] in gene_lengths]
+        write_table(args.scores_output, rows)
+        print("Scores and corrected lengths of %d genes: %s" % (len(rows), args.scores_output))
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+##############################################################################
+# Author: Joe Colgan                   Program: go_enrichment.py
+#
+# Date: 18/10/2026
+#
+##############################################################################
+# This script performs gene ontology (GO) enrichment analysis for one or more gene score
+# vectors (e.g. nSL, nucleotide diversity, CNV) at once, without rebuilding the GO graph and
+# gene mapping for each run as topGO does:
+# 1) A gene x GO term matrix is built from a gene-to-GO mapping file (as read by topGO
+#    readMappings: locus ID, comma-separated GO terms) and the GO ontology (OBO format,
+#    e.g. go-basic.obo). Annotations are propagated to all ancestor terms (is_a and part_of).
+#    The matrix is stored in compressed sparse row (CSR) form and cached, keyed by the
+#    checksum (SHA-256) of the mapping and ontology files and a matrix format version, so
+#    later runs load it directly.
+# 2) For each score vector and ontology, the genes with a score and at least one annotation
+#    in the ontology form the universe (as topGO, which uses the genes annotated in the
+#    ontology tested); terms with fewer than --node-size annotated genes are skipped (as topGO
+#    nodeSize). Significant genes are the --top-fraction of genes of the universe with the
+#    lowest scores (as geneSel with a quantile cut-off), or the genes of a gene list
+#    (--gene-list). Score vectors without genes in the universe of an ontology are skipped.
+# 3) For all terms of the ontology at once:
+#    - Fisher's exact test (one-sided, enrichment): upper tail of the hypergeometric
+#      distribution, summed from a table of log factorials
+#    - Kolmogorov-Smirnov test (one-sided; genes of the term have lower scores than other
+#      genes): the statistic is taken from the ranks of the genes of each term (sorted within
+#      CSR rows), with the asymptotic p-value exp(-2 * m * n / (m + n) * D^2)
+#    P-values are adjusted for multiple testing per ontology (Benjamini-Hochberg).
+# Tests are 'classic' (each term tested independently), not topGO's 'weight01' algorithm.
+#
+# Scores are read from a tab-delimited table with a header line: locus ID followed by one
+# column per score vector (NA for missing values). Lower scores are more significant unless
+# --decreasing is given.
+#
+# Outputs (in output_dir), one table per score vector and ontology (BP, MF, CC):
+#   <score>_<ontology>.tsv with columns GO.ID, Term, Annotated, Significant, Expected,
+#   classic_ks, classic_fisher, classic_ks_adjusted, classic_fisher_adjusted
+#
+# Usage:
+# python3 go_enrichment.py build <mapping.txt> <go-basic.obo> [--cache-dir cache]
+# python3 go_enrichment.py test <mapping.txt> <go-basic.obo> <scores.txt> <output_dir>
+#        [--node-size 50] [--top-fraction 0.05 | --gene-list genes.txt] [--decreasing]
+#        [--cache-dir cache]
+
+# Import modules
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+NAMESPACES = {'biological_process': 'BP', 'molecular_function': 'MF',
+              'cellular_component': 'CC'}
+
+# Number of terms whose hypergeometric tails are summed at once
+TERM_CHUNK = 1000
+
+# Version of the cached matrix format, part of the cache key: increase it when build_matrix
+# changes (e.g. the propagation rules) so that matrices cached before are rebuilt
+MATRIX_VERSION = 1
+
+
+def file_checksum(paths, block_size=1024 * 1024):
+    # This function returns the SHA-256 checksum of the contents of one or more files
+    checksum = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(block_size), b''):
+                checksum.update(block)
+    return checksum.hexdigest()
+
+
+def read_obo(obo_file):
+    # This function reads a GO ontology in OBO format and returns (terms, alternative IDs):
+    # a dictionary of term ID to (name, namespace, parents) of terms that are not obsolete,
+    # and a dictionary of alternative ID to term ID
+    terms, alternative_ids = {}, {}
+    stanza = None
+
+    def add(stanza):
+        if stanza and stanza.get('id') and not stanza.get('is_obsolete'):
+            terms[stanza['id']] = (stanza.get('name', ''), stanza.get('namespace', ''),
+                                   stanza['parents'])
+            for alternative_id in stanza['alt_ids']:
+                alternative_ids[alternative_id] = stanza['id']
+
+    with open(obo_file) as obo:
+        for line in obo:
+            line = line.strip()
+            if line.startswith('['):
+                add(stanza)
+                stanza = {'parents': [], 'alt_ids': []} if line == '[Term]' else None
+                continue
+            if stanza is None or ': ' not in line:
+                continue
+            key, value = line.split(': ', 1)
+            value = value.split(' ! ', 1)[0].strip()
+            if key in ('id', 'name', 'namespace'):
+                stanza[key] = value
+            elif key == 'is_a':
+                stanza['parents'].append(value)
+            elif key == 'relationship' and value.startswith('part_of '):
+                stanza['parents'].append(value.split()[1])
+            elif key == 'alt_id':
+                stanza['alt_ids'].append(value)
+            elif key == 'is_obsolete' and value == 'true':
+                stanza['is_obsolete'] = True
+    add(stanza)
+    return terms, alternative_ids
+
+
+def term_ancestors(terms):
+    # This function returns a dictionary of each term to the set of the term and all of its
+    # ancestors (through is_a and part_of)
+    ancestors = {}
+
+    def visit(term):
+        if term not in ancestors:
+            ancestors[term] = {term}
+            for parent in terms[term][2]:
+                if parent in terms:
+                    ancestors[term] |= visit(parent)
+        return ancestors[term]
+
+    for term in terms:
+        visit(term)
+    return ancestors
+
+
+def read_mapping(mapping_file):
+    # This function reads a gene-to-GO mapping (locus ID, comma-separated GO terms) and returns
+    # a dictionary of locus ID to a list of GO terms
+    mapping = {}
+    with open(mapping_file) as genes:
+        for line in genes:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) >= 2:
+                mapping.setdefault(fields[0], []).extend(
+                    term.strip() for term in fields[1].split(',') if term.strip())
+    return mapping
+
+
+def build_matrix(mapping_file, obo_file):
+    # This function builds the gene x term CSR matrix with annotations propagated to ancestor
+    # terms and returns a dictionary of arrays: genes, terms, names, namespaces, indptr,
+    # indices (term columns of each gene row)
+    terms, alternative_ids = read_obo(obo_file)
+    ancestors = term_ancestors(terms)
+    term_ids = sorted(terms)
+    column = {term: index for index, term in enumerate(term_ids)}
+    genes = sorted(read_mapping(mapping_file).items())
+    indptr, indices = [0], []
+    for _, annotations in genes:
+        propagated = set()
+        for term in annotations:
+            term = alternative_ids.get(term, term)
+            if term in ancestors:
+                propagated |= ancestors[term]
+        indices.extend(sorted(column[term] for term in propagated))
+        indptr.append(len(indices))
+    return {'genes': np.array([gene for gene, _ in genes]),
+            'terms': np.array(term_ids),
+            'names': np.array([terms[term][0] for term in term_ids]),
+            'namespaces': np.array([NAMESPACES.get(terms[term][1], '') for term in term_ids]),
+            'indptr': np.array(indptr, dtype=np.int64),
+            'indices': np.array(indices, dtype=np.int32)}
+
+
+def load_matrix(mapping_file, obo_file, cache_dir):
+    # This function returns the gene x term matrix, from the cache if built before for the
+    # same mapping and ontology files and matrix format version
+    cache_file = os.path.join(cache_dir, 'go_matrix.v%d.%s.npz'
+                              % (MATRIX_VERSION, file_checksum([mapping_file, obo_file])))
+    if os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            return {key: cached[key] for key in cached.files}
+    matrix = build_matrix(mapping_file, obo_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_file + '.tmp', 'wb') as cache:
+        np.savez(cache, **matrix)
+    os.replace(cache_file + '.tmp', cache_file)
+    print("Built gene x GO term matrix: %d genes, %d terms, %d annotations: %s"
+          % (len(matrix['genes']), len(matrix['terms']), len(matrix['indices']), cache_file))
+    return matrix
+
+
+def term_rows(matrix, gene_rows):
+    # This function takes the matrix and the rows of the genes of a universe (in rank order)
+    # and returns the transposed matrix restricted to those genes: (indptr, ranks) where the
+    # ranks (positions in gene_rows) of the genes of each term are sorted within each row
+    lengths = matrix['indptr'][gene_rows + 1] - matrix['indptr'][gene_rows]
+    starts = np.repeat(matrix['indptr'][gene_rows], lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    columns = matrix['indices'][starts + offsets]
+    ranks = np.repeat(np.arange(len(gene_rows)), lengths)
+    order = np.lexsort((ranks, columns))
+    counts = np.bincount(columns, minlength=len(matrix['terms']))
+    indptr = np.concatenate(([0], np.cumsum(counts)))
+    return indptr, ranks[order]
+
+
+def log_factorials(n):
+    # This function returns log(i!) for i = 0..n
+    return np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, n + 1)))))
+
+
+def fisher_upper_tail(annotated, significant, n_selected, n_genes):
+    # This function returns P(X >= significant) for X hypergeometric (n_genes genes,
+    # annotated genes in the term, n_selected genes drawn) for all terms
+    log_factorial = log_factorials(n_genes)
+
+    def log_choose(n, k):
+        return log_factorial[n] - log_factorial[k] - log_factorial[n - k]
+
+    pvalues = np.ones(len(annotated))
+    upper = np.minimum(annotated, n_selected)
+    tested = np.flatnonzero(significant > 0)
+    for start in range(0, len(tested), TERM_CHUNK):
+        chunk = tested[start:start + TERM_CHUNK]
+        width = int((upper[chunk] - significant[chunk]).max()) + 1
+        drawn = significant[chunk, None] + np.arange(width)
+        valid = drawn <= upper[chunk, None]
+        drawn = np.where(valid, drawn, significant[chunk, None])
+        terms_annotated = annotated[chunk, None]
+        log_pmf = (log_choose(terms_annotated, drawn)
+                   + log_choose(n_genes - terms_annotated, n_selected - drawn)
+                   - log_choose(n_genes, n_selected))
+        pvalues[chunk] = np.where(valid, np.exp(log_pmf), 0.0).sum(axis=1)
+    return np.minimum(pvalues, 1.0)
+
+
+def ks_lower_scores(indptr, ranks, n_genes):
+    # This function returns the one-sided Kolmogorov-Smirnov p-value of each term: genes of
+    # the term have lower ranks (scores) than other genes. For the j-th gene of a term (rank
+    # r, 0-based), the difference of empirical distributions is j / m - (r + 1 - j) / (n - m).
+    annotated = np.diff(indptr)
+    pvalues = np.ones(len(annotated))
+    tested = (annotated > 0) & (annotated < n_genes)
+    if not np.any(tested):
+        return pvalues
+    rows = np.repeat(np.arange(len(annotated)), annotated)
+    m = annotated[rows].astype(np.float64)
+    position = np.arange(len(ranks)) - indptr[rows] + 1
+    difference = position / m - (ranks + 1 - position) / (n_genes - m)
+    statistic = np.zeros(len(annotated))
+    starts = indptr[:-1][annotated > 0]
+    statistic[annotated > 0] = np.maximum.reduceat(difference, starts)
+    statistic = np.maximum(statistic, 0)
+    effective = annotated * (n_genes - annotated) / n_genes
+    pvalues[tested] = np.exp(-2 * effective[tested] * statistic[tested] ** 2)
+    return np.minimum(pvalues, 1.0)
+
+
+def adjust_bh(pvalues):
+    # This function adjusts p-values for multiple testing (Benjamini-Hochberg, as p.adjust)
+    n = len(pvalues)
+    if n == 0:
+        return pvalues
+    order = np.argsort(pvalues)[::-1]
+    adjusted = np.minimum.accumulate(pvalues[order] * n / np.arange(n, 0, -1))
+    result = np.empty(n)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+def read_scores(score_file):
+    # This function reads a table of scores (header: locus ID, score names) and returns a
+    # dictionary of score name to a dictionary of locus ID to score (missing values dropped)
+    with open(score_file) as table:
+        names = table.readline().rstrip('\n').split('\t')[1:]
+        scores = {name: {} for name in names}
+        for line in table:
+            fields = line.rstrip('\n').split('\t')
+            for name, value in zip(names, fields[1:]):
+                if value not in ('', 'NA', 'NaN', 'nan'):
+                    scores[name][fields[0]] = float(value)
+    return scores
+
+
+def ontology_genes(matrix, ontology):
+    # This function returns a boolean array over the genes (matrix rows): True for genes with
+    # at least one annotation in the ontology (BP, MF or CC)
+    in_ontology = matrix['namespaces'][matrix['indices']] == ontology
+    rows = np.repeat(np.arange(len(matrix['genes'])), np.diff(matrix['indptr']))
+    return np.bincount(rows, weights=in_ontology, minlength=len(matrix['genes'])) > 0
+
+
+def enrichment(matrix, scores, ontology, node_size=50, top_fraction=0.05, gene_list=None,
+               decreasing=False):
+    # This function tests the terms of one ontology for one score vector (dictionary of locus
+    # ID to score) and returns a dictionary of result arrays over the terms with at least
+    # node_size genes, or None if no gene with a score is annotated in the ontology
+    gene_index = {gene: index for index, gene in enumerate(matrix['genes'].tolist())}
+    annotated_rows = ontology_genes(matrix, ontology)
+    universe = [(score, gene) for gene, score in scores.items()
+                if gene in gene_index and annotated_rows[gene_index[gene]]]
+    if not universe:
+        return None
+    universe.sort(reverse=decreasing)
+    gene_rows = np.array([gene_index[gene] for _, gene in universe], dtype=np.int64)
+    n_genes = len(gene_rows)
+    if gene_list is not None:
+        selected = np.array([gene in gene_list for _, gene in universe])
+    else:
+        values = np.array([score for score, _ in universe])
+        cutoff = np.quantile(values, 1 - top_fraction if decreasing else top_fraction)
+        selected = values >= cutoff if decreasing else values <= cutoff
+    indptr, ranks = term_rows(matrix, gene_rows)
+    annotated = np.diff(indptr)
+    entry_terms = np.repeat(np.arange(len(annotated)), annotated)
+    significant = np.bincount(entry_terms, weights=selected[ranks],
+                              minlength=len(annotated)).astype(np.int64)
+    n_selected = int(selected.sum())
+    tested = (annotated >= max(node_size, 1)) & (matrix['namespaces'] == ontology)
+    fisher = fisher_upper_tail(annotated[tested], significant[tested], n_selected, n_genes)
+    # CSR rows of the tested terms only
+    ks = ks_lower_scores(np.concatenate(([0], np.cumsum(annotated[tested]))),
+                         ranks[tested[entry_terms]], n_genes)
+    return {'terms': np.flatnonzero(tested), 'annotated': annotated[tested],
+            'significant': significant[tested],
+            'expected': annotated[tested] * n_selected / max(n_genes, 1),
+            'ks': ks, 'fisher': fisher, 'n_genes': n_genes, 'n_selected': n_selected}
+
+
+def write_results(output, matrix, result):
+    # This function writes the results of the terms of one ontology, sorted by KS p-value
+    ks, fisher = result['ks'], result['fisher']
+    ks_adjusted, fisher_adjusted = adjust_bh(ks), adjust_bh(fisher)
+    terms = result['terms']
+    with open(output + '.tmp', 'w') as table:
+        table.write('GO.ID\tTerm\tAnnotated\tSignificant\tExpected\tclassic_ks\tclassic_fisher'
+                    '\tclassic_ks_adjusted\tclassic_fisher_adjusted\n')
+        for index in np.argsort(ks, kind='stable').tolist():
+            table.write('%s\t%s\t%d\t%d\t%.2f\t%.6g\t%.6g\t%.6g\t%.6g\n'
+                        % (matrix['terms'][terms[index]], matrix['names'][terms[index]],
+                           result['annotated'][index], result['significant'][index],
+                           result['expected'][index], ks[index], fisher[index],
+                           ks_adjusted[index], fisher_adjusted[index]))
+    os.replace(output + '.tmp', output)
+    return len(terms)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="GO term enrichment (Fisher and KS tests)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Build and cache the gene x GO term matrix")
+    test = subparsers.add_parser('test', help="Test GO terms for one or more score vectors")
+    for subparser in (build, test):
+        subparser.add_argument('mapping', help="Gene-to-GO mapping: locus ID, GO terms")
+        subparser.add_argument('obo', help="GO ontology in OBO format (e.g. go-basic.obo)")
+        subparser.add_argument('--cache-dir', default='cache',
+                               help="Directory of cached matrices (default: cache)")
+    test.add_argument('scores', help="Scores: header line, then locus ID and score columns")
+    test.add_argument('output_dir', help="Output directory")
+    test.add_argument('--node-size', type=int, default=50,
+                      help="Minimum number of annotated genes of a term (default: 50)")
+    selection = test.add_mutually_exclusive_group()
+    selection.add_argument('--top-fraction', type=float, default=0.05,
+                           help="Fraction of genes with the most significant scores selected "
+                                "for Fisher's exact test (default: 0.05)")
+    selection.add_argument('--gene-list', help="Genes selected for Fisher's exact test")
+    test.add_argument('--decreasing', action='store_true',
+                      help="Higher scores are more significant")
+    args = parser.parse_args()
+
+    go_matrix = load_matrix(args.mapping, args.obo, args.cache_dir)
+    if args.command == 'test':
+        gene_list = None
+        if args.gene_list:
+            with open(args.gene_list) as genes:
+                gene_list = set(genes.read().split())
+        os.makedirs(args.output_dir, exist_ok=True)
+        for score_name, score_vector in read_scores(args.scores).items():
+            for ontology in ('BP', 'MF', 'CC'):
+                result = enrichment(go_matrix, score_vector, ontology, args.node_size,
+                                    args.top_fraction, gene_list, args.decreasing)
+                if result is None:
+                    print("%s %s: skipped, no genes with scores annotated in the ontology"
+                          % (score_name, ontology))
+                    continue
+                output = os.path.join(args.output_dir, '%s_%s.tsv' % (score_name, ontology))
+                n_terms = write_results(output, go_matrix, result)
+                print("%s %s: %d genes (%d selected), %d terms tested: %s"
+                      % (score_name, ontology, result['n_genes'], result['n_selected'],
+                         n_terms, output))